@@ -7,303 +7,338 @@ avión y la puesta en órbita del cohete REOS.  Contiene el loop del avión y el
 lanzamiento del cohete de una sola etapa.  Se extraen en un archivo de texto
 las variables de interés durante el vuelo para su posterior análisis.
 
+La simulación de cada caso está en simulacion.py y el reparto de los casos
+entre procesos en barrido.py.
+
 """
 
-from math import radians, cos, sin, degrees
-from modeloISA import density, temperature, GAMMA, viscosity, pressure, R_AIR
-from modelo_empuje import thrust
-from aero_avion import cl_alfa, angulo_ataque, k, cd0, cd_inducida, S_W
-from aero_avion import resistencia, sustentacion
-from aero_misil import cdll, SREF_MISIL, SGASES
+import argparse
+import os
+from math import degrees
 
+import numpy as np
 
-#--------------------------CONDICIONES GRAVITATORIAS--------------------------
-G = 6.673e-11  # Constante de gravitación universal (N m2/kg2).
-MT = 5.972e24  # Masa terrestre (kg).
-MU = G * MT
-RT = 6378136.3  # Radio terrestre (m).
-GRAV = MU / RT**2  # Aceleración de la gravedad a nivel del mar (m/s2).
+from ascenso_lote import Q_COSTA, MASA_MISIL, MOTORES
+from barrido import ejecutar_barrido, nombres_ficheros, rejilla
+from instrumentacion import instrumentar, guardar_resumen
+from tabla_cdll import cargar_tabla
+from trayectorias import Registro
+#Los análisis opcionales (optimizacion, sensibilidad, convergencia y
+# dispersion) se importan sólo al usarse.  argumentos lee las constantes de
+# optimizacion, que sólo depende de simulacion.
 
 
-#------------------------CARACTERÍSTICAS DE LA AERONAVE------------------------
+#---------------------------OPCIONES DE CÁLCULO-------------------------------
 
-N = 3.5  # Factor de carga máximo.
-MASS = 14273  # Masa del avión cargado (kg).
-W = MASS * GRAV  # Peso del avión (N).
+USAR_TABLA_CD = False
+#Si es True, el coeficiente de resistencia del misil se interpola en la tabla
+# precalculada de tabla_cdll (ver allí el error frente a cdll) en lugar de
+# evaluar cdll en cada paso.
+TRABAJADORES = None
+#Número de procesos del barrido.  Con None se usan todos los núcleos.
+METODO = 'euler'
+#Integrador: 'euler' (paso fijo de 0,1 s) o 'rk45' (Dormand-Prince con paso
+# adaptativo y detección exacta de eventos).
+METODO_OPTIMIZAR = 'rk45'
+#Integrador por defecto con --optimizar: con Euler el estado final varía a
+# saltos con el punto de lanzamiento (ver optimizacion.py).
+MOTOR = 'numpy'
+#Cálculo del ascenso con Euler: 'numpy' (todos los misiles a la vez, ver
+# ascenso_lote) o 'jit' (núcleo compilado con Numba, ver ascenso_jit; sin
+# Numba se usa 'numpy').
+EXPORTAR_TSV = False
+#Si es True, además de la tabla .npy se escribe el fichero de texto de cada
+# caso (sin extensión), con una columna por variable separada por tabuladores.
+ISP = range(int(220 * 9.8), int(320 * 9.8), 100)
+#Valores del impulso específico del barrido por defecto (N s/kg).
 
 
 #-------------------------TRAYECTORIA/PUESTA EN ÓRBITA-------------------------
-#En esta parte del código se escribe la integración de las ecuaciones de los
-# distintos tramos del vuelo y la puesta en órbita del cohete.  Se comienza
-# abriendo un bucle para distintos valores del impulso específico del
-# propulsante del cohete REOS.  Este bucle debe durar todo el programa para
-# conseguir que exporte los distintos ficheros correspondientes a cada Isp.
+#Se simula un caso para cada valor del impulso específico del propulsante del
+# cohete REOS, desde un valor en segundos de 220 hasta un valor de 320.  Así
+# se verá la influencia de este parámetro en la puesta en órbita del cohete.
+# El resto de parámetros (gasto de 60 kg/s, 750 kg de propulsante, beta de
+# 89 grados, Mach 1,8 y 12000 m iniciales) son los de simulacion.Caso; para
+# barrerlos basta con pasar varios valores en la línea de órdenes.  Cada caso
+# guarda su propia tabla de resultados, llamada como el Isp (2156.npy), que se
+# lee con simulacion.cargar_resultados.  Con --tsv se exporta además el
+# fichero de texto de siempre.  Con --trayectorias se guardan también las
+# trayectorias completas, diezmadas, del giro y de los misiles.
+#Con --optimizar no se guarda la tabla de resultados: se busca el lanzamiento
+# óptimo de cada caso, por defecto con el integrador METODO_OPTIMIZAR.
+#Con --sensibilidades se guarda, en lugar de la tabla de resultados, la de
+# las derivadas del estado final respecto de los parámetros del caso en cada
+# punto del giro (2156.sens.npy; ver sensibilidad.py).
+#Con --convergencia se simula cada caso con varios pasos de integración y se
+# muestra el error estimado con cada uno y el mayor paso que cumple la
+# tolerancia (ver convergencia.py).
+#Para simular escenarios sueltos desde otro programa, sin ficheros ni
+# procesos, se usan directamente las funciones de simulacion.py.
 
-for isp in range(int(220 * 9.8), int(320 * 9.8), 100):
-    #Bucle para el impulso específico, desde un valor en segundos de 220
-    # hasta un valor de 320. Así se verá la influencia de este parámetro
-    # en la puesta en órbita del cohete.
-    gasto = 60  # Gasto másico del misil (kg/s).
-    #Masa total del misil: 1000 kg.  Definido más adelante.
-    masa_propulsante = 750  # Masa de propulsante (kg).
-    empuje_misil = gasto * isp
-    # Empuje variable para cada ensayo (varía con el Isp a gasto cte).
-    t_combustion = masa_propulsante / gasto  # Tiempo de combustión (s).
-    beta = 89
-    #El ángulo beta determina el ángulo final de la maniobra de giro; es
-    # decir, es el ángulo de asiento del avión con el que se quiere que
-    # comience el ascenso tras el giro en el plano vertical.
-    beta = radians(beta)
-    isp_texto = str(isp)
-    # Para el nombre del archivo de texto que recoge los datos
-    f = open(isp_texto, 'w')  # Fichero de escritura sin extensión.
-    f.write('TIEMPO DE LANZAMIENTO(s)\tALTURA DE LANZAMIENTO (m)\tVELOCIDAD')
-    f.write('DE LANZAMIENTO(m/s)\tMACH\tALFA (deg)\tGAMMA (deg)\tTHETA (deg)')
-    f.write('\tE_MECÁNICA (J)\tRESISTENCIA (N)\tTIEMPO (s)\tALTURA (m)\t')
-    f.write('VELOCIDAD (m/s)\tMACH\tTHETA (deg)\tMASA (kg)\tE_MECÁNICA (J)\t')
-    f.write('POSICIÓN HORIZONTAL FINAL (m)\tEMPUJE (N)\tIMPULSO ESPECÍFICO ')
-    f.write('(N s/kg)\n')  # Cabezas de tabla.
-    #--------------------------CONDICIONES INICIALES---------------------------
-    #Ahora, para los próximos cálculos, se definen las condiciones iniciales de
-    # las variables.
-    h = 12000  # Altitud inicial (m).
-    r = RT + h  # Distancia desde el centro de la Tierra (m).
-    g0 = MU / r**2  # Aceleración gravitatoria (m/s2).
-    rho = density(h)  # Densidad inicial del aire (kg/m3).
-    p = pressure(h)  # Presión inicial del aire (Pa).
-    T = temperature(h)  # Temperatura inicial del aire (K).
-    Mu_Visc = viscosity(h)  # Viscosidad (Pa s).
-    #A la altura inicial el avión vuela en vuelo estacionario.
-    M = 1.8  # Número de Mach inicial.
-    v = M * (GAMMA * R_AIR * T)**.5  # Velocidad inicial (m/s).
-    CL_alfa1 = cl_alfa(M)  # Pendiente del coeficiente de sustentación.
-    #Ángulos de asiento, de ataque y de asiento de la velocidad iniciales.
-    alfa_numerico = 2 * W / (rho * v**2 * S_W * CL_alfa1)
-    alfa = angulo_ataque(alfa_numerico, M)  # Ángulo de ataque.
-    alfa_grados = degrees(alfa)  # Ángulo de ataque (deg).
-    gama = 0  # Ángulo de asiento.
-    gama_grados = degrees(gama)  # Ángulo de asiento (deg).
-    theta = gama + alfa  # Ángulo de asiento de la velocidad.
-    theta_grados = degrees(theta)  # Ángulo de asiento de la velocidad (deg).
-    #Coeficientes aerodinámicos.
-    CL = alfa * CL_alfa1  # Coeficiente de sustentación inicial.
-    k1 = k(M)
-    CD01 = cd0(M)
-    CD_inducida1 = cd_inducida(k1, CL)
-    CD = CD01 + CD_inducida1  # Polar del avión.  Coeficiente de resistencia.
+def argumentos(argv=None):
+    '''Lectura de las opciones de la línea de órdenes.  Cada parámetro del
+    caso admite varios valores; se simulan todas las combinaciones.
     '''
-    -------------------------INICIO DE LA MANIOBRA-------------------------
+    from optimizacion import OBJETIVOS, VARIABLES, PUNTOS
+    parser = argparse.ArgumentParser(
+        description='Giro ascendente del avión y puesta en órbita del '
+        'cohete REOS desde cada punto del giro.')
+    parser.add_argument('--isp', type=float, nargs='+', default=list(ISP),
+                        help='impulso específico (N s/kg)')
+    parser.add_argument('--gasto', type=float, nargs='+',
+                        help='gasto másico del misil (kg/s)')
+    parser.add_argument('--masa-propulsante', type=float, nargs='+',
+                        help='masa de propulsante (kg), positiva y menor '
+                        'que la del misil (%g kg)' % MASA_MISIL)
+    parser.add_argument('--beta', type=float, nargs='+',
+                        help='ángulo final del giro (deg)')
+    parser.add_argument('--mach', type=float, nargs='+',
+                        help='Mach inicial')
+    parser.add_argument('--altitud', type=float, nargs='+',
+                        help='altitud inicial (m)')
+    parser.add_argument('--metodo', choices=('euler', 'rk45'),
+                        help='integrador (por defecto, %s; con --optimizar, '
+                        '%s)' % (METODO, METODO_OPTIMIZAR))
+    parser.add_argument('--motor', choices=MOTORES, default=MOTOR,
+                        help='cálculo del ascenso con Euler: vectorizado '
+                        '(numpy) o compilado con Numba (jit)')
+    parser.add_argument('--costa', type=float, nargs='?', const=Q_COSTA,
+                        metavar='Q',
+                        help='con Euler, resolver en forma cerrada el vuelo '
+                        'sin empuje cuando la presión dinámica baja de Q Pa '
+                        '(por defecto %g; ver ascenso_lote.py)' % Q_COSTA)
+    parser.add_argument('--trabajadores', type=int, default=TRABAJADORES,
+                        help='número de procesos (por defecto, uno por '
+                        'núcleo)')
+    parser.add_argument('--tabla-cd', action='store_true',
+                        default=USAR_TABLA_CD,
+                        help='interpolar el Cd del misil en la tabla '
+                        'precalculada')
+    parser.add_argument('--tsv', action='store_true', default=EXPORTAR_TSV,
+                        help='exportar también los resultados en texto '
+                        'separado por tabuladores')
+    parser.add_argument('--trayectorias', action='store_true',
+                        help='guardar las trayectorias completas del giro y '
+                        'de los misiles (ver trayectorias.py)')
+    parser.add_argument('--diezmado-dt', type=float,
+                        help='guardar un punto cada tanto tiempo (s)')
+    parser.add_argument('--diezmado-distancia', type=float,
+                        help='guardar un punto cada tanta distancia (m)')
+    parser.add_argument('--diezmado-tolerancia', type=float,
+                        help='guardar un punto cuando la extrapolación lineal '
+                        'se separa tanto de la trayectoria (m)')
+    parser.add_argument('--lanzamientos', type=int, nargs='+',
+                        help='índices de los lanzamientos cuya trayectoria '
+                        'se guarda (por defecto, todos)')
+    parser.add_argument('--optimizar', choices=OBJETIVOS,
+                        help='en lugar de lanzar en cada paso del giro, '
+                        'buscar el lanzamiento que maximiza este resultado '
+                        'final del misil (ver optimizacion.py)')
+    parser.add_argument('--variable', choices=VARIABLES, default='t',
+                        help='variable con la que se recorre el giro en la '
+                        'búsqueda: instante (t) o ángulo de asiento de la '
+                        'velocidad (gama)')
+    parser.add_argument('--puntos-giro', type=int, default=PUNTOS,
+                        help='puntos del giro del barrido inicial de la '
+                        'búsqueda (más puntos encuentran máximos más '
+                        'estrechos con más ascensos)')
+    parser.add_argument('--sensibilidades', nargs='+', choices=OBJETIVOS,
+                        help='en lugar de la tabla de resultados, guardar la '
+                        'de las derivadas de estos resultados finales del '
+                        'misil respecto de los parámetros del caso en cada '
+                        'punto del giro (ver sensibilidad.py)')
+    parser.add_argument('--convergencia', type=float, nargs='?',
+                        const=True, metavar='TOLERANCIA',
+                        help='en lugar de lanzar en cada paso del giro, '
+                        'estimar el error de discretización con varios '
+                        'pasos y buscar el mayor cuyo error relativo no '
+                        'supera la tolerancia (por defecto, la de '
+                        'convergencia.py)')
+    parser.add_argument('--montecarlo', type=int, metavar='MUESTRAS',
+                        help='en lugar de lanzar en cada paso del giro, '
+                        'estudiar la dispersión del ascenso desde un punto '
+                        'con tantas muestras (ver dispersion.py)')
+    parser.add_argument('--semilla', type=int, default=0,
+                        help='semilla del Monte Carlo')
+    parser.add_argument('--t-lanzamiento', type=float,
+                        help='instante del giro en que se lanza en el Monte '
+                        'Carlo (s); por defecto, el final del giro')
+    parser.add_argument('--cache-ascensos', nargs='?', const=True,
+                        default=False, metavar='DIRECTORIO',
+                        help='reutilizar los ascensos ya integrados, '
+                        'guardados en disco (por defecto en el directorio '
+                        'de caché)')
+    parser.add_argument('--almacen', nargs='?', const=True, default=False,
+                        metavar='DIRECTORIO',
+                        help='guardar cada caso terminado en el almacén de '
+                        'resultados (por defecto en el directorio de caché) '
+                        'y recuperar de él, sin simularlos, los que ya '
+                        'estén (ver almacen.py)')
+    parser.add_argument('--instrumentacion', metavar='FICHERO',
+                        help='medir pasos, llamadas al modelo y tiempos de '
+                        'cada fase y caso, y guardar el resumen en este '
+                        'fichero JSON (ver instrumentacion.py)')
+    parser.add_argument('--directorio', default='.',
+                        help='directorio de los ficheros de resultados')
+    parser.add_argument('--sumidero', metavar='FICHERO',
+                        help='escribir los resultados de todos los casos en '
+                        'este único fichero .npy, con su índice de casos en '
+                        'FICHERO.json, en lugar de un fichero por caso (ver '
+                        'barrido.py)')
+    opciones = parser.parse_args(argv)
+    if any(not 0 < m < MASA_MISIL for m in opciones.masa_propulsante or ()):
+        parser.error('la masa de propulsante debe estar entre 0 y %g kg '
+                     '(masa del misil)' % MASA_MISIL)
+    if opciones.metodo is None:
+        opciones.metodo = (METODO if opciones.optimizar is None
+                           else METODO_OPTIMIZAR)
+    return opciones
+
+
+def _enteros(valores):
+    '''Los valores enteros se dejan como int para que los nombres de los
+    ficheros no cambien (2156 y no 2156.0).
     '''
-    radius = v**2 / (g0 * (N - 1))  # Radio de giro (m).
-    #Este radio de giro se obtiene para la velocidad inicial en vuelo
-    # estacionario y para un factor de carga máximo según los pilones de carga
-    # n = 3,5.
-    dt = .1  # Diferencial de tiempo (s).
-    '''------SISTEMA DE ECUACIONES PARA PRIMER TRAMO: VUELO ESTACIONARIO------
+    return [int(x) if x == int(x) else x for x in valores]
+
+
+def _ejecutar(opciones, casos):
+    '''Búsqueda de los óptimos o barrido de los casos según las opciones.
     '''
-    #Energías.
-    ecinetica = .5 * MASS * v**2  # Energía cinética (J).
-    epotencial = MASS * g0 * h  # Energía potencial (J).
-    emecanica = ecinetica + epotencial  # Energía mecánica (J).
-    #Fuerzas.
-    D = resistencia(v, rho, CD)  # Resistencia aerodinámica (N).
-    L = sustentacion(v, rho, CL)  # Sustentación aerodinámica (N).
-    Th = thrust(M, rho)  # Empuje (N).
-    diferencia_T_D = Th - D
-    #Esto nos va a permitir calcular en qué momento el empuje se verá superado
-    # por la resistencia
-    n = L / W  # Factor de carga.
-    #Condiciones iniciales para la integración.
-    t = 0
-    x = 0
-    omega = v / radius  # Velocidad angular en la maniobra de giro (rad/s).
-    #Segunda ley de Newton en el eje horizontal (ejes cuerpo).
-    dv = dt * (Th * cos(alfa) - D - MASS * g0 * sin(gama)) / MASS
-    vx = v * cos(gama)  # Velocidad horizontal del avión en ejes tierra (m/s).
-    vy = v * sin(gama)  # Velocidad vertical del avión en ejes tierra (m/s).
-    dx = vx * dt  # Variación horizontal de la posición en ejes tierra (m).
-    dh = vy * dt  # Variación vertical de la posición en ejes tierra (m).
-    dtheta = v * dt / radius  # Variación del ángulo de empuje.
-    vl = v
-    Ml = vl / (GAMMA * R_AIR * T)**.5
-    Cdl = cdll(Ml, h)
-    D_misil = .5 * rho * Cdl * SREF_MISIL * vl**2
-    '''-------SISTEMA DE ECUACIONES PARA SEGUNDO TRAMO: MANIOBRA DE GIRO-------
-    Ahora comienza el bucle relativo al giro ascendente, que analiza la
-    trayectoria con nuevas ecuaciones y condiciones de vuelo que se detallan
-    más adlante.  El significado de theta < beta implica que el bucle realice
-    el cálculo requerido siempre que el ángulo theta sea menor que beta.  Se ha
-    obligado a que beta sea el ángulo de final de giro (al inicio del programa
-    se le ha dado un rango de valores).  Por tanto, una vez que theta sea igual
-    a beta, se dará por concluida la maniobra de giro y se comenzará con el
-    siguiente tramo. Todo ello mientras la velocidad sea positiva, condición
-    que permite ver si el resultado es realista o no.
+    if opciones.optimizar is not None:
+        from optimizacion import optimizar_caso
+        optimos = []
+        for caso in casos:
+            optimo = optimizar_caso(caso, opciones.optimizar,
+                                    opciones.variable, opciones.metodo,
+                                    puntos=opciones.puntos_giro)
+            lanz = optimo.resultado.lanzamiento
+            print('{0}: t = {1:.3f} s, gama = {2:.3f} deg, {3} = {4:.3f} '
+                  '({5} ascensos)'.format(
+                      caso, lanz.t, degrees(lanz.gama), opciones.optimizar,
+                      getattr(optimo.resultado, opciones.optimizar),
+                      optimo.evaluaciones))
+            optimos.append(optimo)
+        return optimos
+    if opciones.sensibilidades is not None:
+        from sensibilidad import sensibilidades, escribir_sensibilidades
+        tabla_cd = cargar_tabla() if opciones.tabla_cd else None
+        rutas = []
+        for caso, nombre in zip(casos, nombres_ficheros(casos)):
+            ruta = os.path.join(opciones.directorio, nombre + '.sens')
+            tabla = sensibilidades(caso, opciones.sensibilidades,
+                                   metodo=opciones.metodo, tabla_cd=tabla_cd)
+            np.save(ruta + '.npy', tabla)
+            if opciones.tsv:
+                escribir_sensibilidades(ruta, tabla)
+            rutas.append(ruta + '.npy')
+        return rutas
+    if opciones.convergencia is not None:
+        from convergencia import convergencia, paso_recomendado
+        from convergencia import ordenes_dudosos, TOLERANCIA, ORDEN
+        tolerancia = (TOLERANCIA if opciones.convergencia is True
+                      else opciones.convergencia)
+        tabla_cd = cargar_tabla() if opciones.tabla_cd else None
+        estudios = []
+        for caso in casos:
+            estudio = convergencia(caso, tabla_cd=tabla_cd,
+                                   motor=opciones.motor,
+                                   trabajadores=opciones.trabajadores)
+            print('{0}: orden observado {1}'.format(caso, ', '.join(
+                '{0} {1:.2f}'.format(variable, orden)
+                for variable, orden in estudio.orden.items())))
+            for i, paso in enumerate(estudio.pasos):
+                print('    paso {0:<8g} {1}'.format(paso, ', '.join(
+                    '{0} {1:.2e}'.format(variable, error[i])
+                    for variable, error in estudio.error.items())))
+            dudosos = ordenes_dudosos(estudio)
+            if dudosos:
+                print('    aviso: orden observado lejos de {0} ({1}): la '
+                      'extrapolación es poco fiable'.format(
+                          ORDEN, ', '.join(dudosos)))
+            paso = paso_recomendado(estudio, tolerancia)
+            print('    paso recomendado: {0}'.format(
+                'ninguno' if paso is None else '{0:g} s'.format(paso)))
+            estudios.append(estudio)
+        return estudios
+    if opciones.montecarlo is not None:
+        from dispersion import dispersion_caso, resumen
+        from dispersion import VARIABLES as DISPERSAS
+        analisis = []
+        for caso in casos:
+            lanzamiento, estadisticas = dispersion_caso(
+                caso, opciones.montecarlo, semilla=opciones.semilla,
+                t_lanzamiento=opciones.t_lanzamiento,
+                trabajadores=opciones.trabajadores)
+            print('{0}: lanzamiento en t = {1:.3f} s'.format(caso,
+                                                             lanzamiento.t))
+            for variable in DISPERSAS:
+                datos = resumen(estadisticas[variable])
+                print('    {0:10s} media {1:.6g}, desviación {2:.4g}, '
+                      '{3}'.format(variable, datos['media'],
+                                   datos['desviacion'], ', '.join(
+                                       'p{0:g} {1:.6g}'.format(100 * q, x)
+                                       for q, x in
+                                       datos['cuantiles'].items())))
+            print('    {0:10s} {1:.1%} de las muestras'.format(
+                'techo', estadisticas['techo'].media))
+            analisis.append((lanzamiento, estadisticas))
+        return analisis
+    registro = None
+    if opciones.trayectorias:
+        registro = Registro(opciones.diezmado_dt, opciones.diezmado_distancia,
+                            opciones.diezmado_tolerancia,
+                            opciones.lanzamientos)
+    estadisticas = {}
+    rutas = ejecutar_barrido(casos, trabajadores=opciones.trabajadores,
+                             directorio=opciones.directorio,
+                             usar_tabla_cd=opciones.tabla_cd,
+                             metodo=opciones.metodo,
+                             exportar_tsv=opciones.tsv, registro=registro,
+                             cache_ascensos=opciones.cache_ascensos,
+                             estadisticas=estadisticas,
+                             motor=opciones.motor,
+                             sumidero=opciones.sumidero,
+                             almacen=opciones.almacen,
+                             q_costa=opciones.costa)
+    if opciones.cache_ascensos:
+        print('Caché de ascensos: {0} aciertos, {1} fallos.'.format(
+            estadisticas.get('aciertos', 0), estadisticas.get('fallos', 0)))
+    if opciones.almacen:
+        print('Almacén de resultados: {0} casos recuperados de {1}.'.format(
+            estadisticas.get('recuperados', 0), len(casos)))
+    return rutas
+
+
+
+def main(argv=None):
+    '''Barrido de casos definido por la línea de órdenes.  Sin opciones se
+    simula el barrido en Isp de siempre.  Devuelve las rutas de los ficheros
+    (con --sumidero, la tabla de todos los casos y sus tramos; ver
+    barrido.ejecutar_barrido; con --sensibilidades, las de las tablas de
+    sensibilidades) o, con --optimizar, la lista de óptimos
+    (optimizacion.Optimo) y, con --convergencia, la de estudios
+    (convergencia.Estudio), que se muestran por pantalla.
     '''
-    while gama < beta and v > 0:
-        #A continuación, se escriben en un fichero todas las variables aquí
-        # detalladas para cada valor de theta < beta.
-        f.write('{0:.2f}\t'.format(t))  # Tiempo (s).
-        f.write('{0:.3f}\t'.format(h))  # Altitud (m).
-        f.write('{0:.3f}\t'.format(v))  # Velocidad (m/s).
-        f.write('{0:.3f}\t'.format(M))  # Número de Mach.
-        f.write('{0:.3f}\t'.format(alfa_grados))  # Ángulo de ataque (deg).
-        f.write('{0:.3f}\t'.format(gama_grados))
-        # Asiento de la velocidad (deg).
-        f.write('{0:.3f}\t'.format(theta_grados))  # Ángulo de asiento (deg).
-        f.write('{0:.3f}\t'.format(emecanica))  # Energía mecánica (J).
-        f.write('{0:.3f}\t'.format(D))  # Fuerza de resistencia (N).
-        #Ya que este análisis de maniobra, a diferencia del anterior, lleva un
-        # cálculo para distintos valores de tiempo y velocidad, se debe
-        # programar su evolución en términos de sus variaciones diferenciales.
-        #Inicialización de variables y diferenciales para la maniobra del
-        # misil.
-        thetal = gama  # Inicialización del ángulo de asiento.
-        thetalgrados = degrees(thetal)  # Ángulo de asiento (deg).
-        yl = h  # Inicialización de la altitud (m).
-        vl = v  # Inicialización de la velocidad (m).
-        vxl = vl * cos(thetal)
-        # Inicialización de la componente horizontal de velocidad (m/s).
-        vyl = vl * sin(thetal)
-        # Inicialización de la componente vertical de velocidad (m/s).
-        tl = 0  # Inicialización temporal.
-        xl = 0  # Inicialización de la posición en el eje x.
-        sl = 0  # Inicialización del arco recorrido.
-        dvxl = 0
-        # Inicialización del diferencial de la componente horizontal de la
-        # velocidad (m/s).
-        dvyl = 0
-        # Inicialización del diferencial de la componente vertical de la
-        # velocidad (m/s).
-        dsl = 0  # Inicialización del diferncial del arco recorrido (m).
-        dxl = 0  # Inicialización del diferencial de la posición (m).
-        dyl = 0  # Inicialización del diferencial de la altitud (m).
-        dtl = .1  # Inicialización del diferencial de tiempo (m).
-        dthetal = 0  # Inicialización del diferencial del ángulo de asiento.
-        thetal = gama
-        # El ángulo de asiento del avión es igual al ángulo de asiento de la
-        # velocidad del misil.
-        thetalgrados = degrees(thetal)
-        Ddsl = 0
-        #Aquí se escriben los incrementos diferenciales de las coordenadas
-        # espaciales, temporales y de velocidad.  Los diferenciales se obtienen
-        # del tramo anterior, y sirven para que estos nuevos valores actúen en
-        # las nuevas condiciones para calcular nuevas variables.
-        t = t + dt  # Evolución temporal (s).
-        v = v + dv  # Velocidad (m/s).
-        x = x + dx  # Posición horizontal (m).
-        h = h + dh  # Altitud (m).
-        r = RT + h  # Distancia al centro de la Tierra (m).
-        g0 = MU / r**2  # Aceleración de la gravedad (m/s2).
-        #Las variables termodinámicas habrán variado con la altura.
-        rho = density(h)  # Densidad (kg/m3).
-        T = temperature(h)  # Temperatura (K).
-        Mu_Visc = viscosity(h)  # Viscosidad (Pa s).
-        M = v / (GAMMA * R_AIR * T)**.5  # Mach de vuelo.
-        n = 3.5  # Tomamos la condición de factor de carga máximo y constante.
-        radius = v**2 / (g0 * (n - 1))  # Radio de giro varía con la velocidad.
-        #Las características aerodinámicas varían con el número de Mach.
-        CL_alfa1 = cl_alfa(M)
-        k1 = k(M)
-        CD01 = cd0(M)
-        alfa_numerico = 2 * W * n / (rho * v**2 * S_W * CL_alfa1)
-        #El nuevo ángulo de ataque resultará del nuevo factor de carga (antes 1
-        # y ahora máximo), la nueva velocidad y las nuevas características
-        # aerodinámicas.
-        alfa = angulo_ataque(alfa_numerico, M)  # Ángulo de ataque.
-        theta = theta + dtheta  # Ángulo de asiento (empuje horizontal).
-        gama = theta - alfa  # Ángulo de asiento de la velocidad.
-        # Ángulos en grados para la exportación a los ficheros.
-        alfa_grados = degrees(alfa)  # Ángulo de ataque (deg).
-        theta_grados = degrees(theta)  # Ángulo de asiento (deg).
-        gama_grados = degrees(gama)  # Asiento de la velocidad (deg).
-        CL = alfa * CL_alfa1  # Coeficiente de sustentación.
-        n = .5 * rho * v**2 * S_W * CL / W
-        #Nuevas proyecciones de la velocidad (ejes tierra).
-        vx = v * cos(gama)  # Proyección horizontal de la velocidad (m/s).
-        vy = v * sin(gama)  # Proyección vertical de la velocidad (m/s).
-        CD_inducida1 = cd_inducida(k1, CL)
-        CD = CD01 + CD_inducida1  # Polar del avión.
-        D = resistencia(v, rho, CD)  # Fuerza de resistencia (N).
-        L = n * W  # Fuerza de sustentación (N).
-        #Energías.
-        ecinetica = .5 * MASS * v**2  # Energía cinética (J).
-        epotencial = MASS * g0 * h  # Energía potencial (J).
-        emecanica = ecinetica + epotencial  # Energía mecánica (J).
-        #Empuje.
-        Th = thrust(M, rho)  # Empuje (N).
-        diferencia_T_D = Th - D
-        #Velocidad angular.
-        omega = v / radius  # Velocidad angular (rad/s).
-        #Nuevas variaciones diferenciales.  Segunda ley de Newton.
-        dv = dt * (Th * cos(alfa) - D - W * sin(gama)) / MASS
-        #Esta última ecuación nos permite obtener un nuevo incvremento de
-        # velocidad (m/s) que, al reiniciar el bucle será sumado al último
-        # valor de la velocidad, obteniendo la variación de la velocidad.
-        dx = vx * dt  # Variación horizontal de la posición (m).
-        dh = v * sin(gama) * dt  # Variación vertical de la posición (m).
-        dtheta = omega * dt  # Variación del ángulo de asiento.
-        masa_misil = 1000  # Masa del misil (kg).
-        #----------------PUESTA EN ÓRBITA DEL MISIL----------------
-        while thetal > 0 and yl < 500000:
-            #Con este bucle se calculan todas las variables  correspondientes
-            # al lanzamiento del cohete.  La condición de parada del bucle es
-            # que el ángulo de asiento del misil deje de ser positivo. Esto es
-            # cuando el misil se encuentre completamente en posición horizontal
-            # y que se alcancen los 500km de altitud.
-            tl = tl + dtl  # Evolución temporal (s).
-            xl = xl + dxl  # Posición horizontal (m).
-            yl = yl + dyl  # Altitud (m).
-            sl = sl + dsl  # Arco recorrido (m).
-            thetal = thetal + dthetal  # Ángulo de asiento.
-            thetalgrados = degrees(thetal)  # Ángulo de asiento (deg).
-            vxl = vxl + dvxl  # Componente horizontal de la velocidad (m/s).
-            vyl = vyl + dvyl  # Componente vertical de la velocidad (m/s).
-            vl = (vxl**2 + vyl**2)**.5  # Módulo de la velocidad (m/s).
-            r = RT + yl  # Distancia al centro de la Tierra (m).
-            g0 = MU / r**2  # Aceleración de la gravedad (m/s2).
-            rho = density(yl)  # Densidad (kg/m3).
-            T = temperature(yl)  # Temperatura (K).
-            Mu_Visc = viscosity(yl)  # Viscosidad (Pa s).
-            Ml = vl / (GAMMA * R_AIR * T)**.5  # Mach de vuelo.
-            if tl <= t_combustion:
-                RATIO_AREAS = 1 - SGASES / SREF_MISIL
-            else:
-                RARIO_AREAS = 1
-            Cdl = cdll(Ml, yl)  # Coeficiente de resistencia.
-            D_misil = .5 * rho * Cdl * SREF_MISIL * vl**2
-            # Fuerza de resistencia (N).
-            Dx = D_misil * cos(thetal)
-            # Componente horizontal de la fuerza de resistencia (N).
-            Dy = D_misil * sin(thetal)
-            # Componente vertical de la fuerza de resistencia (N).
-            dvxl = -Dx / masa_misil * dtl
-            # Diferencial de la componente horizontal de la velocidad (m/s).
-            dvyl = -g0 * dtl - Dy / masa_misil * dtl
-            # Diferencial de la componente vertical de la velocidad (m/s).
-            if tl <= t_combustion:
-                dvxl = dvxl + empuje_misil * cos(thetal) * dtl / masa_misil
-                dvyl = dvyl + empuje_misil * sin(thetal) * dtl / masa_misil
-                masa_misil = masa_misil - gasto * dtl
-                # Variación de masa lineal (kg).
-            dthetal = -dtl * g0 * cos(thetal) / vl
-            # Diferencial del ángulo de asiento.
-            dxl = vxl * dtl  # Diferencial de la posición horizontal (m).
-            dyl = vyl * dtl  # Diferencial de la altitud (m).
-            dsl = vl * dtl  # Diferencial del arco recorrido (m).
-        Emec_misil = masa_misil * (GRAV * yl + vl**2 / 2)
-        # Energía mecánica final del misil (J).
-        # Trabajo de la resistencia (J).
-        f.write('{0:.3f}\t'.format(tl))  # Tiempo (s).
-        f.write('{0:.3f}\t'.format(yl))  # Altitud (m).
-        f.write('{0:.3f}\t'.format(vl))  # Velocidad (m/s).
-        f.write('{0:.3f}\t'.format(Ml))  # Mach de vuelo.
-        f.write('{0:.3f}\t'.format(thetalgrados))  # Ángulo de asiento (deg).
-        f.write('{0:.3f}\t'.format(masa_misil))  # Masa del misil (kg).
-        f.write('{0:.3f}\t'.format(Emec_misil))  # Energía mecánica final (J).
-        f.write('{0:.3f}\t'.format(xl))  # Posición x final (m).
-        f.write('{0:.3f}\t'.format(empuje_misil))  # Empuje (N).
-        f.write('{0:.3f}\n'.format(isp))  # Impulso específico (N s/kg).
-    f.close()
+    opciones = argumentos(argv)
+    valores = {'isp': _enteros(opciones.isp)}
+    for campo, lista in (('gasto', opciones.gasto),
+                         ('masa_propulsante', opciones.masa_propulsante),
+                         ('beta', opciones.beta), ('mach', opciones.mach),
+                         ('h', opciones.altitud)):
+        if lista is not None:
+            valores[campo] = _enteros(lista)
+    casos = rejilla(**valores)
+    if opciones.instrumentacion is None:
+        return _ejecutar(opciones, casos)
+    with instrumentar() as medicion:
+        resultado = _ejecutar(opciones, casos)
+    guardar_resumen(opciones.instrumentacion, medicion)
+    return resultado
+
+
+if __name__ == '__main__':
+    main()
 
 
 #Como resumen:
@@ -7,10 +7,16 @@ Funciones que nos dan los coeficientes aerodinámicos del avión F4.
 Coeficientes aerodinámicos de sustentación y de resistencia y todo aquello
 relacionado con los mismos.
 
+Las funciones terminadas en _array evalúan los mismos coeficientes para
+vectores de Mach (ndarray de NumPy), eligiendo el tramo de cada polinomio
+con máscaras.
+
 """
 
 from math import radians, pi, cos
 
+import numpy as np
+
 
 #-------------------CARACTERÍSTICAS GEOMÉTRICAS DEL VEHÍCULO-------------------
 
@@ -33,6 +39,9 @@ M_C = 1 - (.065 * (cos(FLECHA))**.6) * (100 * ESPESOR)**.637814
 # Mach crítico.
 M_D = 1.08 * M_C  # Mach de divergencia.
 M_D098 = .98 * M_D
+CD0_MACH2 = -.019 * 2 + .0839
+# CD0 a Mach 2.  La gráfica no llega más allá, así que se mantiene constante
+# para Mach superiores.
 
 
 def cl_alfa(mach):
@@ -90,6 +99,8 @@ def cd0(mach):
         cd_0 = .0478
     elif 1.9 < mach <= 2:
         cd_0 = -.019 * mach + .0839
+    else:
+        cd_0 = CD0_MACH2
     return cd_0
 
 
@@ -124,3 +135,55 @@ def sustentacion(vel, dens, c_l):
     '''Fuerza aerodinámica de sustentación total.
     '''
     return .5 * dens * S_W * c_l * vel**2
+
+
+#---------------------------VERSIONES VECTORIZADAS----------------------------
+
+def cl_alfa_array(mach):
+    '''Pendiente del coeficiente de sustentación para un vector de Mach.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    return np.select([mach <= .8, mach < 1.05],
+                     [-3.4102 * mach**5 + 1.9918 * mach**4 + 2.9597 * mach**3
+                      - 1.6251 * mach**2 + .4172 * mach + 2.7915,
+                      4.1216 * mach**3 - 13.25 * mach**2 + 14.343 * mach
+                      - 1.8055],
+                     .7534 * mach**3 - 4.2913 * mach**2 + 6.5935 * mach
+                     + .3476)
+
+
+def angulo_ataque_array(alfa_posible, mach):
+    '''Ángulo de ataque limitado por el de entrada en pérdida para vectores
+    de ángulo de ataque y Mach.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    angulo_perdida = np.where(mach < .4, radians(16),
+                              np.radians(.8262 * mach**3 - .37724 * mach**2
+                                         - 6.4264 * mach + 18.05))
+    return np.where(alfa_posible < angulo_perdida, alfa_posible,
+                    angulo_perdida)
+
+
+def cd0_array(mach):
+    '''CD0 del avión para un vector de Mach.  Por encima de Mach 2 se
+    mantiene el valor de Mach 2, igual que en cd0.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    return np.select([mach <= .85, mach <= 1, mach <= 1.05, mach <= 1.2,
+                      mach <= 1.32, mach <= 1.5, mach <= 1.9, mach <= 2],
+                     [.0277, .1287 * mach - .0817, .036 * mach + .011,
+                      .014 * mach + .0341, -.0058 * mach + .0579,
+                      -.0133 * mach + .0678, .0478, -.019 * mach + .0839],
+                     CD0_MACH2)
+
+
+def k_array(mach):
+    '''Coeficiente de resistencia inducida para un vector de Mach.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    fos = .005 * (1 + 1.5 * (ESTRECHAMIENTO - .6)**2)
+    e_mach = 1 / ((1 + .12 * mach**2) * (1 + (.1 * (3 * NE + 1)) / (4 + AR)
+                                         + (.142 + fos * AR * (10
+                                                               * ESPESOR)**.33)
+                                         / (cos(FLECHA2)**2)))
+    return 1 / (e_mach * pi * AR)
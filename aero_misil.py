@@ -7,10 +7,17 @@ Funciones que nos dan los coeficientes aerodinámicos del cohete REOS.
 Coeficientes aerodinámicos de resistencia y todo aquello relacionado con
 los mismos.
 
+Las funciones terminadas en _array evalúan los mismos coeficientes para
+vectores de Mach, altitud o número de Reynolds (ndarray de NumPy).  Los tramos
+de los polinomios y la transición laminar/turbulenta se eligen con máscaras.
+
 """
 
 from math import log10, pi, degrees, atan
-from modeloISA import GAMMA, density, temperature, R_AIR, viscosity
+
+import numpy as np
+
+from modeloISA import GAMMA, atmosphere, atmosphere_array
 
 
 #--------------------CARACTERÍSTICAS GEOMÉTRICAS DEL MISIL--------------------
@@ -67,13 +74,13 @@ def coef_resistencia_base_misil(mach):
         x_2 = .028812
         x_3 = 0
         x_4 = 0
-    elif mach > 2.2:
+    elif mach <= 3.5:
         x_0 = .18481
         x_1 = -.022895
         x_2 = .0051876
         x_3 = -.00040742
         x_4 = 0
-    elif mach > 3.5:
+    else:
         return .15
     return x_4 * mach**4 + x_3 * mach**3 + x_2 * mach**2 + x_1 * mach + x_0
 
@@ -163,13 +170,20 @@ def cf_aletas(reyn_aleta, mach):
 def cdll(machl, alt):
     '''Coeficiente de resistencia total del misil.
     '''
-    vel = machl * (GAMMA * R_AIR * temperature(alt))**.5
+    _, rho, _, mu_visc, v_sonido = atmosphere(alt)
+    return cdll_estado(machl, machl * v_sonido, rho, mu_visc)
+
+def cdll_estado(machl, vel, rho, mu_visc):
+    '''Coeficiente de resistencia total del misil a partir del estado del
+    flujo ya conocido: Mach, velocidad (m/s), densidad (kg/m3) y viscosidad
+    (Pa s).  Evita volver a calcular la atmósfera cuando el bucle de
+    integración ya la tiene.
+    '''
     #CÁLCULO DEL COEFICIENTE DE RESISTENCIA BASE.
     cd_base_misil = coef_resistencia_base_misil(machl) * RATIO_AREAS
-    re_cono = density(alt) * vel * LONGITUD_CONO / viscosity(alt)
+    re_cono = rho * vel * LONGITUD_CONO / mu_visc
     # Número de Reynolds en el cono.
-    re_cil = density(alt) * vel * (LONGITUD_MISIL
-                                   - LONGITUD_CONO) / viscosity(alt)
+    re_cil = rho * vel * (LONGITUD_MISIL - LONGITUD_CONO) / mu_visc
     # Número de Reynolds en el cilindro.
     #CÁLCULO DEL COEFICIENTE DE FRICCIÓN TOTAL REFERIDO A LA SUPERFICIE
     # TRANSVERSAL.
@@ -183,9 +197,124 @@ def cdll(machl, alt):
     #RESISTENCIA DE LAS ALETAS.
     ##COEFICIENTE DE ONDA.
     cd_onda_aletas = cd_wave_aletas(machl)
-    re_aletas = density(alt) * vel * CRAIZ_ALETA / viscosity(alt)
+    re_aletas = rho * vel * CRAIZ_ALETA / mu_visc
     # Número de Reynolds en las aletas.
     #COEFICIENTE DE FRICCIÓN DE LAS ALETAS.
     cdfriccion_aletas = cf_aletas(re_aletas, machl)
     return (cd_base_misil + cd_friccion + cd_onda + cd_onda_aletas
             + cdfriccion_aletas)
+
+
+#---------------------------VERSIONES VECTORIZADAS----------------------------
+
+MACH_TRAMOS_BASE = (.8, 1, 1.1, 1.5, 2.2)
+# Mach de inicio de cada tramo del polinomio de resistencia base.
+COEF_TRAMOS_BASE = np.array([
+    [0, 0, 0, 0, 0],
+    [0, 2.96129532, -7.30548391, 6.05972764, -1.548523],
+    [4680.59822, -19764.4892, 31277.4812, -21984.3314, 5790.90984],
+    [-1.67398037, 8.771665, -16.9678524, 14.2267421, -4.11856506],
+    [0, 0, .028812, -.13258, .30748],
+    [0, -.00040742, .0051876, -.022895, .18481]]).T.copy()
+# Coeficientes de cada tramo.  La fila j guarda x_(4-j) de todos los tramos.
+
+def coef_resistencia_base_misil_array(mach):
+    '''Coeficiente de resistencia base del misil para un vector de Mach.  El
+    polinomio de cada tramo se evalúa por Horner con sus coeficientes.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    tramo = np.searchsorted(MACH_TRAMOS_BASE, mach, side='right')
+    cd_base = COEF_TRAMOS_BASE[0][tramo]
+    for coef in COEF_TRAMOS_BASE[1:]:
+        cd_base = cd_base * mach + coef[tramo]
+    return np.where(mach > 3.5, .15, cd_base)
+
+def _factores_compresibilidad(mach):
+    '''Divisores de compresibilidad del coeficiente de fricción en régimen
+    laminar y turbulento.  Son comunes a todas las superficies del misil.
+    '''
+    return ((1 + .17 * mach**2)**.1295,
+            (1 + (GAMMA - 1) / 2 * mach**2)**.467)
+
+def _friccion_array(reyn, compresibilidad):
+    '''Coeficiente de fricción medio compresible para un vector de números
+    de Reynolds.  Es la fórmula común de cfcono_misil, cfcil y cf_aletas antes
+    de referirla a la superficie transversal.
+    '''
+    reyn = np.asarray(reyn, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #LAMINAR.
+        cfm_laminar = 2 * .664 * reyn**(-1 / 2) / compresibilidad[0]
+        #TURBULENTO.
+        log_re = np.log10(reyn)
+        cfm_turbulento = (.288 / log_re**2.45 * 1.597 / log_re**.15
+                          / compresibilidad[1])
+    return np.where(reyn < 1e6, cfm_laminar, cfm_turbulento)
+
+def cfcono_misil_array(re_cono, machl):
+    '''Coeficiente de fricción del cono para vectores de Reynolds y Mach.
+    '''
+    return (_friccion_array(re_cono, _factores_compresibilidad(machl))
+            * SUP_CONO / SREF_MISIL)
+
+def cfcil_array(re_cilindro, machl):
+    '''Coeficiente de fricción del cilindro para vectores de Reynolds y
+    Mach.
+    '''
+    return (_friccion_array(re_cilindro, _factores_compresibilidad(machl))
+            * SUP_TOTAL / SREF_MISIL)
+
+def cd_wave_array(mach, angulo, cd_f):
+    '''Coeficiente de onda del misil para vectores de Mach y de coeficiente
+    de fricción.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    ratio = LONGITUD_CONO / DIAMETRO_M
+    with np.errstate(divide='ignore'):
+        supersonico = (.083 + .096 / mach**2) * (angulo / 10)**1.69
+    return np.where(mach >= 1, supersonico,
+                    (60 / ratio**3 + .0025 * ratio) * cd_f)
+
+def cd_wave_aletas_array(mach):
+    '''Coeficiente de onda de las aletas para un vector de Mach.
+    '''
+    mach = np.asarray(mach, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        supersonico = 4 * TAO_ALETA**2 / (mach**2 - 1)**.5 * (SWTOTAL_ALETAS
+                                                              / SREF_MISIL)
+    return np.where(mach >= 1, supersonico, 0)
+
+def cf_aletas_array(reyn_aleta, mach):
+    '''Coeficiente de fricción de las aletas para vectores de Reynolds y
+    Mach.
+    '''
+    return (_friccion_array(reyn_aleta, _factores_compresibilidad(mach))
+            * SWTOTAL_ALETAS / SREF_MISIL)
+
+def cdll_array(machl, alt):
+    '''Coeficiente de resistencia total del misil para vectores de Mach y
+    altitud.
+    '''
+    machl = np.asarray(machl, dtype=float)
+    _, rho, _, mu_visc, v_sonido = atmosphere_array(alt)
+    return cdll_estado_array(machl, machl * v_sonido, rho, mu_visc)
+
+def cdll_estado_array(machl, vel, rho, mu_visc):
+    '''Versión vectorizada de cdll_estado para vectores de Mach, velocidad,
+    densidad y viscosidad.
+    '''
+    machl = np.asarray(machl, dtype=float)
+    cd_base_misil = coef_resistencia_base_misil_array(machl) * RATIO_AREAS
+    re_unitario = rho * vel / mu_visc  # Número de Reynolds por metro.
+    compresibilidad = _factores_compresibilidad(machl)
+    cd_friccion = (_friccion_array(re_unitario * LONGITUD_CONO,
+                                   compresibilidad) * SUP_CONO
+                   + _friccion_array(re_unitario * (LONGITUD_MISIL
+                                                    - LONGITUD_CONO),
+                                     compresibilidad) * SUP_TOTAL) / SREF_MISIL
+    cdfriccion_aletas = (_friccion_array(re_unitario * CRAIZ_ALETA,
+                                         compresibilidad) * SWTOTAL_ALETAS
+                         / SREF_MISIL)
+    return (cd_base_misil + cd_friccion
+            + cd_wave_array(machl, ANGULO_CONO, cd_friccion)
+            + cd_wave_aletas_array(machl) + cdfriccion_aletas)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Almacén de resultados de casos direccionado por contenido.  La tabla de
+resultados de cada caso (ver simulacion.simular_caso) se guarda en un fichero
+llamado con su clave: la huella (ver huella.py) de los parámetros del caso,
+de las opciones de cálculo que cambian el resultado (integrador, tabla de Cd,
+motor y umbral de la costa kepleriana) y del código fuente del modelo.  Si
+cambia cualquiera de ellos, la clave es otra y el caso se vuelve a simular;
+el resultado antiguo se queda en el almacén sin usarse.
+
+Cada caso terminado se apunta en un diario (una línea JSON por caso, que se
+añade al final del fichero) después de escribir su tabla.  Un barrido
+interrumpido se puede repetir: los casos del diario se recuperan del almacén
+y sólo se simulan los que faltan (ver barrido.ejecutar_barrido).  Una línea a
+medio escribir por la interrupción se ignora.
+
+Las trayectorias (ver trayectorias.py) no se guardan en el almacén: los casos
+recuperados no las vuelven a escribir.
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+from huella import huella_fuentes, version_modelo
+from simulacion import cargar_resultados
+
+
+DIARIO = 'diario.jsonl'  # Nombre del diario de casos terminados.
+
+
+def clave_caso(caso, metodo='euler', usar_tabla_cd=False, motor='numpy',
+               q_costa=None, version=None):
+    '''Clave del caso (simulacion.Caso) en el almacén.  version es la huella
+    del modelo; si no se da, se calcula (ver huella.version_modelo).
+    '''
+    if version is None:
+        version = version_modelo()
+    #Los parámetros se pasan a float para que 2156 y 2156.0 den la misma
+    # clave.
+    return huella_fuentes((), (version, tuple(map(float, caso)), metodo,
+                               bool(usar_tabla_cd), motor,
+                               float(q_costa or 0)))
+
+
+def ruta_caso(directorio, clave):
+    '''Fichero .npy de la tabla del caso de clave dada.
+    '''
+    return os.path.join(directorio, clave + '.npy')
+
+
+def leer_diario(directorio):
+    '''Diccionario de clave a entrada del diario de los casos terminados cuya
+    tabla está en el almacén.
+    '''
+    completados = {}
+    try:
+        with open(os.path.join(directorio, DIARIO)) as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    continue  # Línea incompleta de una ejecución interrumpida.
+                if os.path.exists(ruta_caso(directorio, entrada['clave'])):
+                    completados[entrada['clave']] = entrada
+    except FileNotFoundError:
+        pass
+    return completados
+
+
+def guardar_caso(directorio, clave, caso, tabla):
+    '''Guarda la tabla de resultados del caso y lo apunta en el diario.  La
+    tabla se escribe en un fichero temporal que se renombra al terminar, de
+    modo que el almacén nunca tiene tablas a medias, y la línea del diario se
+    escribe de una vez, así que varios procesos pueden compartir el almacén.
+    '''
+    os.makedirs(directorio, exist_ok=True)
+    temporal = ruta_caso(directorio, clave) + '.%d.tmp.npy' % os.getpid()
+    np.save(temporal, tabla)
+    os.replace(temporal, ruta_caso(directorio, clave))
+    linea = json.dumps({'clave': clave, 'caso': caso._asdict()}) + '\n'
+    with open(os.path.join(directorio, DIARIO), 'a') as f:
+        f.write(linea)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def cargar_caso(directorio, clave):
+    '''Tabla de resultados del caso de clave dada, proyectada en memoria.
+    '''
+    return cargar_resultados(ruta_caso(directorio, clave))
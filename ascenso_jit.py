@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Núcleo compilado del ascenso del misil.  El bucle de Euler del ascenso, con la
+atmósfera ISA y el coeficiente de resistencia del misil que evalúa en cada
+paso, se escribe aquí con escalares para que Numba lo compile (@njit).  Si
+Numba está instalado, ascenso_lote_jit integra cada misil por separado en
+código compilado; si no, recurre a ascenso_lote (NumPy) sin más.
+
+El código compilado se guarda en disco (cache=True, en __pycache__), de modo
+que sólo la primera ejecución paga el tiempo de compilación.
+
+Las ecuaciones y el orden de las operaciones son los de ascenso_lote, y el
+coeficiente de resistencia se calcula como en aero_misil.cdll_estado_array.
+Los resultados coinciden con los de ascenso_lote salvo por el redondeo de las
+funciones trigonométricas y potencias, que no son las mismas en NumPy y en
+Numba; comprobar_paridad mide la diferencia, y "rendimiento.py referencias"
+la comprueba para los lanzamientos del giro del caso por defecto.
+
+No admite la tabla de Cd (tabla_cdll) ni el registro de trayectorias, que
+necesitan el generador pasos_ascenso_lote.
+
+"""
+
+from math import cos, sin, exp, log10
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+from modeloISA import H_BASE, ALFA_BASE, T_BASE, RHO_BASE, EXP_BASE
+from modeloISA import R_AIR, GAMMA, BETA_VISC, S_VISC
+from modeloISA import GRAV as GRAV_ISA
+from modelo_gravedad import GRAV, MU, RT
+from aero_misil import SREF_MISIL, RATIO_AREAS, LONGITUD_CONO, LONGITUD_MISIL
+from aero_misil import SUP_CONO, SUP_TOTAL, SWTOTAL_ALETAS, CRAIZ_ALETA
+from aero_misil import TAO_ALETA, ANGULO_CONO, DIAMETRO_M
+from aero_misil import MACH_TRAMOS_BASE, COEF_TRAMOS_BASE
+from ascenso_lote import ascenso_lote, ResultadoAscenso, MASA_MISIL
+from ascenso_lote import ALTURA_FINAL
+
+
+NUMBA = njit is not None  # Si es True, el núcleo está compilado.
+
+#Tablas como tuplas de reales: Numba las toma como constantes y se indexan
+# deprisa también sin compilar.
+_H_BASE = tuple(map(float, H_BASE))
+_ALFA_BASE = tuple(map(float, ALFA_BASE))
+_T_BASE = tuple(map(float, T_BASE))
+_RHO_BASE = tuple(map(float, RHO_BASE))
+_EXP_BASE = tuple(map(float, EXP_BASE))
+_N_CAPAS = len(H_BASE)
+_MACH_TRAMOS = tuple(map(float, MACH_TRAMOS_BASE))
+_COEF_TRAMOS = tuple(tuple(fila) for fila in COEF_TRAMOS_BASE.tolist())
+_RATIO_CONO = LONGITUD_CONO / DIAMETRO_M
+_CD_ONDA_SUBSONICO = 60 / _RATIO_CONO**3 + .0025 * _RATIO_CONO
+_FACTOR_ANGULO = (ANGULO_CONO / 10)**1.69
+
+
+def _compilar(funcion):
+    '''Compila funcion con Numba, guardando el resultado en disco, o la
+    devuelve tal cual si Numba no está instalado.
+    '''
+    if NUMBA:
+        return njit(cache=True)(funcion)
+    return funcion
+
+
+@_compilar
+def _atmosfera(alt):
+    '''Densidad (kg/m3), viscosidad (Pa s) y velocidad del sonido (m/s) de la
+    ISA, como en modeloISA.atmosphere.
+    '''
+    i = 0
+    while i < _N_CAPAS - 1 and _H_BASE[i + 1] <= alt:
+        i += 1
+    temp = _T_BASE[i] + _ALFA_BASE[i] * (alt - _H_BASE[i])
+    if _ALFA_BASE[i] == 0:
+        rho = _RHO_BASE[i] * exp(-GRAV_ISA * (alt - _H_BASE[i])
+                                 / (R_AIR * temp))
+    else:
+        rho = _RHO_BASE[i] * (temp / _T_BASE[i])**_EXP_BASE[i]
+    return (rho, BETA_VISC * temp**(3 / 2) / (temp + S_VISC),
+            (GAMMA * R_AIR * temp)**.5)
+
+
+@_compilar
+def _friccion(reyn, compresibilidad_laminar, compresibilidad_turbulenta):
+    '''Coeficiente de fricción medio compresible (ver
+    aero_misil._friccion_array).
+    '''
+    if reyn < 1e6:
+        return 2 * .664 * reyn**(-1 / 2) / compresibilidad_laminar
+    log_re = log10(reyn)
+    return (.288 / log_re**2.45 * 1.597 / log_re**.15
+            / compresibilidad_turbulenta)
+
+
+@_compilar
+def _cdll(machl, vel, rho, mu_visc):
+    '''Coeficiente de resistencia total del misil, como
+    aero_misil.cdll_estado_array.
+    '''
+    if machl > 3.5:
+        cd_base = .15
+    else:
+        tramo = 0
+        while tramo < len(_MACH_TRAMOS) and _MACH_TRAMOS[tramo] <= machl:
+            tramo += 1
+        cd_base = _COEF_TRAMOS[0][tramo]
+        for j in range(1, 5):
+            cd_base = cd_base * machl + _COEF_TRAMOS[j][tramo]
+    re_unitario = rho * vel / mu_visc  # Número de Reynolds por metro.
+    laminar = (1 + .17 * machl**2)**.1295
+    turbulento = (1 + (GAMMA - 1) / 2 * machl**2)**.467
+    cd_friccion = (_friccion(re_unitario * LONGITUD_CONO, laminar,
+                             turbulento) * SUP_CONO
+                   + _friccion(re_unitario * (LONGITUD_MISIL - LONGITUD_CONO),
+                               laminar, turbulento) * SUP_TOTAL) / SREF_MISIL
+    cdfriccion_aletas = (_friccion(re_unitario * CRAIZ_ALETA, laminar,
+                                   turbulento) * SWTOTAL_ALETAS / SREF_MISIL)
+    if machl >= 1:
+        cd_onda = (.083 + .096 / machl**2) * _FACTOR_ANGULO
+        cd_onda_aletas = (4 * TAO_ALETA**2 / (machl**2 - 1)**.5
+                          * (SWTOTAL_ALETAS / SREF_MISIL))
+    else:
+        cd_onda = _CD_ONDA_SUBSONICO * cd_friccion
+        cd_onda_aletas = 0.
+    return (cd_base * RATIO_AREAS + cd_friccion + cd_onda + cd_onda_aletas
+            + cdfriccion_aletas)
+
+
+@_compilar
+def _ascenso_misil(h, v, gama, empuje, gasto, t_combustion, masa, dtl,
+                   t_max):
+    '''Ascenso de un misil con Euler explícito, como ascenso_lote (t_max
+    infinito si no hay límite de tiempo).  Devuelve
+    tiempo (s), altitud (m), velocidad (m/s), Mach, ángulo de asiento (rad),
+    masa (kg) y posición horizontal (m) finales.
+    '''
+    _, _, v_sonido = _atmosfera(h)
+    tl = 0.
+    thetal = gama
+    yl = h
+    vxl = v * cos(gama)
+    vyl = v * sin(gama)
+    xl = 0.
+    vl = v
+    mach = v / v_sonido
+    dxl = dyl = dthetal = dvxl = dvyl = 0.
+    while thetal > 0 and yl < ALTURA_FINAL and tl < t_max:
+        tl = tl + dtl
+        xl = xl + dxl
+        yl = yl + dyl
+        thetal = thetal + dthetal
+        vxl = vxl + dvxl
+        vyl = vyl + dvyl
+        vl = (vxl**2 + vyl**2)**.5
+        g0 = MU / (RT + yl)**2
+        rho, mu_visc, v_sonido = _atmosfera(yl)
+        mach = vl / v_sonido
+        d_misil = .5 * rho * _cdll(mach, vl, rho, mu_visc) * SREF_MISIL * vl**2
+        cos_theta = cos(thetal)
+        sin_theta = sin(thetal)
+        dvxl = -d_misil * cos_theta / masa * dtl
+        dvyl = -g0 * dtl - d_misil * sin_theta / masa * dtl
+        if tl <= t_combustion:
+            dvxl = dvxl + empuje * cos_theta * dtl / masa
+            dvyl = dvyl + empuje * sin_theta * dtl / masa
+            masa = masa - gasto * dtl
+        dthetal = -dtl * g0 * cos_theta / vl
+        dxl = vxl * dtl
+        dyl = vyl * dtl
+    return tl, yl, vl, mach, thetal, masa, xl
+
+
+@_compilar
+def _ascenso_lote(h, v, gama, empuje, gasto, t_combustion, masa, dtl,
+                  t_max):
+    '''Ascenso de cada misil del lote, uno detrás de otro.  Devuelve una
+    matriz con una fila por campo de _ascenso_misil y una columna por misil.
+    '''
+    final = np.empty((7, h.size))
+    for i in range(h.size):
+        estado = _ascenso_misil(h[i], v[i], gama[i], empuje[i], gasto[i],
+                                t_combustion[i], masa[i], dtl, t_max)
+        for j in range(7):
+            final[j, i] = estado[j]
+    return final
+
+
+def _nucleo(h, v, gama, empuje_misil, gasto, t_combustion, masa_misil, dtl,
+            t_max=None):
+    '''Ascenso del lote con el núcleo de este módulo (compilado o no).
+    Devuelve el ResultadoAscenso.
+    '''
+    lote = [np.ascontiguousarray(x, dtype=float) for x in np.broadcast_arrays(
+        np.atleast_1d(np.asarray(h, dtype=float)), v, gama, empuje_misil,
+        gasto, t_combustion, masa_misil)]
+    tiempo, altitud, velocidad, mach, theta, masa, x = _ascenso_lote(
+        *lote, float(dtl), np.inf if t_max is None else float(t_max))
+    return ResultadoAscenso(tiempo, altitud, velocidad, mach,
+                            np.degrees(theta), masa,
+                            masa * (GRAV * altitud + velocidad**2 / 2), x)
+
+
+def ascenso_lote_jit(h, v, gama, empuje_misil, gasto, t_combustion,
+                     masa_misil=MASA_MISIL, dtl=.1, t_max=None):
+    '''Mismo cálculo que ascenso_lote (sin tabla de Cd) con el núcleo
+    compilado.  Si Numba no está instalado se usa ascenso_lote.
+    '''
+    if not NUMBA:
+        return ascenso_lote(h, v, gama, empuje_misil, gasto, t_combustion,
+                            masa_misil, dtl, t_max=t_max)
+    return _nucleo(h, v, gama, empuje_misil, gasto, t_combustion, masa_misil,
+                   dtl, t_max)
+
+
+def comprobar_paridad(h, v, gama, empuje_misil, gasto, t_combustion,
+                      masa_misil=MASA_MISIL, dtl=.1):
+    '''Diferencia relativa máxima de cada campo del ResultadoAscenso entre el
+    núcleo de este módulo (compilado si Numba está instalado, interpretado si
+    no) y ascenso_lote.  Devuelve un diccionario campo: diferencia.
+    '''
+    referencia = ascenso_lote(h, v, gama, empuje_misil, gasto, t_combustion,
+                              masa_misil, dtl)
+    nucleo = _nucleo(h, v, gama, empuje_misil, gasto, t_combustion,
+                     masa_misil, dtl)
+    return {campo: float(np.max(np.abs(a - b)
+                                / np.maximum(np.abs(b), 1e-300)))
+            for campo, a, b in zip(ResultadoAscenso._fields, nucleo,
+                                   referencia)}
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Integración en lote del ascenso del misil.  En lugar de integrar un
+lanzamiento detrás de otro, todos los puntos de lanzamiento de la maniobra de
+giro avanzan a la vez como un único vector de estado de NumPy.  Cada misil sale
+del lote cuando se cumple su propia condición de parada (ángulo de asiento no
+positivo o altitud final alcanzada) y se guarda su estado final.
+
+Las ecuaciones y el orden de las actualizaciones son los mismos que los del
+bucle escalar de Modelo_avion_misil_var_masa.py (Euler explícito con paso
+dtl), de modo que los resultados coinciden con los de ese bucle.
+
+Opcionalmente (q_costa), una vez terminada la combustión y cuando la presión
+dinámica baja de un umbral, la resistencia se desprecia y el resto del vuelo
+se resuelve en forma cerrada (costa_kepleriana) en lugar de seguir
+integrando: la velocidad horizontal se conserva y la vertical sigue el
+movimiento radial de Kepler en el campo de modelo_gravedad, que es el de las
+ecuaciones del bucle.  El estado final se obtiene directamente en el
+instante en que el ángulo de asiento se anula (apogeo) o se alcanza
+ALTURA_FINAL.  En las costas largas, por encima de unos 100 km, esto ahorra
+la mayor parte de los pasos; el resultado difiere del de Euler en lo que
+difiere la solución exacta de la de Euler más la resistencia despreciada.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from modeloISA import atmosphere_array
+from modelo_gravedad import GRAV, MU, RT
+from aero_misil import cdll_estado_array, SREF_MISIL
+from tabla_cdll import cd_tabla_array
+from instrumentacion import contar
+
+
+MASA_MISIL = 1000  # Masa total del misil (kg).
+ALTURA_FINAL = 500000  # Altitud a la que se da por terminado el ascenso (m).
+
+ResultadoAscenso = namedtuple('ResultadoAscenso', 'tiempo altitud velocidad '
+                              'mach theta masa emecanica x')
+# Estado final de cada misil: tiempo (s), altitud (m), velocidad (m/s), Mach,
+# ángulo de asiento (deg), masa (kg), energía mecánica (J) y posición
+# horizontal (m).  Cada campo es un vector con un elemento por lanzamiento.
+
+Q_COSTA = 1.
+# Umbral de presión dinámica (Pa) propuesto para pasar a la costa kepleriana.
+MOTORES = ('numpy', 'jit')
+# Implementaciones del ascenso con Euler: este lote vectorizado o el núcleo
+# compilado de ascenso_jit (ascenso_lote_jit).
+
+PasoAscenso = namedtuple('PasoAscenso', 'indice t x h v theta masa '
+                         'resistencia')
+#Estado de los misiles en vuelo en un paso de la integración: posición de cada
+# uno en el lote, tiempo (s), posición horizontal (m), altitud (m), velocidad
+# (m/s), ángulo de asiento (rad), masa (kg) y resistencia (N).
+
+
+def costa_kepleriana(y, vx, vy):
+    '''Vuelo sin empuje ni resistencia desde la altitud y (m) con velocidad
+    horizontal vx y vertical vy (m/s) hasta el apogeo o hasta ALTURA_FINAL,
+    lo que llegue antes.  Devuelve la duración (s), el desplazamiento
+    horizontal (m), la altitud final (m) y la velocidad vertical final (m/s).
+
+    La altitud sigue la órbita radial r = RT + y de energía
+    e = vy**2 / 2 - MU / r.  Si e < 0, r = a (1 - cos(eta)) y
+    t = (a**3 / MU)**.5 (eta - sin(eta)) con a = -MU / (2 e), y el apogeo es
+    eta = pi; si no, r = a (cosh(eta) - 1) y t = (a**3 / MU)**.5
+    (sinh(eta) - eta) con a = MU / (2 e).
+    '''
+    y, vx, vy = np.broadcast_arrays(np.asarray(y, dtype=float), vx, vy)
+    r = RT + y
+    energia = vy**2 / 2 - MU / r
+    a = MU / (2 * np.abs(energia))
+    r_fin = np.where(energia < 0, np.minimum(2 * a, RT + ALTURA_FINAL),
+                     RT + ALTURA_FINAL)
+    eliptica = energia < 0
+    with np.errstate(invalid='ignore'):
+        eta = np.where(eliptica, np.arccos(np.clip(1 - r / a, -1, 1)),
+                       np.arccosh(np.maximum(1 + r / a, 1)))
+        eta_fin = np.where(eliptica, np.arccos(np.clip(1 - r_fin / a, -1, 1)),
+                           np.arccosh(np.maximum(1 + r_fin / a, 1)))
+        anomalia = np.where(eliptica, eta - np.sin(eta), np.sinh(eta) - eta)
+        anomalia_fin = np.where(eliptica, eta_fin - np.sin(eta_fin),
+                                np.sinh(eta_fin) - eta_fin)
+    duracion = np.where(vy > 0, (a**3 / MU)**.5 * (anomalia_fin - anomalia),
+                        0)
+    # Si el misil ya no sube, el apogeo es el estado de partida.
+    y_fin = np.where(vy > 0, r_fin - RT, y)
+    vy_fin = np.where(vy > 0,
+                      np.maximum(2 * (energia + MU / r_fin), 0)**.5, vy)
+    return duracion, vx * duracion, y_fin, vy_fin
+
+
+def pasos_ascenso_lote(h, v, gama, empuje_misil, gasto, t_combustion,
+                       masa_misil=MASA_MISIL, dtl=.1, tabla_cd=None,
+                       escala_cd=None, delta_t=None, q_costa=None,
+                       t_max=None):
+    '''Generador con el estado de los misiles en vuelo (PasoAscenso) en cada
+    paso del ascenso, empezando por el lanzamiento.  El último paso de cada
+    misil es su estado final, salvo para los que terminan con la costa
+    kepleriana (q_costa, ver ascenso_lote): su último paso es el inicio de la
+    costa.  Al agotarse devuelve el mismo ResultadoAscenso que ascenso_lote.
+    '''
+    if tabla_cd is not None and delta_t is not None:
+        raise ValueError('La tabla de Cd no admite desplazamientos de la '
+                         'temperatura de la ISA.')
+    h, v, gama, empuje_misil, gasto, t_combustion, masa_misil = (
+        np.broadcast_arrays(np.atleast_1d(np.asarray(h, dtype=float)), v,
+                            gama, empuje_misil, gasto, t_combustion,
+                            masa_misil))
+    n_misiles = h.size
+    if escala_cd is not None:
+        escala_cd = np.broadcast_to(np.asarray(escala_cd, dtype=float),
+                                    h.shape).copy()
+    if delta_t is not None:
+        delta_t = np.broadcast_to(np.asarray(delta_t, dtype=float),
+                                  h.shape).copy()
+    _, rho, _, mu_visc, v_sonido = atmosphere_array(h, delta_t)
+    # Atmósfera en el lanzamiento.
+    #Estado final de cada misil.  Los misiles que no llegan a entrar en el
+    # bucle conservan el estado de lanzamiento.
+    final = {'tiempo': np.zeros(n_misiles), 'altitud': h.astype(float),
+             'velocidad': v.astype(float),
+             'mach': v / v_sonido,
+             'theta': gama.astype(float), 'masa': masa_misil.astype(float),
+             'x': np.zeros(n_misiles)}
+    #Estado de los misiles que siguen en vuelo.  indice guarda la posición de
+    # cada uno de ellos en el lote original.
+    indice = np.arange(n_misiles)
+    thetal = gama.astype(float)
+    yl = h.astype(float)
+    vxl = v * np.cos(thetal)
+    vyl = v * np.sin(thetal)
+    xl = np.zeros(n_misiles)
+    masa = masa_misil.astype(float)
+    empuje = empuje_misil.astype(float)
+    gasto = gasto.astype(float)
+    t_combustion = t_combustion.astype(float)
+    dxl = dyl = dthetal = dvxl = dvyl = np.zeros(n_misiles)
+    vl = mach = None
+    tl = 0
+    if tabla_cd is None:
+        cdl = cdll_estado_array(v / v_sonido, v, rho, mu_visc)
+    else:
+        cdl = cd_tabla_array(tabla_cd, v / v_sonido, yl)
+    if escala_cd is not None:
+        cdl = cdl * escala_cd
+    d_misil = .5 * rho * cdl * SREF_MISIL * v**2
+    # Resistencia en el lanzamiento (N).
+    yield PasoAscenso(indice, tl, xl, yl, v, thetal, masa, d_misil)
+    while True:
+        sigue = (thetal > 0) & (yl < ALTURA_FINAL)
+        if t_max is not None:
+            sigue = sigue & (tl < t_max)
+        costa = None
+        if q_costa is not None and vl is not None:
+            #Misiles sin empuje y con presión dinámica baja: el resto del
+            # vuelo se resuelve en forma cerrada.
+            costa = sigue & (tl > t_combustion) & (.5 * rho * vl**2 < q_costa)
+            sigue = sigue & ~costa
+        if not sigue.all():
+            #Se guarda el estado final de los misiles que se detienen y se
+            # eliminan del lote.
+            para = ~sigue
+            i_para = indice[para]
+            final['tiempo'][i_para] = tl
+            final['altitud'][i_para] = yl[para]
+            final['theta'][i_para] = thetal[para]
+            final['masa'][i_para] = masa[para]
+            final['x'][i_para] = xl[para]
+            if vl is not None:
+                final['velocidad'][i_para] = vl[para]
+                final['mach'][i_para] = mach[para]
+            if costa is not None and costa.any():
+                i_costa = indice[costa]
+                duracion, dx, y_fin, vy_fin = costa_kepleriana(
+                    yl[costa], vxl[costa], vyl[costa])
+                v_fin = (vxl[costa]**2 + vy_fin**2)**.5
+                final['tiempo'][i_costa] = tl + duracion
+                final['altitud'][i_costa] = y_fin
+                final['theta'][i_costa] = np.arctan2(vy_fin, vxl[costa])
+                final['x'][i_costa] = xl[costa] + dx
+                final['velocidad'][i_costa] = v_fin
+                final['mach'][i_costa] = v_fin / atmosphere_array(
+                    y_fin, None if delta_t is None else delta_t[costa])[4]
+                contar('costas', i_costa.size)
+            if not sigue.any():
+                break
+            (indice, thetal, yl, vxl, vyl, xl, masa, empuje, gasto,
+             t_combustion, dxl, dyl, dthetal, dvxl, dvyl) = (
+                 x[sigue] for x in (indice, thetal, yl, vxl, vyl, xl, masa,
+                                    empuje, gasto, t_combustion, dxl, dyl,
+                                    dthetal, dvxl, dvyl))
+            if escala_cd is not None:
+                escala_cd = escala_cd[sigue]
+            if delta_t is not None:
+                delta_t = delta_t[sigue]
+        tl = tl + dtl  # Evolución temporal (s).
+        xl = xl + dxl  # Posición horizontal (m).
+        yl = yl + dyl  # Altitud (m).
+        thetal = thetal + dthetal  # Ángulo de asiento.
+        vxl = vxl + dvxl  # Componente horizontal de la velocidad (m/s).
+        vyl = vyl + dvyl  # Componente vertical de la velocidad (m/s).
+        vl = (vxl**2 + vyl**2)**.5  # Módulo de la velocidad (m/s).
+        g0 = MU / (RT + yl)**2  # Aceleración de la gravedad (m/s2).
+        _, rho, _, mu_visc, v_sonido = atmosphere_array(yl, delta_t)
+        mach = vl / v_sonido  # Mach de vuelo.
+        if tabla_cd is None:
+            cdl = cdll_estado_array(mach, vl, rho, mu_visc)
+        else:
+            cdl = cd_tabla_array(tabla_cd, mach, yl)
+        if escala_cd is not None:
+            cdl = cdl * escala_cd
+        d_misil = .5 * rho * cdl * SREF_MISIL * vl**2
+        # Fuerza de resistencia (N).
+        cos_theta = np.cos(thetal)
+        sin_theta = np.sin(thetal)
+        dvxl = -d_misil * cos_theta / masa * dtl
+        dvyl = -g0 * dtl - d_misil * sin_theta / masa * dtl
+        #Empuje y consumo de propulsante de los misiles que siguen en la fase
+        # propulsada.
+        propulsado = tl <= t_combustion
+        dvxl = np.where(propulsado,
+                        dvxl + empuje * cos_theta * dtl / masa, dvxl)
+        dvyl = np.where(propulsado,
+                        dvyl + empuje * sin_theta * dtl / masa, dvyl)
+        masa = np.where(propulsado, masa - gasto * dtl, masa)
+        dthetal = -dtl * g0 * cos_theta / vl
+        # Diferencial del ángulo de asiento.
+        dxl = vxl * dtl  # Diferencial de la posición horizontal (m).
+        dyl = vyl * dtl  # Diferencial de la altitud (m).
+        contar('pasos', yl.size)
+        yield PasoAscenso(indice, tl, xl, yl, vl, thetal, masa, d_misil)
+    final['emecanica'] = final['masa'] * (GRAV * final['altitud']
+                                          + final['velocidad']**2 / 2)
+    final['theta'] = np.degrees(final['theta'])
+    return ResultadoAscenso(**final)
+
+
+def ascenso_lote(h, v, gama, empuje_misil, gasto, t_combustion,
+                 masa_misil=MASA_MISIL, dtl=.1, tabla_cd=None, escala_cd=None,
+                 delta_t=None, q_costa=None, t_max=None):
+    '''Ascenso de un lote de misiles lanzados desde las altitudes h (m), con
+    velocidades v (m/s) y ángulos de asiento gama (rad).  Empuje (N), gasto
+    (kg/s), tiempo de combustión (s) y masa inicial (kg) pueden ser escalares
+    o vectores con un valor por misil.  Si se da tabla_cd (ver tabla_cdll), el
+    coeficiente de resistencia se interpola en ella.  escala_cd multiplica el
+    coeficiente de resistencia y delta_t (K) desplaza la temperatura de la
+    ISA (ver modeloISA.atmosphere_array); ambos pueden ser vectores con un
+    valor por misil.  Devuelve el estado final de cada misil
+    (ResultadoAscenso).
+
+    Si se da q_costa (Pa, p. ej. Q_COSTA), cada misil que ha terminado la
+    combustión y vuela con presión dinámica menor que q_costa deja de
+    integrarse y su estado final se calcula con costa_kepleriana.
+
+    Si se da t_max (s), los misiles que siguen en vuelo en ese instante se
+    detienen y su estado final es el de ese paso (tiempo >= t_max).
+    '''
+    return agotar(pasos_ascenso_lote(h, v, gama, empuje_misil, gasto,
+                                     t_combustion, masa_misil, dtl, tabla_cd,
+                                     escala_cd, delta_t, q_costa, t_max))
+
+
+def agotar(pasos):
+    '''Recorre el generador pasos hasta el final y devuelve su valor de
+    retorno.
+    '''
+    while True:
+        try:
+            next(pasos)
+        except StopIteration as fin:
+            return fin.value
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Barrido de parámetros en paralelo.  Cada caso (ver simulacion.Caso) se
+simula en un proceso de un ProcessPoolExecutor y escribe su propio fichero de
+resultados (ver simulacion.simular_caso).
+
+El giro del avión sólo depende de la configuración del avión (altitud, Mach
+y beta), no del misil.  Antes de repartir los casos se integra una sola vez
+el giro de cada configuración distinta y todos los giros se dejan, como un
+único array de sólo lectura, en un bloque de memoria compartida
+(multiprocessing.shared_memory).  Cada proceso lo lee directamente, sin
+copiarlo ni recibirlo serializado, y cada caso recibe sólo el tramo del array
+que le corresponde.
+
+Los casos no tienen el mismo coste: los que llegan a costear hasta 500 km
+integran muchos más pasos que los que terminan pronto.  Para equilibrar la
+carga se envían primero los casos de mayor coste estimado y cada proceso toma
+un nuevo caso en cuanto termina el anterior (planificación LPT).  Cada caso es
+independiente del resto, así que los resultados no dependen del orden en que
+se ejecuten ni del número de procesos.
+
+En lugar de un fichero por caso, los resultados de todo el barrido se pueden
+reunir en un único fichero .npy (el sumidero).  Su tamaño se conoce antes de
+empezar (una fila por punto de lanzamiento de cada caso, esto es, por punto
+de su giro), así que el proceso principal lo crea de una vez, cada proceso lo
+proyecta en memoria y escribe las filas de su caso directamente en el tramo
+que le corresponde, y al terminar el proceso principal lo lee proyectado en
+memoria, sin copias ni resultados serializados entre procesos.
+
+Con un almacén de resultados (ver almacen.py), cada caso terminado se guarda
+en él y se apunta en su diario.  Si el barrido se interrumpe, al repetirlo los
+casos ya terminados, con los mismos parámetros y la misma versión del modelo,
+se recuperan del almacén y sólo se simulan los demás.
+
+"""
+
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from math import log
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ascenso_lote import MASA_MISIL
+from simulacion import Caso, simular_caso, simulate_pullup, trayectoria_giro
+from simulacion import InitialState, PullupParams, TIPO_GIRO
+from simulacion import TIPO_RESULTADOS, cargar_resultados
+from simulacion import escribir_resultados
+from tabla_cdll import cargar_tabla, DIRECTORIO_CACHE
+from cache_ascenso import crear_cache, persistir
+from almacen import clave_caso, leer_diario, guardar_caso
+from almacen import cargar_caso, ruta_caso
+from huella import version_modelo
+import instrumentacion
+
+
+def rejilla(**valores):
+    '''Lista de casos con todas las combinaciones de los valores dados para
+    cada parámetro de Caso, p. ej. rejilla(isp=[2156, 2256], gasto=[50, 60]).
+    Los parámetros no indicados toman su valor por defecto.  La masa de
+    propulsante debe ser positiva y menor que la del misil (MASA_MISIL).
+    '''
+    fuera = [m for m in valores.get('masa_propulsante', ())
+             if not 0 < m < MASA_MISIL]
+    if fuera:
+        raise ValueError('La masa de propulsante debe estar entre 0 y %g kg '
+                         '(masa del misil): %s.'
+                         % (MASA_MISIL, ', '.join('%g' % m for m in fuera)))
+    campos = list(valores)
+    return [Caso(**dict(zip(campos, combinacion)))
+            for combinacion in product(*(valores[c] for c in campos))]
+
+
+def nombres_ficheros(casos):
+    '''Nombre del fichero de cada caso.  Si en el barrido sólo varía el Isp se
+    mantiene el nombre de siempre (el valor del Isp); si no, el nombre lleva
+    todos los parámetros que varían.
+    '''
+    varian = [campo for campo in Caso._fields
+              if len({getattr(caso, campo) for caso in casos}) > 1]
+    if set(varian) <= {'isp'}:
+        return [str(caso.isp) for caso in casos]
+    return ['_'.join('{0}{1}'.format(campo, getattr(caso, campo))
+                     for campo in varian) for caso in casos]
+
+
+def coste_estimado(caso):
+    '''Estimación relativa del coste de un caso.  Se toma el incremento de
+    velocidad ideal del misil (ecuación de Tsiolkovsky): cuanto mayor es,
+    más largo es el ascenso y más pasos se integran.
+    '''
+    return caso.isp * log(MASA_MISIL / (MASA_MISIL - caso.masa_propulsante))
+
+
+def clave_giro(caso):
+    '''Parámetros del caso de los que depende el giro del avión.
+    '''
+    return caso.h, caso.mach, caso.beta
+
+
+def calcular_giros(casos, metodo='euler'):
+    '''Giro de cada configuración distinta del avión de los casos, integrado
+    una sola vez.  Devuelve un array (simulacion.TIPO_GIRO) con todos los
+    giros seguidos y un diccionario con el tramo (inicio, fin) de cada
+    configuración (ver clave_giro) en él.
+    '''
+    giros = []
+    tramos = {}
+    inicio = 0
+    for clave in dict.fromkeys(clave_giro(caso) for caso in casos):
+        h, mach, beta = clave
+        with instrumentacion.fase('giro'):
+            giros.append(trayectoria_giro(simulate_pullup(
+                InitialState(h, mach), PullupParams(beta, metodo=metodo))))
+        tramos[clave] = (inicio, inicio + len(giros[-1]))
+        inicio += len(giros[-1])
+    giros = (np.concatenate(giros) if giros
+             else np.empty(0, dtype=TIPO_GIRO))
+    giros.flags.writeable = False
+    return giros, tramos
+
+
+_TABLAS = {}
+# Tabla de Cd, caché de ascensos y giros ya cargados en cada proceso, para no
+# leerlos una vez por caso.
+
+
+def _adjuntar_giros(nombre, n_filas):
+    '''Inicialización de cada proceso del barrido: vista de sólo lectura de
+    los giros guardados en el bloque de memoria compartida nombre.
+    '''
+    memoria = shared_memory.SharedMemory(nombre)
+    giros = np.ndarray(n_filas, dtype=TIPO_GIRO, buffer=memoria.buf)
+    giros.flags.writeable = False
+    _TABLAS['memoria'] = memoria
+    # Se conserva para que el bloque siga proyectado mientras viva el proceso.
+    _TABLAS['giros'] = giros
+
+
+def crear_sumidero(ruta, casos, filas):
+    '''Crea el fichero .npy de resultados de todo el barrido, con filas[i]
+    filas (simulacion.TIPO_RESULTADOS) para el caso i, una por punto de
+    lanzamiento, y a su lado (ruta + '.json') el índice con los parámetros
+    de cada caso y su tramo [inicio, fin) de filas en el fichero.  Devuelve
+    la lista de tramos de los casos.
+    '''
+    inicio = 0
+    destinos = []
+    for n in filas:
+        destinos.append((inicio, inicio + n))
+        inicio += n
+    tabla = np.lib.format.open_memmap(ruta, mode='w+', dtype=TIPO_RESULTADOS,
+                                      shape=(inicio,))
+    del tabla  # Sólo se reserva el fichero; los procesos escriben en él.
+    with open(ruta + '.json', 'w') as f:
+        json.dump([dict(caso._asdict(), inicio=i, fin=j)
+                   for caso, (i, j) in zip(casos, destinos)], f, indent=1)
+        f.write('\n')
+    return destinos
+
+
+def _recuperar(directorio_almacen, clave, directorio, nombre, exportar_tsv,
+               destino):
+    '''Escribe los resultados de un caso ya terminado, guardados en el
+    almacén, donde los habría escrito _simular.  Devuelve lo mismo que
+    _simular.
+    '''
+    tabla = cargar_caso(directorio_almacen, clave)
+    ruta = os.path.join(directorio, nombre)
+    if exportar_tsv:
+        escribir_resultados(ruta, tabla)
+    if destino is None:
+        shutil.copyfile(ruta_caso(directorio_almacen, clave), ruta + '.npy')
+        return ruta + '.npy', {}, None
+    ruta_sumidero, inicio, fin = destino
+    sumidero = np.load(ruta_sumidero, mmap_mode='r+')
+    sumidero[inicio:fin] = tabla
+    sumidero.flush()
+    return None, {}, None
+
+
+def _simular(caso, directorio, nombre, usar_tabla_cd, metodo, exportar_tsv,
+             registro, directorio_cache, tramo, motor, q_costa, instrumentar,
+             destino, almacen):
+    '''Simulación de un caso dentro de un proceso del barrido.  Devuelve la
+    ruta del fichero (None si se escribe en el sumidero), los aciertos y
+    fallos de la caché de ascensos en este caso y, si se pide instrumentar,
+    el resumen de la medición del caso (ver instrumentacion).  destino es
+    None o la ruta del sumidero y el tramo de filas del caso en él, y
+    almacen, None o el directorio del almacén y la clave del caso.
+    '''
+    if instrumentar:
+        with instrumentacion.instrumentar() as medicion:
+            ruta, cuenta, _ = _simular(caso, directorio, nombre,
+                                       usar_tabla_cd, metodo, exportar_tsv,
+                                       registro, directorio_cache, tramo,
+                                       motor, q_costa, False, destino,
+                                       almacen)
+        return ruta, cuenta, instrumentacion.resumen(medicion)
+    tabla = None
+    if destino is not None:
+        ruta_sumidero, inicio, fin = destino
+        sumidero = np.load(ruta_sumidero, mmap_mode='r+')
+        # Se abre en cada caso: proyectarlo sólo cuesta leer la cabecera.
+        tabla = sumidero[inicio:fin]
+    tabla_cd = None
+    if usar_tabla_cd:
+        if 'cd' not in _TABLAS:
+            _TABLAS['cd'] = cargar_tabla()
+        tabla_cd = _TABLAS['cd']
+    cache = None
+    if directorio_cache is not None:
+        if _TABLAS.get('directorio_cache') != directorio_cache:
+            _TABLAS['ascensos'] = crear_cache(directorio=directorio_cache)
+            _TABLAS['directorio_cache'] = directorio_cache
+        cache = _TABLAS['ascensos']
+        antes = dict(cache.estadisticas)
+    ruta = simular_caso(caso, directorio, nombre, tabla_cd, metodo=metodo,
+                        exportar_tsv=exportar_tsv, registro=registro,
+                        cache=cache,
+                        trayectoria=_TABLAS['giros'][tramo[0]:tramo[1]],
+                        motor=motor, destino=tabla, q_costa=q_costa)
+    if almacen is not None:
+        guardar_caso(almacen[0], almacen[1], caso,
+                     cargar_resultados(ruta) if tabla is None else tabla)
+    if tabla is not None:
+        sumidero.flush()
+        del sumidero, tabla
+    if cache is None:
+        return ruta, {}, None
+    persistir(cache)
+    return ruta, {c: cache.estadisticas[c] - antes[c]
+                  for c in ('aciertos', 'fallos')}, None
+
+
+def ejecutar_barrido(casos, trabajadores=None, directorio='.',
+                     usar_tabla_cd=False, coste=coste_estimado,
+                     metodo='euler', exportar_tsv=False, registro=None,
+                     cache_ascensos=False, estadisticas=None,
+                     motor='numpy', sumidero=None, almacen=False,
+                     q_costa=None):
+    '''Simula todos los casos repartiéndolos entre trabajadores procesos (por
+    defecto, tantos como núcleos).  Con un solo trabajador los casos se
+    ejecutan en este mismo proceso.  metodo, exportar_tsv, registro, motor y
+    q_costa son los de simulacion.simular_caso.  Devuelve las rutas de los
+    ficheros .npy en el mismo orden que casos.
+
+    Con cache_ascensos, cada proceso consulta la caché de ascensos en disco
+    (ver cache_ascenso) del directorio de caché, o del directorio dado si
+    cache_ascensos es una ruta, y la actualiza tras cada caso.  Si se da el
+    diccionario estadisticas, se le suman los aciertos y fallos de la caché.
+
+    Con almacen, los casos terminados se guardan en el almacén de resultados
+    (ver almacen.py) del directorio de caché, o del directorio dado si
+    almacen es una ruta, y los que ya estaban en él no se vuelven a simular:
+    sus resultados se copian del almacén.  En estadisticas se suma entonces
+    el número de casos recuperados.
+
+    Con una medición en curso (ver instrumentacion), cada caso se mide en su
+    proceso y los resúmenes se acumulan en ella.
+
+    Si se da sumidero (ruta de un fichero .npy), los resultados de todos los
+    casos se escriben en ese único fichero, en el orden de casos, en lugar de
+    uno por caso (ver crear_sumidero).  Devuelve entonces la tabla completa,
+    proyectada en memoria en sólo lectura, y la lista de tramos (inicio, fin)
+    de cada caso en ella.
+    '''
+    directorio_cache = None
+    if cache_ascensos:
+        directorio_cache = (DIRECTORIO_CACHE if cache_ascensos is True
+                            else cache_ascensos)
+    casos = list(casos)
+    nombres = nombres_ficheros(casos)
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    if usar_tabla_cd:
+        cargar_tabla()
+        # La tabla se construye aquí una sola vez; los procesos la leen de la
+        # caché en disco.
+    claves = [None] * len(casos)
+    completados = {}
+    if almacen:
+        directorio_almacen = (os.path.join(DIRECTORIO_CACHE, 'resultados')
+                              if almacen is True else almacen)
+        version = version_modelo()
+        claves = [clave_caso(caso, metodo, usar_tabla_cd, motor, q_costa,
+                             version) for caso in casos]
+        completados = leer_diario(directorio_almacen)
+    orden = sorted((i for i in range(len(casos))
+                    if claves[i] not in completados),
+                   key=lambda i: coste(casos[i]), reverse=True)
+    giros, tramos = calcular_giros([casos[i] for i in orden], metodo)
+    destinos = [None] * len(casos)
+    if sumidero is not None:
+        n_filas = []
+        for caso, clave in zip(casos, claves):
+            if clave in completados:
+                n_filas.append(len(cargar_caso(directorio_almacen, clave)))
+            else:
+                inicio, fin = tramos[clave_giro(caso)]
+                n_filas.append(fin - inicio)
+        filas = crear_sumidero(sumidero, casos, n_filas)
+        destinos = [(sumidero, inicio, fin) for inicio, fin in filas]
+    rutas = {i: _recuperar(directorio_almacen, claves[i], directorio,
+                           nombres[i], exportar_tsv, destinos[i])
+             for i in range(len(casos)) if claves[i] in completados}
+    argumentos = {i: (casos[i], directorio, nombres[i], usar_tabla_cd,
+                      metodo, exportar_tsv, registro, directorio_cache,
+                      tramos[clave_giro(casos[i])], motor, q_costa,
+                      instrumentacion.activa(), destinos[i],
+                      None if claves[i] is None
+                      else (directorio_almacen, claves[i]))
+                  for i in orden}
+    if trabajadores == 1 or not orden:
+        _TABLAS['giros'] = giros
+        rutas.update((i, _simular(*argumentos[i])) for i in orden)
+    else:
+        memoria = shared_memory.SharedMemory(create=True,
+                                             size=max(giros.nbytes, 1))
+        try:
+            np.ndarray(giros.shape, dtype=TIPO_GIRO,
+                       buffer=memoria.buf)[:] = giros
+            with ProcessPoolExecutor(max_workers=trabajadores,
+                                     initializer=_adjuntar_giros,
+                                     initargs=(memoria.name,
+                                               len(giros))) as ejecutor:
+                futuros = {i: ejecutor.submit(_simular, *argumentos[i])
+                           for i in orden}
+                rutas.update((i, futuro.result())
+                             for i, futuro in futuros.items())
+        finally:
+            memoria.close()
+            memoria.unlink()
+    if estadisticas is not None:
+        if almacen:
+            estadisticas['recuperados'] = (estadisticas.get('recuperados', 0)
+                                           + len(casos) - len(orden))
+        for _, cuenta, _ in rutas.values():
+            for c, n in cuenta.items():
+                estadisticas[c] = estadisticas.get(c, 0) + n
+    for _, _, datos in rutas.values():
+        if datos is not None:
+            instrumentacion.acumular(datos)
+    if sumidero is not None:
+        return cargar_resultados(sumidero), filas
+    return [rutas[i][0] for i in range(len(casos))]
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Caché de resultados del ascenso del misil.  Los barridos y las ejecuciones
+repetidas lanzan una y otra vez el mismo misil desde los mismos estados: el
+giro del avión no depende de los parámetros del misil.  La caché guarda el
+estado final de cada ascenso con la clave
+
+    (h, v, gama) cuantizados + (empuje, gasto, tiempo de combustión, masa
+    inicial, paso, integrador, tabla de Cd, umbral de la costa kepleriana,
+    motor)
+
+y lo devuelve sin integrar de nuevo.  Con la cuantización por defecto sólo
+coinciden estados iguales hasta el redondeo, de modo que los resultados no
+cambian; con cuantos mayores, los lanzamientos que caen en la misma celda
+comparten el resultado del primero que se integró.
+
+Las entradas se expulsan por antigüedad de uso (LRU) al superar tam_max.  La
+caché se puede guardar en disco (formato .npz) para reutilizarla entre
+procesos y ejecuciones; el fichero lleva en el nombre la huella del código del
+modelo y de este módulo (ver huella.version_modelo), así que cualquier cambio
+en el modelo o en la clave invalida las entradas guardadas.  Varios procesos
+pueden compartir el fichero: cada uno lo bloquea (fcntl.flock) mientras añade
+sus entradas.  Sin fcntl (Windows) no hay bloqueo, y si dos procesos escriben a
+la vez se pueden perder las entradas de uno de ellos.
+
+"""
+
+import os
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from huella import huella_fuentes, version_modelo
+
+
+METODOS = ('euler', 'rk45')  # Integradores del ascenso.
+TAM_MAX = 1000000  # Número máximo de entradas por defecto.
+
+Cuantos = namedtuple('Cuantos', 'h v gama')
+Cuantos.__new__.__defaults__ = (1e-6, 1e-6, 1e-9)
+#Tamaño de la celda de cuantización de la clave en altitud (m), velocidad
+# (m/s) y ángulo de asiento de la velocidad (rad).
+
+CacheAscenso = namedtuple('CacheAscenso', 'entradas estadisticas tam_max '
+                          'cuantos ruta')
+#Caché de ascensos: diccionario ordenado de clave a estado final (tupla con
+# los campos de ResultadoAscenso), contadores de aciertos, fallos y
+# expulsiones, número máximo de entradas, cuantos de la clave y fichero en
+# disco (None si la caché sólo vive en memoria).
+
+
+def crear_cache(tam_max=TAM_MAX, cuantos=Cuantos(), directorio=None):
+    '''Caché vacía.  Si se da directorio, la caché se asocia al fichero de
+    esta versión del modelo en él y se cargan las entradas que ya tenga.
+    '''
+    ruta = None
+    if directorio is not None:
+        ruta = os.path.join(directorio, 'ascensos_%s_%s.npz'
+                            % (version_modelo(),
+                               huella_fuentes(('cache_ascenso',),
+                                              tuple(cuantos))))
+        # Los cuantos y la forma de la clave forman parte del nombre: una
+        # caché cuantizada de otra forma no es válida.
+    cache = CacheAscenso(OrderedDict(), {'aciertos': 0, 'fallos': 0,
+                                         'expulsiones': 0},
+                         tam_max, cuantos, ruta)
+    if ruta is not None and os.path.exists(ruta):
+        with np.load(ruta) as datos:
+            guardar(cache, datos['claves'].tolist(),
+                    datos['valores'].tolist())
+    return cache
+
+
+def clave(cache, h, v, gama, empuje_misil, gasto, t_combustion, masa_misil,
+          dtl, metodo, con_tabla_cd, q_costa=None, motor='numpy'):
+    '''Clave de la caché para un lanzamiento.  Todos los campos son números
+    para poder guardarla en disco.  Sin costa kepleriana (q_costa None) el
+    umbral vale 0, que es equivalente.  El motor de Euler ('numpy' o 'jit')
+    forma parte de la clave porque los dos cálculos sólo coinciden hasta el
+    redondeo (del orden de 1e-9); con rk45 no se usa.
+    '''
+    return (round(h / cache.cuantos.h), round(v / cache.cuantos.v),
+            round(gama / cache.cuantos.gama), float(empuje_misil),
+            float(gasto), float(t_combustion), float(masa_misil), float(dtl),
+            2 * METODOS.index(metodo) + bool(con_tabla_cd),
+            float(q_costa or 0), float(metodo == 'euler' and motor == 'jit'))
+
+
+def buscar(cache, claves):
+    '''Estados finales guardados para cada clave (None si no está).
+    Actualiza las estadísticas y el orden de uso.
+    '''
+    valores = []
+    for c in claves:
+        valor = cache.entradas.get(c)
+        if valor is None:
+            cache.estadisticas['fallos'] += 1
+        else:
+            cache.estadisticas['aciertos'] += 1
+            cache.entradas.move_to_end(c)
+        valores.append(valor)
+    return valores
+
+
+def guardar(cache, claves, valores):
+    '''Guarda en la caché los estados finales de los ascensos integrados y
+    expulsa las entradas menos usadas recientemente.
+    '''
+    for c, valor in zip(claves, valores):
+        cache.entradas[tuple(c)] = tuple(valor)
+        cache.entradas.move_to_end(tuple(c))
+    while len(cache.entradas) > cache.tam_max:
+        cache.entradas.popitem(last=False)
+        cache.estadisticas['expulsiones'] += 1
+
+
+def estadisticas(cache):
+    '''Aciertos, fallos, expulsiones, tasa de aciertos y número de entradas.
+    '''
+    consultas = cache.estadisticas['aciertos'] + cache.estadisticas['fallos']
+    return dict(cache.estadisticas, entradas=len(cache.entradas),
+                tasa_aciertos=(cache.estadisticas['aciertos'] / consultas
+                               if consultas else 0.))
+
+
+def persistir(cache):
+    '''Escribe la caché en su fichero.  Antes se añaden las entradas que otro
+    proceso haya escrito mientras tanto, de modo que varios procesos pueden
+    compartir el fichero.  La lectura y la escritura se hacen con el fichero
+    bloqueado (ver el fichero .lock junto a él).
+    '''
+    if cache.ruta is None:
+        return
+    os.makedirs(os.path.dirname(cache.ruta), exist_ok=True)
+    with open(cache.ruta + '.lock', 'a') as cerrojo:
+        if fcntl is not None:
+            fcntl.flock(cerrojo, fcntl.LOCK_EX)  # Se libera al cerrarlo.
+        if os.path.exists(cache.ruta):
+            with np.load(cache.ruta) as datos:
+                claves = [tuple(c) for c in datos['claves'].tolist()]
+                valores = datos['valores'].tolist()
+            nuevas = [(c, v) for c, v in zip(claves, valores)
+                      if c not in cache.entradas]
+            if nuevas:
+                #Las entradas ajenas se añaden como las menos usadas.
+                propias = list(cache.entradas.items())
+                cache.entradas.clear()
+                guardar(cache, *zip(*(nuevas + propias)))
+        temporal = cache.ruta + '.%d.tmp.npz' % os.getpid()
+        np.savez(temporal,
+                 claves=np.array(list(cache.entradas), dtype=float),
+                 valores=np.array(list(cache.entradas.values()), dtype=float))
+        os.replace(temporal, cache.ruta)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Estudio de convergencia con el paso de integración.  El mismo caso se simula
+con Euler con varios pasos, cada uno la mitad del anterior, y de las
+diferencias entre los resultados se estima, por extrapolación de Richardson,
+el error de discretización de la altitud, la velocidad y la energía mecánica
+finales del misil con cada paso.  El paso recomendado es el mayor cuyo error
+no supera la tolerancia pedida.
+
+Los resultados se comparan en los puntos de lanzamiento comunes a todos los
+pasos: los del giro integrado con el paso más grueso.  Por defecto el paso
+del giro (dt) y el del ascenso (dtl) son iguales y se refinan a la vez; si se
+da dt, el giro se integra siempre con él y sólo se refina el ascenso.
+
+El fin de la combustión se detecta en la rejilla de pasos del misil, así que
+el error de Euler no decrece de forma monótona con el paso: además de la parte
+proporcional al paso tiene otra del mismo orden que depende de dónde cae el
+fin de la combustión en la rejilla (con el caso de referencia, 0,1 s da menos
+error que 0,05 s).  Por eso el valor extrapolado de cada punto es la mediana
+de las extrapolaciones con el orden teórico (ORDEN) de los PARES pares de
+pasos consecutivos más finos, y el error se estima para cada paso por
+separado, en lugar de suponer que es menor cuanto menor es el paso.  Para no
+medir un paso con una referencia que depende de él, el error de cada paso se
+mide frente a la mediana de los PARES pares más finos que no lo contienen.
+
+El orden observado (ver Estudio) lejos de ORDEN indica que los pasos más
+finos todavía no están en la zona asintótica y que la extrapolación es menos
+fiable.  Las variables cuyo orden se separa de ORDEN más que TOLERANCIA_ORDEN
+(ordenes_dudosos) se señalan como aviso, pero no impiden recomendar un paso:
+con el caso de referencia el orden observado es de 0,2 a 0,8 con los pasos
+por defecto por la detección del fin de la combustión en la rejilla, aunque
+el error de los pasos finos ya es menor del 1 %.
+
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulacion import InitialState, PullupParams, RocketParams
+from simulacion import simulate_pullup, simulate_launches
+
+
+VARIABLES = ('altitud', 'velocidad', 'emecanica')
+# Campos de LaunchResult cuya convergencia se estudia.
+PASOS = (.4, .2, .1, .05, .025, .0125)
+# Pasos del estudio por defecto (s).
+ORDEN = 1  # Orden del método de Euler.
+PARES = 3  # Pares de pasos de cuyas extrapolaciones se toma la mediana.
+TOLERANCIA_ORDEN = .3
+# Separación máxima entre el orden observado y ORDEN sin aviso.
+TOLERANCIA = .01
+# Error relativo admisible por defecto, respecto del mayor valor absoluto de
+# cada variable en el giro.
+
+Estudio = namedtuple('Estudio', 't pasos valores extrapolado orden error')
+#Estudio de convergencia: instantes de lanzamiento comparados (s), pasos (s,
+# de mayor a menor) y, para cada variable de VARIABLES (diccionarios),
+# resultados con cada paso (matriz de pasos por puntos), valor extrapolado en
+# cada punto, orden observado y error relativo estimado con cada paso (frente
+# a una extrapolación en la que no interviene ese paso).
+
+
+def _resultados(caso, dt, dtl, salto, tabla_cd, motor):
+    '''Resultados del caso con pasos dt en el giro y dtl en el ascenso,
+    lanzando en uno de cada salto puntos del giro.  Devuelve los instantes
+    de lanzamiento y un diccionario con el vector de cada variable.
+    '''
+    giro = simulate_pullup(InitialState(caso.h, caso.mach),
+                           PullupParams(caso.beta, dt))[::salto]
+    resultados = simulate_launches(
+        giro, RocketParams(caso.isp, caso.gasto, caso.masa_propulsante),
+        dtl=dtl, tabla_cd=tabla_cd, motor=motor)
+    return (np.array([lanz.t for lanz in giro]),
+            {variable: np.array([getattr(r, variable) for r in resultados])
+             for variable in VARIABLES})
+
+
+def orden_observado(gruesa, media, fina):
+    '''Orden de convergencia observado con tres pasos, cada uno la mitad del
+    anterior, a partir de las diferencias máximas entre sus resultados.
+    '''
+    diferencia_gruesa = np.max(np.abs(media - gruesa))
+    diferencia_fina = np.max(np.abs(fina - media))
+    if not diferencia_fina or not diferencia_gruesa:
+        return np.nan
+    return np.log2(diferencia_gruesa / diferencia_fina)
+
+
+def convergencia(caso, pasos=PASOS, dt=None, tabla_cd=None, motor='numpy',
+                 trabajadores=1):
+    '''Estudio de convergencia del caso (simulacion.Caso) con los pasos dados
+    (s), cada uno la mitad del anterior (ver Estudio).  Cada paso se simula
+    en este proceso o repartidos entre trabajadores procesos (por defecto,
+    tantos como núcleos).
+    '''
+    pasos = sorted(pasos, reverse=True)
+    if len(pasos) < 4 or not np.allclose(np.diff(np.log2(pasos)), -1):
+        raise ValueError('Se necesitan al menos cuatro pasos, cada uno la '
+                         'mitad del anterior.')
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    argumentos = [(caso, paso if dt is None else dt, paso,
+                   2**i if dt is None else 1, tabla_cd, motor)
+                  for i, paso in enumerate(pasos)]
+    if trabajadores == 1:
+        simulados = [_resultados(*a) for a in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+            simulados = list(ejecutor.map(_resultados, *zip(*argumentos)))
+    #El giro termina en instantes algo distintos con cada paso: se comparan
+    # los puntos que están en todos.
+    n = min(len(t) for t, _ in simulados)
+    valores, extrapolado, orden, error = {}, {}, {}, {}
+    for variable in VARIABLES:
+        valores[variable] = np.array([v[variable][:n] for _, v in simulados])
+        gruesa, media, fina = valores[variable][-3:]
+        orden[variable] = orden_observado(gruesa, media, fina)
+        extrapolaciones = (valores[variable][1:] + np.diff(
+            valores[variable], axis=0) / (2**ORDEN - 1))
+        extrapolado[variable] = np.median(extrapolaciones[-PARES:], axis=0)
+        escala = np.max(np.abs(extrapolado[variable])) or 1.
+        #La extrapolación k usa los pasos k y k + 1.
+        referencias = [np.median([extrapolacion for k, extrapolacion
+                                  in enumerate(extrapolaciones)
+                                  if i not in (k, k + 1)][-PARES:], axis=0)
+                       for i in range(len(pasos))]
+        error[variable] = np.max(np.abs(valores[variable]
+                                        - np.array(referencias)),
+                                 axis=1) / escala
+    return Estudio(simulados[0][0][:n], np.array(pasos), valores, extrapolado,
+                   orden, error)
+
+
+def ordenes_dudosos(estudio, tolerancia_orden=TOLERANCIA_ORDEN):
+    '''Variables del estudio cuyo orden observado se separa de ORDEN más que
+    tolerancia_orden o no se puede calcular.
+    '''
+    return [variable for variable in VARIABLES
+            if not abs(estudio.orden[variable] - ORDEN) <= tolerancia_orden]
+
+
+def paso_recomendado(estudio, tolerancia=TOLERANCIA):
+    '''Mayor paso del estudio cuyo error relativo en todas las variables no
+    supera la tolerancia, o None si ninguno la cumple.  No tiene en cuenta el
+    orden observado (ver ordenes_dudosos).
+    '''
+    validos = [paso for i, paso in enumerate(estudio.pasos)
+               if all(estudio.error[variable][i] <= tolerancia
+                      for variable in VARIABLES)]
+    return max(validos) if validos else None
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Análisis de Monte Carlo de la dispersión del ascenso del misil.  Desde un
+mismo punto de lanzamiento se simulan muchos misiles cuyos parámetros se
+sortean alrededor de los nominales: impulso específico, gasto, masa de
+propulsante, factores de escala del coeficiente de resistencia y del empuje,
+y desplazamiento de la temperatura de la ISA.  Cada lote de muestras se
+integra a la vez con ascenso_lote; los lotes se pueden repartir entre
+procesos.
+
+De la altitud, la velocidad y la energía mecánica finales se acumulan, lote a
+lote, la media y la varianza (algoritmo de Welford, en la forma de Chan para
+combinar lotes), los extremos y un boceto de cuantiles con error relativo
+acotado (DDSketch: cubetas logarítmicas).  La memoria no depende del número de
+muestras.  Los misiles que llegan al techo de altitud (ALTURA_FINAL) terminan
+allí el ascenso, así que su altitud final es la del techo: la estadística
+'techo' vale 1 para ellos y 0 para el resto, y su media es la fracción de
+muestras en el techo.  Si es grande, la dispersión de la altitud final apenas
+dice nada.
+
+Por defecto se lanza en el último punto del giro, el de mayor ángulo de
+asiento de la velocidad, que no depende de ninguna búsqueda.  Con el caso de
+referencia casi nueve de cada diez muestras llegan al techo desde él: para
+estudiar la dispersión de la altitud conviene dar un instante de lanzamiento
+anterior.
+
+Cada lote tiene su propia semilla, derivada de la semilla del análisis
+(numpy.random.SeedSequence.spawn), así que con la misma semilla y el mismo
+tamaño de lote los resultados no dependen del número de procesos.
+
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, log
+
+import numpy as np
+
+from ascenso_lote import ascenso_lote, ALTURA_FINAL
+from simulacion import InitialState, PullupParams, RocketParams
+from simulacion import simulate_pullup
+from optimizacion import interpolar_lanzamiento
+
+
+VARIABLES = ('altitud', 'velocidad', 'emecanica')
+# Campos de ResultadoAscenso cuya dispersión se estudia.
+ESTADISTICAS = VARIABLES + ('techo',)
+# Estadísticas del análisis: las de VARIABLES y la de los misiles que llegan
+# a ALTURA_FINAL (1 si llegan y 0 si no).
+TAM_LOTE = 1000  # Número de muestras de cada lote.
+ALFA = .001  # Error relativo de los cuantiles del boceto.
+CUANTILES = (.01, .05, .5, .95, .99)  # Cuantiles del resumen.
+
+Dispersiones = namedtuple('Dispersiones', 'isp gasto masa_propulsante '
+                          'escala_cd escala_empuje delta_t')
+Dispersiones.__new__.__defaults__ = (.02, .02, .01, .05, .02, 5)
+#Desviaciones típicas de los parámetros, que se sortean con distribución
+# normal: relativas al valor nominal para el Isp, el gasto y la masa de
+# propulsante, absolutas para los factores de escala del Cd y del empuje del
+# misil (de valor nominal 1) y en K para el desplazamiento de la temperatura
+# de la ISA (nominal 0).  La masa total del misil no se dispersa.
+
+Boceto = namedtuple('Boceto', 'alfa cuentas')
+#Boceto de cuantiles: error relativo alfa y número de valores en cada cubeta.
+# La clave de cada cubeta es (signo, índice) y contiene los valores x del
+# signo dado con gamma**(índice - 1) < |x| <= gamma**índice, donde
+# gamma = (1 + alfa) / (1 - alfa).
+
+Estadistica = namedtuple('Estadistica', 'n media m2 minimo maximo boceto')
+#Estadística acumulada de una variable: número de valores, media, suma de los
+# cuadrados de las desviaciones respecto de la media, extremos y boceto.
+
+
+def muestrear(rocket_params, dispersiones, n, rng):
+    '''Sorteo de n misiles alrededor de rocket_params con el generador rng.
+    Devuelve un Dispersiones con un vector de n valores en cada campo.
+    '''
+    normal = rng.standard_normal((len(Dispersiones._fields), n))
+    return Dispersiones(
+        rocket_params.isp * (1 + dispersiones.isp * normal[0]),
+        rocket_params.gasto * (1 + dispersiones.gasto * normal[1]),
+        rocket_params.masa_propulsante * (1 + dispersiones.masa_propulsante
+                                          * normal[2]),
+        1 + dispersiones.escala_cd * normal[3],
+        1 + dispersiones.escala_empuje * normal[4],
+        dispersiones.delta_t * normal[5])
+
+
+def crear_boceto(valores, alfa=ALFA):
+    '''Boceto de cuantiles de un vector de valores.
+    '''
+    valores = np.asarray(valores, dtype=float)
+    signo = np.sign(valores).astype(np.int64)
+    with np.errstate(divide='ignore'):
+        indice = np.where(signo != 0,
+                          np.ceil(np.log(np.abs(valores))
+                                  / log((1 + alfa) / (1 - alfa))), 0)
+    claves, cuentas = np.unique(np.stack([signo, indice.astype(np.int64)]),
+                                axis=1, return_counts=True)
+    return Boceto(alfa, dict(zip(map(tuple, claves.T.tolist()),
+                                 cuentas.tolist())))
+
+
+def cuantil(boceto, q, minimo=-np.inf, maximo=np.inf):
+    '''Cuantil q (entre 0 y 1) de los valores del boceto, con error relativo
+    menor que su alfa.  El valor representativo de una cubeta puede quedar
+    fuera de los valores que contiene: si se dan sus extremos (minimo y
+    maximo), el resultado se acota a ellos.
+    '''
+    gamma = (1 + boceto.alfa) / (1 - boceto.alfa)
+    claves = sorted(boceto.cuentas, key=lambda c: (c[0], c[0] * c[1]))
+    rango = q * (sum(boceto.cuentas.values()) - 1)
+    acumulado = 0
+    for signo, indice in claves:
+        acumulado += boceto.cuentas[signo, indice]
+        if acumulado > rango:
+            break
+    return min(max(signo * 2 * gamma**indice / (gamma + 1), minimo), maximo)
+
+
+def crear_estadistica(valores, alfa=ALFA):
+    '''Estadística de un vector de valores.
+    '''
+    valores = np.asarray(valores, dtype=float)
+    if not valores.size:
+        return Estadistica(0, 0., 0., np.inf, -np.inf, Boceto(alfa, {}))
+    media = float(np.mean(valores))
+    return Estadistica(valores.size, media,
+                       float(np.sum((valores - media)**2)),
+                       float(np.min(valores)), float(np.max(valores)),
+                       crear_boceto(valores, alfa))
+
+
+def combinar(a, b):
+    '''Estadística de la unión de los valores de a y b.
+    '''
+    if not b.n:
+        return a
+    if not a.n:
+        return b
+    n = a.n + b.n
+    delta = b.media - a.media
+    cuentas = dict(a.boceto.cuentas)
+    for clave, cuenta in b.boceto.cuentas.items():
+        cuentas[clave] = cuentas.get(clave, 0) + cuenta
+    return Estadistica(n, a.media + delta * b.n / n,
+                       a.m2 + b.m2 + delta**2 * a.n * b.n / n,
+                       min(a.minimo, b.minimo), max(a.maximo, b.maximo),
+                       Boceto(a.boceto.alfa, cuentas))
+
+
+def resumen(estadistica, cuantiles=CUANTILES):
+    '''Diccionario con el número de valores, la media, la desviación típica,
+    los extremos y los cuantiles de una estadística.
+    '''
+    return {'n': estadistica.n, 'media': estadistica.media,
+            'desviacion': ((estadistica.m2 / (estadistica.n - 1))**.5
+                           if estadistica.n > 1 else 0.),
+            'minimo': estadistica.minimo, 'maximo': estadistica.maximo,
+            'cuantiles': {q: cuantil(estadistica.boceto, q,
+                                     estadistica.minimo, estadistica.maximo)
+                          for q in cuantiles}}
+
+
+def _lote(lanzamiento, rocket_params, dispersiones, semilla, n, dtl):
+    '''Ascenso de un lote de n misiles sorteados con la semilla dada.
+    Devuelve la estadística de cada campo de ESTADISTICAS.
+    '''
+    muestras = muestrear(rocket_params, dispersiones, n,
+                         np.random.default_rng(semilla))
+    final = ascenso_lote(lanzamiento.h, lanzamiento.v, lanzamiento.gama,
+                         muestras.gasto * muestras.isp
+                         * muestras.escala_empuje, muestras.gasto,
+                         muestras.masa_propulsante / muestras.gasto,
+                         rocket_params.masa, dtl,
+                         escala_cd=muestras.escala_cd,
+                         delta_t=muestras.delta_t)
+    estadisticas = {variable: crear_estadistica(getattr(final, variable))
+                    for variable in VARIABLES}
+    estadisticas['techo'] = crear_estadistica(final.altitud >= ALTURA_FINAL)
+    return estadisticas
+
+
+def dispersion(lanzamiento, rocket_params, n_muestras=1000,
+               dispersiones=Dispersiones(), semilla=0, tam_lote=TAM_LOTE,
+               trabajadores=1, dtl=.1):
+    '''Monte Carlo de n_muestras ascensos desde el punto de lanzamiento
+    (simulacion.LaunchState) con los parámetros del misil sorteados según
+    dispersiones.  Los lotes de tam_lote muestras se integran con Euler de
+    paso dtl, en este proceso o repartidos entre trabajadores procesos (por
+    defecto, tantos como núcleos).
+    Devuelve un diccionario con la Estadistica de cada campo de ESTADISTICAS.
+    '''
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    n_lotes = ceil(n_muestras / tam_lote)
+    semillas = np.random.SeedSequence(semilla).spawn(n_lotes)
+    argumentos = [(lanzamiento, rocket_params, dispersiones, semillas[i],
+                   min(tam_lote, n_muestras - i * tam_lote), dtl)
+                  for i in range(n_lotes)]
+    acumulada = {campo: crear_estadistica(()) for campo in ESTADISTICAS}
+    if trabajadores == 1:
+        lotes = (_lote(*a) for a in argumentos)
+        ejecutor = None
+    else:
+        ejecutor = ProcessPoolExecutor(max_workers=trabajadores)
+        lotes = ejecutor.map(_lote, *zip(*argumentos))
+    try:
+        #Los lotes se combinan en orden para que el resultado no dependa del
+        # reparto entre procesos.
+        for lote in lotes:
+            acumulada = {campo: combinar(acumulada[campo], lote[campo])
+                         for campo in ESTADISTICAS}
+    finally:
+        if ejecutor is not None:
+            ejecutor.shutdown()
+    return acumulada
+
+
+def dispersion_caso(caso, n_muestras=1000, dispersiones=Dispersiones(),
+                    semilla=0, t_lanzamiento=None, tam_lote=TAM_LOTE,
+                    trabajadores=1, dtl=.1):
+    '''Monte Carlo del caso (simulacion.Caso) lanzando en el instante
+    t_lanzamiento (s) del giro o, por defecto, en el último punto del giro.
+    Devuelve el punto de lanzamiento y el diccionario de estadísticas de
+    dispersion.
+    '''
+    rocket_params = RocketParams(caso.isp, caso.gasto, caso.masa_propulsante)
+    giro = simulate_pullup(InitialState(caso.h, caso.mach),
+                           PullupParams(caso.beta))
+    if t_lanzamiento is None:
+        lanzamiento = giro[-1]
+    else:
+        lanzamiento = interpolar_lanzamiento(giro, 't', t_lanzamiento)
+    return lanzamiento, dispersion(lanzamiento, rocket_params, n_muestras,
+                                   dispersiones, semilla, tam_lote,
+                                   trabajadores, dtl)
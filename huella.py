@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Huella de una versión del modelo: resumen SHA-256 de unos datos (p. ej. los
+parámetros de una rejilla) y del código fuente de los módulos de los que
+dependen unos resultados.  Se usa en los nombres y claves de las cachés en
+disco, de modo que cualquier cambio en el modelo invalida lo guardado.
+version_modelo es la huella de todo el modelo (MODULOS_MODELO), la misma
+para todas las cachés.
+
+"""
+
+import hashlib
+from importlib.util import find_spec
+
+
+MODULOS_MODELO = ('modeloISA', 'aero_avion', 'aero_misil', 'modelo_empuje',
+                  'modelo_gravedad', 'tabla_cdll', 'integrador',
+                  'ascenso_lote', 'ascenso_jit', 'simulacion')
+# Módulos de los que dependen los resultados del giro y del ascenso: el
+# modelo físico y el código que lo integra.
+
+def huella_fuentes(modulos, datos=()):
+    '''Huella (16 cifras hexadecimales) de datos y del código fuente de los
+    módulos, dados por su nombre.  Los módulos no se importan.
+    '''
+    resumen = hashlib.sha256(repr(datos).encode())
+    for modulo in modulos:
+        with open(find_spec(modulo).origin, 'rb') as fuente:
+            resumen.update(fuente.read())
+    return resumen.hexdigest()[:16]
+
+
+def version_modelo():
+    '''Huella del código del modelo (MODULOS_MODELO).
+    '''
+    return huella_fuentes(MODULOS_MODELO)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Instrumentación de las simulaciones.  Dentro de un bloque
+
+    with instrumentar() as medicion:
+        ...
+
+se cuentan las llamadas a las funciones del modelo (atmósfera, resistencia del
+misil y empuje), los pasos de integración y los lanzamientos evaluados, y se
+mide el tiempo de cada fase (giro, ascenso, escritura) y de cada caso.  Los
+contadores se reparten por la fase en que se producen.  resumen da un
+diccionario que se puede escribir en JSON (guardar_resumen).
+
+Las funciones del modelo sólo se sustituyen por versiones que cuentan las
+llamadas mientras dura el bloque; fuera de él el código es el de siempre.  Los
+contadores de pasos y las fases cuestan una llamada a función por paso del
+lote de misiles o por fase, que no se nota en el tiempo total.  Las llamadas
+desde el núcleo compilado de ascenso_jit no se cuentan.
+
+En un barrido con varios procesos cada proceso mide sus casos y el resumen se
+acumula en el proceso principal (ver barrido.ejecutar_barrido), así que el
+tiempo de las fases es la suma del de todos los procesos.
+
+"""
+
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from importlib import import_module
+
+import numpy as np
+
+
+FUNCIONES = (('modeloISA', ('density', 'temperature', 'viscosity',
+                            'pressure', 'atmosphere', 'density_array',
+                            'temperature_array', 'viscosity_array',
+                            'pressure_array', 'atmosphere_array')),
+             ('aero_misil', ('cdll', 'cdll_estado', 'cdll_array',
+                             'cdll_estado_array')),
+             ('tabla_cdll', ('cd_tabla', 'cd_tabla_array')),
+             ('modelo_empuje', ('thrust', 'thrust_array', 'empuje_tabla',
+                                'empuje_tabla_array')))
+# Funciones del modelo cuyas llamadas se cuentan, por módulo.
+SIN_FASE = 'otros'  # Fase de los contadores de fuera de cualquier fase.
+
+Medicion = namedtuple('Medicion', 'contadores fases casos pila duracion')
+#Datos de una medición: contadores por fase (diccionario de diccionarios),
+# tiempo (s) y número de veces de cada fase, lista de casos (nombre y tiempo),
+# pila de fases abiertas e instantes de inicio y fin de la medición (s).
+
+_ESTADO = {'medicion': None, 'sustituidas': None}
+# Medición en curso y funciones sustituidas (módulo, nombre, original).
+_NULO = nullcontext()
+
+
+def activa():
+    '''True si hay una medición en curso.
+    '''
+    return _ESTADO['medicion'] is not None
+
+
+def contar(nombre, n=1):
+    '''Suma n al contador nombre de la fase actual, si hay una medición en
+    curso.
+    '''
+    medicion = _ESTADO['medicion']
+    if medicion is None:
+        return
+    contadores = medicion.contadores.setdefault(
+        medicion.pila[-1] if medicion.pila else SIN_FASE, {})
+    contadores[nombre] = contadores.get(nombre, 0) + n
+
+
+@contextmanager
+def _fase(medicion, nombre):
+    '''Mide el tiempo de la fase nombre.
+    '''
+    medicion.pila.append(nombre)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        medicion.pila.pop()
+        acumulado = medicion.fases.setdefault(nombre, [0., 0])
+        acumulado[0] += segundos
+        acumulado[1] += 1
+
+
+def fase(nombre):
+    '''Bloque de la fase nombre.  Sin medición en curso no hace nada.
+    '''
+    medicion = _ESTADO['medicion']
+    if medicion is None:
+        return _NULO
+    return _fase(medicion, nombre)
+
+
+@contextmanager
+def _caso(medicion, nombre):
+    '''Mide el tiempo del caso nombre.
+    '''
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.casos.append({'nombre': nombre,
+                               'segundos': time.perf_counter() - inicio})
+
+
+def caso(nombre):
+    '''Bloque de la simulación del caso nombre.  Sin medición en curso no
+    hace nada.
+    '''
+    medicion = _ESTADO['medicion']
+    if medicion is None:
+        return _NULO
+    return _caso(medicion, nombre)
+
+
+def _contadora(nombre, funcion):
+    '''Versión de funcion que cuenta sus llamadas y, si es vectorizada, el
+    número de puntos evaluados (nombre.puntos, el tamaño del resultado).
+    '''
+    vectorizada = nombre.endswith('_array')
+
+    def contadora(*args, **kwargs):
+        resultado = funcion(*args, **kwargs)
+        contar(nombre)
+        if vectorizada:
+            contar(nombre + '.puntos',
+                   np.size(resultado[0] if isinstance(resultado, tuple)
+                           else resultado))
+        return resultado
+
+    contadora.__wrapped__ = funcion
+    return contadora
+
+
+def _sustituir():
+    '''Sustituye las funciones de FUNCIONES por las que cuentan llamadas en
+    todos los módulos del programa que las usan.  Devuelve la lista de
+    sustituciones para deshacerlas.
+    '''
+    originales = {}
+    for modulo, nombres in FUNCIONES:
+        modulo = import_module(modulo)
+        for nombre in nombres:
+            funcion = getattr(modulo, nombre)
+            originales[id(funcion)] = (nombre, funcion)
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    sustituidas = []
+    for modulo in list(sys.modules.values()):
+        fichero = getattr(modulo, '__file__', None)
+        if (fichero is None
+                or os.path.dirname(os.path.abspath(fichero)) != directorio):
+            continue
+        for atributo, valor in list(vars(modulo).items()):
+            if id(valor) in originales and originales[id(valor)][1] is valor:
+                nombre, funcion = originales[id(valor)]
+                setattr(modulo, atributo, _contadora(nombre, funcion))
+                sustituidas.append((modulo, atributo, funcion))
+    return sustituidas
+
+
+@contextmanager
+def instrumentar():
+    '''Bloque con medición.  Devuelve la Medicion, que se completa al salir.
+    Los bloques se pueden anidar: el interior mide por separado y su resumen
+    se puede añadir al exterior con acumular.
+    '''
+    anterior = _ESTADO['medicion']
+    medicion = Medicion({}, {}, [], [], [time.perf_counter(), None])
+    if _ESTADO['sustituidas'] is None:
+        _ESTADO['sustituidas'] = _sustituir()
+    _ESTADO['medicion'] = medicion
+    try:
+        yield medicion
+    finally:
+        _ESTADO['medicion'] = anterior
+        if anterior is None:
+            for modulo, atributo, funcion in _ESTADO['sustituidas']:
+                setattr(modulo, atributo, funcion)
+            _ESTADO['sustituidas'] = None
+        medicion.duracion[1] = time.perf_counter()
+
+
+def resumen(medicion):
+    '''Diccionario con los datos de la medición: tiempo total, contadores
+    totales y por fase, tiempo de cada fase y de cada caso.  Se puede escribir
+    en JSON.
+    '''
+    inicio, fin = medicion.duracion
+    totales = {}
+    for contadores in medicion.contadores.values():
+        for nombre, n in contadores.items():
+            totales[nombre] = totales.get(nombre, 0) + n
+    return {'segundos': (time.perf_counter() if fin is None else fin) - inicio,
+            'contadores': dict(sorted(totales.items())),
+            'fases': {nombre: {'segundos': segundos, 'veces': veces,
+                               'contadores': dict(sorted(
+                                   medicion.contadores.get(nombre,
+                                                           {}).items()))}
+                      for nombre, (segundos, veces)
+                      in medicion.fases.items()},
+            'otros': dict(sorted(medicion.contadores.get(SIN_FASE,
+                                                         {}).items())),
+            'casos': list(medicion.casos)}
+
+
+def acumular(datos, medicion=None):
+    '''Añade a medicion (por defecto, la medición en curso) el resumen datos
+    de otra medición, p. ej. la de un caso medido en otro proceso.  El tiempo
+    total de datos no se acumula.
+    '''
+    if medicion is None:
+        medicion = _ESTADO['medicion']
+    for nombre, valores in datos['fases'].items():
+        acumulado = medicion.fases.setdefault(nombre, [0., 0])
+        acumulado[0] += valores['segundos']
+        acumulado[1] += valores['veces']
+    for nombre, contadores in ([(f, v['contadores'])
+                                for f, v in datos['fases'].items()]
+                               + [(SIN_FASE, datos['otros'])]):
+        destino = medicion.contadores.setdefault(nombre, {})
+        for contador, n in contadores.items():
+            destino[contador] = destino.get(contador, 0) + n
+    medicion.casos.extend(datos['casos'])
+
+
+def guardar_resumen(ruta, medicion):
+    '''Escribe el resumen de la medición en JSON.
+    '''
+    with open(ruta, 'w') as f:
+        json.dump(resumen(medicion), f, indent=2)
+        f.write('\n')
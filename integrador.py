@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Integrador Runge-Kutta embebido de Dormand-Prince 5(4) con control del error
+y paso adaptativo, salida densa de cuarto orden y detección de eventos.
+
+Los eventos son funciones g(t, y) cuyo cambio de signo detiene la integración.
+El instante exacto se localiza sobre la salida densa del paso en el que cambia
+el signo, sin volver a evaluar las derivadas.  Así las condiciones de parada
+(fin del giro, ángulo de asiento nulo, techo de altitud, velocidad nula) no
+quedan ligadas a una rejilla fija de tiempo.
+
+"""
+
+from collections import namedtuple
+from math import inf
+
+import numpy as np
+
+from instrumentacion import contar
+
+
+#Tablero de Butcher del método de Dormand-Prince.
+C = (0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1)
+A = tuple(np.array(fila) for fila in (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656)))
+B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+# Pesos de la solución de quinto orden (la última etapa es la FSAL).
+E = np.array([-71 / 57600, 0, 71 / 16695, -71 / 1920, 17253 / 339200,
+              -22 / 525, 1 / 40])
+# Diferencia entre los pesos de quinto y de cuarto orden.
+P = np.array([
+    [1, -8048581381 / 2820520608, 8663915743 / 2820520608,
+     -12715105075 / 11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200 / 32700410799, -68118460800 / 10900136933,
+     87487479700 / 32700410799],
+    [0, -1754552775 / 470086768, 14199869525 / 1410260304,
+     -10690763975 / 1880347072],
+    [0, 127303824393 / 49829197408, -318862633887 / 49829197408,
+     701980252875 / 199316789632],
+    [0, -282668133 / 205662961, 2019193451 / 616988883,
+     -1453857185 / 822651844],
+    [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423]])
+# Coeficientes de la salida densa de cuarto orden.
+PASO_MIN = 1e-12
+# Paso mínimo por defecto, relativo a max(1, |t|).
+INTENTOS_MAX = 1000000
+# Número máximo de pasos por defecto, contando los rechazados.
+
+Evento = namedtuple('Evento', 'funcion direccion')
+Evento.__new__.__defaults__ = (0,)
+#Función g(t, y) del evento y sentido del cruce por cero que lo dispara: 1
+# si g pasa de negativa a positiva, -1 si pasa de positiva a negativa y 0 en
+# ambos casos.
+
+Integracion = namedtuple('Integracion', 't y evento salidas evaluaciones '
+                         'pasos')
+#Resultado de la integración: instante y estado finales, índice del evento
+# que la detuvo (None si se llegó a t_fin), lista de pares (t, y) en los
+# instantes de salida pedidos, número de evaluaciones de las derivadas y
+# número de pasos aceptados.
+
+
+def _densa(t_0, y_0, paso, k_etapas, t):
+    '''Estado en t dentro del paso [t_0, t_0 + paso] a partir de la salida
+    densa.
+    '''
+    sigma = (t - t_0) / paso
+    return y_0 + paso * (k_etapas.T @ (P @ np.array([sigma, sigma**2,
+                                                     sigma**3, sigma**4])))
+
+
+def _cruce(evento, g_0, g_1):
+    '''Comprueba si entre los valores g_0 y g_1 el evento cambia de signo en
+    el sentido pedido.
+    '''
+    if evento.direccion >= 0 and g_0 < 0 <= g_1:
+        return True
+    return evento.direccion <= 0 and g_0 > 0 >= g_1
+
+
+def _raiz(evento, t_0, y_0, paso, k_etapas, g_0, t_1, g_1, tol):
+    '''Instante del cruce por cero del evento dentro del paso, por el método
+    de la regula falsi modificado (Illinois) sobre la salida densa.
+    '''
+    t_a, g_a, t_b, g_b = t_0, g_0, t_1, g_1
+    lado = 0
+    while t_b - t_a > tol:
+        t_c = (t_a * g_b - t_b * g_a) / (g_b - g_a)
+        if not t_a < t_c < t_b:
+            t_c = .5 * (t_a + t_b)
+        g_c = evento.funcion(t_c, _densa(t_0, y_0, paso, k_etapas, t_c))
+        if g_c == 0:
+            return t_c
+        if (g_c > 0) == (g_a > 0):
+            t_a, g_a = t_c, g_c
+            if lado == -1:
+                g_b = g_b / 2
+            lado = -1
+        else:
+            t_b, g_b = t_c, g_c
+            if lado == 1:
+                g_a = g_a / 2
+            lado = 1
+    return t_b
+
+
+def dopri5(derivadas, t_0, y_0, t_fin, eventos=(), rtol=1e-6, atol=1e-6,
+           paso=None, paso_max=inf, t_salida=(), paso_min=None,
+           intentos_max=INTENTOS_MAX):
+    '''Integración de y' = derivadas(t, y) desde (t_0, y_0) hasta t_fin o
+    hasta el primer evento que se dispare.  rtol y atol son las tolerancias
+    relativa y absoluta (atol puede ser un vector con una tolerancia por
+    componente).  t_salida es una secuencia creciente de instantes en los que
+    se quiere el estado, que se obtiene por salida densa.
+
+    Si el control del error pide un paso menor que paso_min (por defecto,
+    PASO_MIN * max(1, |t|)), p. ej. porque las derivadas no son finitas, o se
+    intentan más de intentos_max pasos, se lanza ValueError.
+    '''
+    y = np.array(y_0, dtype=float)
+    t = t_0
+    f = np.asarray(derivadas(t, y), dtype=float)
+    evaluaciones = 1
+    pasos = 0
+    k_etapas = np.empty((7, y.size))
+    g_eventos = [ev.funcion(t, y) for ev in eventos]
+    salidas = []
+    t_salida = list(t_salida)
+    i_salida = 0
+    while i_salida < len(t_salida) and t_salida[i_salida] < t:
+        i_salida += 1
+    if paso is None:
+        #Paso inicial a partir de la escala de la solución y su derivada.
+        escala = atol + rtol * np.abs(y)
+        d_0 = np.sqrt(np.mean((y / escala)**2))
+        d_1 = np.sqrt(np.mean((f / escala)**2))
+        paso = .01 * d_0 / d_1 if d_0 > 1e-5 and d_1 > 1e-5 else 1e-6
+    paso = min(paso, paso_max)
+    intentos = 0
+    while t < t_fin:
+        paso = min(paso, t_fin - t)
+        intentos += 1
+        if intentos > intentos_max:
+            raise ValueError('La integración no ha llegado de t = %g a t = '
+                             '%g en %d pasos (t = %g).'
+                             % (t_0, t_fin, intentos_max, t))
+        k_etapas[0] = f
+        for i in range(1, 6):
+            k_etapas[i] = derivadas(t + C[i] * paso,
+                                    y + paso * (A[i] @ k_etapas[:i]))
+        y_nuevo = y + paso * (B[:6] @ k_etapas[:6])
+        f_nuevo = np.asarray(derivadas(t + paso, y_nuevo), dtype=float)
+        k_etapas[6] = f_nuevo
+        evaluaciones += 6
+        escala = atol + rtol * np.maximum(np.abs(y), np.abs(y_nuevo))
+        error = np.sqrt(np.mean((paso * (E @ k_etapas) / escala)**2))
+        if not np.isfinite(error) or error > 1:
+            #Paso rechazado: se reduce y se repite.
+            paso *= max(.2, .9 * error**-.2) if np.isfinite(error) else .2
+            minimo = (PASO_MIN * max(1, abs(t)) if paso_min is None
+                      else paso_min)
+            if paso < minimo and paso < t_fin - t:
+                raise ValueError('El paso de integración ha bajado de %g en '
+                                 't = %g (error %g).' % (minimo, t, error))
+            continue
+        pasos += 1
+        t_nuevo = t + paso if paso < t_fin - t else t_fin
+        #Eventos dentro del paso: se detiene en el primero que se dispare.
+        disparo = None
+        for i, ev in enumerate(eventos):
+            g_nuevo = ev.funcion(t_nuevo, y_nuevo)
+            if _cruce(ev, g_eventos[i], g_nuevo):
+                t_raiz = _raiz(ev, t, y, paso, k_etapas, g_eventos[i],
+                               t_nuevo, g_nuevo, 1e-12 * max(1, abs(t)))
+                if disparo is None or t_raiz < disparo[1]:
+                    disparo = (i, t_raiz)
+            g_eventos[i] = g_nuevo
+        t_corte = t_nuevo if disparo is None else disparo[1]
+        while i_salida < len(t_salida) and t_salida[i_salida] < t_corte:
+            salidas.append((t_salida[i_salida],
+                            _densa(t, y, paso, k_etapas,
+                                   t_salida[i_salida])))
+            i_salida += 1
+        if disparo is not None:
+            contar('pasos', pasos)
+            contar('evaluaciones_derivadas', evaluaciones)
+            return Integracion(disparo[1], _densa(t, y, paso, k_etapas,
+                                                  disparo[1]),
+                               disparo[0], salidas, evaluaciones, pasos)
+        t, y, f = t_nuevo, y_nuevo, f_nuevo
+        paso = min(paso * min(5, .9 * max(error, 1e-10)**-.2), paso_max)
+    while i_salida < len(t_salida) and t_salida[i_salida] <= t:
+        salidas.append((t_salida[i_salida], y.copy()))
+        i_salida += 1
+    contar('pasos', pasos)
+    contar('evaluaciones_derivadas', evaluaciones)
+    return Integracion(t, y, None, salidas, evaluaciones, pasos)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Modelo atmosférico: ATMÓSFERA ESTÁNDAR INTERNACIONAL (ISA).
+
+Funciones de gradiente de temperatura (alf_isa), temperatura (temperature),
+densidad (density), presión (pressure) y viscosidad (viscosity).  Sólo
+requieren una variable de entrada: la altitud.  La función atmosphere devuelve
+todas las variables a la vez.
+
+Los valores en la base de cada capa (altitud, temperatura, gradiente, densidad
+y presión) se calculan una única vez al importar el módulo y la capa se busca
+por bisección sobre la altitud.
+
+Las funciones terminadas en _array admiten un vector de altitudes (ndarray de
+NumPy) y devuelven vectores con los mismos valores que las versiones escalares.
+La capa de cada altitud se obtiene con searchsorted sobre la misma tabla.
+
+"""
+
+from bisect import bisect_right
+from math import exp
+
+import numpy as np
+
+#Constantes atmosféricas.
+R_AIR = 287  # Constante de los gases ideales (J/Kkg).
+GRAV = 9.80665  # Aceleración gravitatoria (m/s2).
+RHO_SL = 101325 / (R_AIR * 288.15)  # Densidad a nivel del mar (kg/m3).
+GAMMA = 1.4  # Coeficiente de dilatación adiabática.
+BETA_VISC = .000001458  # Viscosidad de referencia (Pa s/K.5).
+S_VISC = 110.4  # Temperatura de referencia para la viscosidad (K).
+
+#Estas son las alturas estipuladas según la normativa.
+
+H_ISA1 = 11000
+H_ISA2 = 20000
+H_ISA3 = 32000
+H_ISA4 = 47000
+H_ISA5 = 51000
+H_ISA6 = 71000
+H_ISA7 = 84852
+
+#Tabla de las capas de la ISA.  Para cada capa se guardan la altitud base
+# (m), el gradiente de temperatura (K/m) y la temperatura en la base (K).  La
+# última capa es la isoterma que extrapola el modelo por encima de H_ISA7.
+
+H_BASE = (0, H_ISA1, H_ISA2, H_ISA3, H_ISA4, H_ISA5, H_ISA6, H_ISA7)
+ALFA_BASE = (-.0065, 0, .001, .0028, 0, -.0028, -.002, 0)
+T_BASE = (288.15, 216.65, 216.65, 228.65, 270.65, 270.65, 214.65,
+          214.65 - .002 * (H_ISA7 - H_ISA6))
+
+def _densidades_base():
+    '''Densidad en la base de cada capa.  Se integra el principio de Pascal
+    capa a capa desde el nivel del mar; en las capas isotermas, con su
+    temperatura.  Sólo se evalúa una vez, al importar el módulo.
+    '''
+    rho_base = [RHO_SL]
+    for i in range(len(H_BASE) - 1):
+        if ALFA_BASE[i] == 0:
+            rho_base.append(rho_base[i] * exp(-GRAV * (H_BASE[i + 1]
+                                                       - H_BASE[i])
+                                              / (R_AIR * T_BASE[i])))
+        else:
+            rho_base.append(rho_base[i] * (T_BASE[i + 1] / T_BASE[i])**(
+                -GRAV / (R_AIR * ALFA_BASE[i]) - 1))
+    return tuple(rho_base)
+
+RHO_BASE = _densidades_base()  # Densidad en la base de cada capa (kg/m3).
+P_BASE = tuple(rho_0 * R_AIR * t_0 for rho_0, t_0 in zip(RHO_BASE, T_BASE))
+# Presión en la base de cada capa (Pa).
+EXP_BASE = tuple(-GRAV / (R_AIR * alf) - 1 if alf != 0 else 0
+                 for alf in ALFA_BASE)
+# Exponente de la ley de densidades en las capas con gradiente.
+
+def capa(alt):
+    '''Índice de la capa de la ISA en la que se encuentra la altitud dada.
+    Las altitudes negativas se asignan a la primera capa.
+    '''
+    i = bisect_right(H_BASE, alt) - 1
+    if i < 0:
+        return 0
+    return i
+
+#Ahora se programan las variables termodinámicas, en función de la altura,
+# y se relacionarán con los valores de T y alfa para cada altura estipulada.
+
+def alfa_isa(alt):
+    '''Parámetro alfa de la ISA.  Este parámetro proporciona el gradiente de
+    temperatura en K/m.
+    '''
+    return ALFA_BASE[capa(alt)]
+
+def temperature(alt):
+    '''Cálculo de la temperatura en función de la altura dada por el modelo
+    ISA.
+    '''
+    i = capa(alt)
+    return T_BASE[i] + ALFA_BASE[i] * (alt - H_BASE[i])
+
+def _density_capa(i, alt, t_isa):
+    '''Densidad en la capa i a partir de los valores de la base.  En las
+    capas isotermas se usa la exponencial y en el resto la ley potencial.
+    '''
+    if ALFA_BASE[i] == 0:
+        return RHO_BASE[i] * exp(-GRAV * (alt - H_BASE[i]) / (R_AIR * t_isa))
+    return RHO_BASE[i] * (t_isa / T_BASE[i])**EXP_BASE[i]
+
+def density(alt):
+    '''Cálculo de la densidad en función de la altura dada por el modelo ISA.
+    Se implementa el principio de Pascal.
+    '''
+    i = capa(alt)
+    t_isa = T_BASE[i] + ALFA_BASE[i] * (alt - H_BASE[i])
+    return _density_capa(i, alt, t_isa)
+
+def pressure(alt):
+    '''Cálculo de la presión en función de la altura dada por el modelo ISA.
+    Se implementa la ley de los gases ideales.
+    '''
+    return density(alt) * R_AIR * temperature(alt)
+
+def viscosity(alt):
+    '''Cálculo de la viscosidad en función de la altura dada por el modelo ISA.
+    Se implementa la ley de Sutherland.
+    '''
+    temp = temperature(alt)
+    return BETA_VISC * temp**(3 / 2) / (temp + S_VISC)
+
+def atmosphere(alt):
+    '''Estado atmosférico completo en una sola llamada.  Devuelve la tupla
+    (temperatura, densidad, presión, viscosidad, velocidad del sonido) con
+    una única búsqueda de capa, en lugar de llamar a cada función por
+    separado.
+    '''
+    i = capa(alt)
+    temp = T_BASE[i] + ALFA_BASE[i] * (alt - H_BASE[i])
+    rho = _density_capa(i, alt, temp)
+    return (temp, rho, rho * R_AIR * temp,
+            BETA_VISC * temp**(3 / 2) / (temp + S_VISC),
+            (GAMMA * R_AIR * temp)**.5)
+
+
+#---------------------------VERSIONES VECTORIZADAS----------------------------
+#Tablas de las capas como vectores de NumPy para indexarlas con la capa de
+# cada altitud.
+
+_H_BASE = np.array(H_BASE, dtype=float)
+_ALFA_BASE = np.array(ALFA_BASE)
+_T_BASE = np.array(T_BASE)
+_RHO_BASE = np.array(RHO_BASE)
+_EXP_BASE = np.array(EXP_BASE)
+
+def capa_array(alt):
+    '''Índice de la capa de la ISA para cada altitud de un vector.
+    '''
+    return np.maximum(np.searchsorted(_H_BASE, alt, side='right') - 1, 0)
+
+def temperature_array(alt):
+    '''Temperatura de la ISA para un vector de altitudes.
+    '''
+    alt = np.asarray(alt, dtype=float)
+    i = capa_array(alt)
+    return _T_BASE[i] + _ALFA_BASE[i] * (alt - _H_BASE[i])
+
+def _density_capa_array(i, alt, t_isa):
+    '''Densidad para un vector de altitudes cuyas capas son i.  Se evalúan
+    ambas leyes y se elige con la máscara de las capas isotermas.
+    '''
+    return np.where(_ALFA_BASE[i] == 0,
+                    _RHO_BASE[i] * np.exp(-GRAV * (alt - _H_BASE[i])
+                                          / (R_AIR * t_isa)),
+                    _RHO_BASE[i] * (t_isa / _T_BASE[i])**_EXP_BASE[i])
+
+def density_array(alt):
+    '''Densidad de la ISA para un vector de altitudes.
+    '''
+    alt = np.asarray(alt, dtype=float)
+    i = capa_array(alt)
+    t_isa = _T_BASE[i] + _ALFA_BASE[i] * (alt - _H_BASE[i])
+    return _density_capa_array(i, alt, t_isa)
+
+def pressure_array(alt):
+    '''Presión de la ISA para un vector de altitudes.
+    '''
+    return density_array(alt) * R_AIR * temperature_array(alt)
+
+def viscosity_array(alt):
+    '''Viscosidad de la ISA para un vector de altitudes.
+    '''
+    temp = temperature_array(alt)
+    return BETA_VISC * temp**(3 / 2) / (temp + S_VISC)
+
+def atmosphere_array(alt, delta_t=None):
+    '''Versión vectorizada de atmosphere.  Devuelve la tupla de vectores
+    (temperatura, densidad, presión, viscosidad, velocidad del sonido).
+    Si se da delta_t (K, escalar o vector), es la atmósfera ISA + delta_t: la
+    presión es la de la ISA a esa altitud y la temperatura está desplazada
+    delta_t; la densidad se obtiene de la ley de los gases ideales.
+    '''
+    alt = np.asarray(alt, dtype=float)
+    i = capa_array(alt)
+    temp = _T_BASE[i] + _ALFA_BASE[i] * (alt - _H_BASE[i])
+    rho = _density_capa_array(i, alt, temp)
+    if delta_t is not None:
+        presion = rho * R_AIR * temp
+        temp = temp + delta_t
+        rho = presion / (R_AIR * temp)
+    return (temp, rho, rho * R_AIR * temp,
+            BETA_VISC * temp**(3 / 2) / (temp + S_VISC),
+            (GAMMA * R_AIR * temp)**.5)
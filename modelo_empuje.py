@@ -10,24 +10,129 @@ del F-18 (el empuje máximo a nivel del mar) y con el dato de la altura, el cual
 nos dará el valor de densidad, podremos obtener el valor del empuje equivalente
 a cada altura en la que nos estemos moviendo.
 
+Además de thrust (escalar) y thrust_array (vectorizada), el empuje se puede
+interpolar en una tabla sobre una rejilla de Mach y densidad relativa (ver
+TablaEmpuje).  La tabla se construye con construir_tabla_empuje a partir de
+thrust o de cualquier otra planta motora dada por puntos en la misma rejilla.
+Error de la interpolación bilineal frente a thrust con la rejilla por defecto
+(Mach 0 a 2,5 cada 0,01 y densidad relativa 0 a 1 cada 0,005), medido en el
+centro de cada celda:
+    - Error absoluto máximo: 33 N (0,033 % de TH_SL).
+    - Error relativo inferior al 0,05 % en la zona en que vuela el avión en el
+      giro (Mach 0,8 a 2 y densidad relativa 0,05 a 0,4) e inferior al 0,27 %
+      allí donde el empuje supera el 10 % de TH_SL.
+El ajuste de thrust se hace negativo a densidades relativas altas y Mach
+intermedios, fuera de la zona de vuelo; cerca de esos ceros el error relativo
+no está acotado, así que el error de la tabla se da en absoluto.
+
 """
 
+from collections import namedtuple
 from math import exp
-from modeloISA import density
+
+import numpy as np
+
+from modeloISA import RHO_SL
 
 
 TH_SL = 100000  # Empuje a nivel del mar (máximo).
 
+MACH_MAX_EMPUJE = 2.5  # Mach máximo de la tabla de empuje.
+PASO_MACH_EMPUJE = .01  # Paso de la rejilla en Mach.
+PASO_DENSIDAD_EMPUJE = .005  # Paso de la rejilla en densidad relativa.
+
+TablaEmpuje = namedtuple('TablaEmpuje',
+                         'paso_mach paso_densidad empuje error_max filas')
+# El Mach y la densidad relativa de la tabla empiezan en 0.  empuje es un
+# ndarray de dimensiones (número de Mach, número de densidades) en N, y filas
+# la misma tabla como listas de Python para la interpolación escalar.
+# error_max es el error absoluto máximo medido frente a thrust, dividido por
+# el máximo valor absoluto del empuje de la tabla (None si la tabla no se ha
+# construido a partir de thrust).
+
 def thrust(mach, den):
     '''Cálculo del empuje de la aeronave. Esta función se obtiene a partir de
     las gráficas del empuje del motor GE F404-400, cf. "Thrust Data for
     Performance Calculations" en M. Saarlas, "Aircraft Performance", p. 273.
     Se tiene en cuenta que la aeronave cuenta con dos motores GE F404-400.
     '''
-    d_th = den / density(0)
+    d_th = den / RHO_SL
     i = (.050618013228 + .11323534299 * d_th + 7.8263530571 * d_th**2
          - 15.012158645 * d_th**3)
     a_th = 1.1062543547 * d_th**1.276913816
     c_th = d_th * .862301392 + 1.937299323
     z_th = -.347382668*d_th + 1.71160358
     return TH_SL * (a_th + i * exp(-c_th * (mach - z_th)**2))
+
+def thrust_array(mach, den):
+    '''Versión vectorizada de thrust para vectores de Mach y densidad.
+    '''
+    d_th = np.asarray(den, dtype=float) / RHO_SL
+    i = (.050618013228 + .11323534299 * d_th + 7.8263530571 * d_th**2
+         - 15.012158645 * d_th**3)
+    a_th = 1.1062543547 * d_th**1.276913816
+    c_th = d_th * .862301392 + 1.937299323
+    z_th = -.347382668*d_th + 1.71160358
+    return TH_SL * (a_th + i * np.exp(-c_th * (mach - z_th)**2))
+
+def construir_tabla_empuje(mach_max=MACH_MAX_EMPUJE,
+                           paso_mach=PASO_MACH_EMPUJE,
+                           paso_densidad=PASO_DENSIDAD_EMPUJE, empuje=None):
+    '''Tabla de empuje sobre la rejilla de Mach (0 a mach_max) y densidad
+    relativa (0 a 1).  Si no se da la matriz empuje (N) de otra planta motora
+    en esa rejilla, se evalúa thrust y se mide el error máximo de la
+    interpolación en el centro de cada celda (ver TablaEmpuje).
+    '''
+    mach = paso_mach * np.arange(round(mach_max / paso_mach) + 1)
+    d_th = paso_densidad * np.arange(round(1 / paso_densidad) + 1)
+    error_max = None
+    if empuje is None:
+        empuje = thrust_array(mach[:, None], RHO_SL * d_th[None, :])
+        centro = thrust_array((mach[:-1, None] + mach[1:, None]) / 2,
+                              RHO_SL * (d_th[None, :-1] + d_th[None, 1:]) / 2)
+        interpolado = (empuje[:-1, :-1] + empuje[1:, :-1] + empuje[:-1, 1:]
+                       + empuje[1:, 1:]) / 4
+        error_max = float(np.max(np.abs(interpolado - centro))
+                          / np.max(np.abs(empuje)))
+    empuje = np.asarray(empuje, dtype=float)
+    return TablaEmpuje(paso_mach, paso_densidad, empuje, error_max,
+                       empuje.tolist())
+
+def empuje_tabla(tabla, mach, den):
+    '''Empuje (N) interpolado en la tabla.  Fuera de la tabla se calcula con
+    thrust.
+    '''
+    x_m = mach / tabla.paso_mach
+    x_d = den / RHO_SL / tabla.paso_densidad
+    i = int(x_m)
+    j = int(x_d)
+    if (x_m < 0 or x_d < 0 or i >= len(tabla.filas) - 1
+            or j >= len(tabla.filas[0]) - 1):
+        return thrust(mach, den)
+    f_m = x_m - i
+    f_d = x_d - j
+    fila_0 = tabla.filas[i]
+    fila_1 = tabla.filas[i + 1]
+    return ((1 - f_m) * ((1 - f_d) * fila_0[j] + f_d * fila_0[j + 1])
+            + f_m * ((1 - f_d) * fila_1[j] + f_d * fila_1[j + 1]))
+
+def empuje_tabla_array(tabla, mach, den):
+    '''Versión vectorizada de empuje_tabla.
+    '''
+    mach, den = np.broadcast_arrays(np.asarray(mach, dtype=float),
+                                    np.asarray(den, dtype=float))
+    x_m = mach / tabla.paso_mach
+    x_d = den / RHO_SL / tabla.paso_densidad
+    dentro = ((x_m >= 0) & (x_d >= 0) & (x_m < tabla.empuje.shape[0] - 1)
+              & (x_d < tabla.empuje.shape[1] - 1))
+    i = np.where(dentro, x_m, 0).astype(int)
+    j = np.where(dentro, x_d, 0).astype(int)
+    f_m = x_m - i
+    f_d = x_d - j
+    th = tabla.empuje
+    empuje = ((1 - f_m) * ((1 - f_d) * th[i, j] + f_d * th[i, j + 1])
+              + f_m * ((1 - f_d) * th[i + 1, j] + f_d * th[i + 1, j + 1]))
+    if dentro.all():
+        return empuje
+    empuje[~dentro] = thrust_array(mach[~dentro], den[~dentro])
+    return empuje
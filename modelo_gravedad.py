@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Modelo gravitatorio: campo central de la Tierra esférica.  La aceleración de
+la gravedad sólo depende de la altitud.
+
+"""
+
+
+#--------------------------CONDICIONES GRAVITATORIAS--------------------------
+G = 6.673e-11  # Constante de gravitación universal (N m2/kg2).
+MT = 5.972e24  # Masa terrestre (kg).
+MU = G * MT
+RT = 6378136.3  # Radio terrestre (m).
+GRAV = MU / RT**2  # Aceleración de la gravedad a nivel del mar (m/s2).
+
+def gravedad(alt):
+    '''Aceleración de la gravedad (m/s2) a la altitud dada (m).
+    '''
+    return MU / (RT + alt)**2
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Búsqueda del punto de lanzamiento óptimo a lo largo del giro.  Además de
+lanzar un misil en cada paso del giro, se busca entre ellos el instante de
+lanzamiento (o el ángulo de asiento de la velocidad en el lanzamiento) que
+maximiza el objetivo elegido: altitud final, velocidad final, energía
+mecánica final o masa final del misil.
+
+El estado del avión entre dos puntos del giro se interpola linealmente.  La
+búsqueda empieza lanzando, en un solo lote, desde unos pocos puntos
+equiespaciados del tramo ascendente del giro (PUNTOS), lo que acota el máximo
+aunque el objetivo no sea unimodal, y refina los mejores máximos locales de ese
+barrido (REFINOS) con el método de Brent (interpolación parabólica con respaldo
+de sección áurea) entre sus dos puntos vecinos.  Con los puntos por defecto el
+número total de ascensos no pasa de EVALUACIONES_MAX.  Un máximo más
+estrecho que la separación del barrido puede perderse: el pico de velocidad
+final de los lanzamientos en los que el fin de la combustión coincide con el
+ángulo de asiento nulo dura menos de medio segundo de giro, y sólo se encuentra
+si un punto del barrido cae cerca de él.  Para buscarlo hay que aumentar
+puntos.
+
+Conviene usar el integrador adaptativo (metodo='rk45'): con Euler de paso
+fijo el estado final varía a saltos con el instante de lanzamiento, porque la
+parada se detecta en la rejilla de pasos, y la interpolación parabólica pierde
+eficacia.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from simulacion import LaunchState, InitialState, PullupParams, RocketParams
+from simulacion import simulate_pullup, simulate_ascent, simulate_launches
+
+
+OBJETIVOS = ('altitud', 'velocidad', 'emecanica', 'masa')
+# Campos de LaunchResult que se pueden maximizar.
+VARIABLES = ('t', 'gama')
+# Campos de LaunchState con los que se puede recorrer el giro.
+ORO = (3 - 5**.5) / 2  # Razón de la sección áurea.
+PUNTOS = 9  # Puntos del giro del barrido inicial.
+REFINOS = 2  # Máximos locales del barrido inicial que se refinan.
+EVALUACIONES_REFINO = 21
+# Ascensos integrados como máximo al refinar los máximos locales.
+EVALUACIONES_MAX = PUNTOS + EVALUACIONES_REFINO
+# Ascensos integrados como máximo en una búsqueda con PUNTOS puntos.
+
+Optimo = namedtuple('Optimo', 'variable valor resultado evaluaciones')
+#Resultado de la búsqueda: variable recorrida ('t' o 'gama'), su valor
+# óptimo (s o rad), resultado del lanzamiento óptimo (LaunchResult) y número
+# de ascensos integrados.
+
+
+def interpolar_lanzamiento(lanzamientos, variable, valor):
+    '''Estado del avión (LaunchState) en el punto del giro en el que la
+    variable ('t' o 'gama') toma el valor dado, interpolando linealmente entre
+    los dos puntos de lanzamiento más cercanos.  La variable debe ser
+    creciente en lanzamientos.
+    '''
+    eje = np.array([getattr(lanz, variable) for lanz in lanzamientos])
+    i = min(max(int(np.searchsorted(eje, valor, 'right')) - 1, 0),
+            len(eje) - 2)
+    f = (valor - eje[i]) / (eje[i + 1] - eje[i])
+    return LaunchState(*(a + f * (b - a) for a, b in
+                         zip(lanzamientos[i], lanzamientos[i + 1])))
+
+
+def brent(f, a, b, tol=1e-3, max_iter=100):
+    '''Mínimo de f en el intervalo [a, b] por el método de Brent, con
+    tolerancia absoluta tol en la variable.  Devuelve el par (x, f(x)).
+    '''
+    x = w = v = a + ORO * (b - a)
+    f_x = f_w = f_v = f(x)
+    d = e = 0
+    for _ in range(max_iter):
+        m = .5 * (a + b)
+        if abs(x - m) <= 2 * tol - .5 * (b - a):
+            break
+        parabola = False
+        if abs(e) > tol:
+            #Paso parabólico por x, w y v.
+            r = (x - w) * (f_x - f_v)
+            q = (x - v) * (f_x - f_w)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            if abs(p) < abs(.5 * q * e) and q * (a - x) < p < q * (b - x):
+                e = d
+                d = p / q
+                if x + d - a < 2 * tol or b - x - d < 2 * tol:
+                    d = tol if x < m else -tol
+                parabola = True
+        if not parabola:
+            #Paso de sección áurea hacia el mayor de los dos subintervalos.
+            e = b - x if x < m else a - x
+            d = ORO * e
+        u = x + d if abs(d) >= tol else x + (tol if d > 0 else -tol)
+        f_u = f(u)
+        if f_u <= f_x:
+            if u < x:
+                b = x
+            else:
+                a = x
+            v, f_v, w, f_w, x, f_x = w, f_w, x, f_x, u, f_u
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if f_u <= f_w or w == x:
+                v, f_v, w, f_w = w, f_w, u, f_u
+            elif f_u <= f_v or v in (x, w):
+                v, f_v = u, f_u
+    return x, f_x
+
+
+def optimizar_lanzamiento(lanzamientos, rocket_params, objetivo='altitud',
+                          variable='t', metodo='rk45', tol=1e-3,
+                          puntos=PUNTOS, tabla_cd=None):
+    '''Punto de lanzamiento del giro (lista de LaunchState) que maximiza el
+    campo objetivo del LaunchResult del misil (ver OBJETIVOS).  Sólo se
+    consideran los puntos con ángulo de asiento de la velocidad positivo: el
+    resto no llega a ascender.  Se evalúan puntos puntos equiespaciados en la
+    variable, todos en un mismo lote, y se refinan los REFINOS mejores
+    máximos locales con brent entre sus vecinos hasta la tolerancia tol (s o
+    rad), con EVALUACIONES_REFINO ascensos como máximo entre todos.
+    Devuelve un Optimo.
+    '''
+    if objetivo not in OBJETIVOS:
+        raise ValueError('Objetivo desconocido: %r.' % (objetivo,))
+    if variable not in VARIABLES:
+        raise ValueError('Variable desconocida: %r.' % (variable,))
+    if puntos < 3:
+        raise ValueError('El barrido inicial necesita al menos 3 puntos.')
+    #Tramo del giro en el que el misil asciende.
+    primero = next((i for i, lanz in enumerate(lanzamientos) if lanz.gama > 0),
+                   None)
+    if primero is None or primero > len(lanzamientos) - 2:
+        raise ValueError('El giro no tiene tramo ascendente.')
+    tramo = lanzamientos[primero:]
+    eje = np.array([getattr(lanz, variable) for lanz in tramo])
+    if np.any(np.diff(eje) <= 0):
+        raise ValueError('La variable %r no es creciente a lo largo del giro.'
+                         % (variable,))
+    resultados = {}
+
+    def evaluar(valor):
+        '''Resultado del lanzamiento en el punto valor del giro.
+        '''
+        if valor not in resultados:
+            resultados[valor] = simulate_ascent(
+                interpolar_lanzamiento(tramo, variable, valor),
+                rocket_params, metodo, tabla_cd=tabla_cd)
+        return resultados[valor]
+
+    def coste(valor):
+        '''Objetivo cambiado de signo, para minimizar.
+        '''
+        return -getattr(evaluar(valor), objetivo)
+
+    #Barrido inicial para acotar los máximos.
+    valores = np.linspace(eje[0], eje[-1], puntos).tolist()
+    resultados.update(zip(valores, simulate_launches(
+        [interpolar_lanzamiento(tramo, variable, valor) for valor in valores],
+        rocket_params, metodo, tabla_cd=tabla_cd)))
+    costes = [coste(valor) for valor in valores]
+    #Máximos locales del barrido, del mejor al peor.
+    locales = sorted((k for k in range(puntos)
+                      if (k == 0 or costes[k] <= costes[k - 1])
+                      and (k == puntos - 1 or costes[k] <= costes[k + 1])),
+                     key=costes.__getitem__)[:REFINOS]
+    k = locales[0]
+    valor, coste_min = valores[k], costes[k]
+    for j, k in enumerate(locales):
+        #Ascensos que le quedan a este refino (brent hace uno por iteración
+        # y otro al empezar).
+        iteraciones = ((puntos + EVALUACIONES_REFINO - len(resultados))
+                       // (len(locales) - j) - 1)
+        if iteraciones < 1:
+            break
+        x, f_x = brent(coste, valores[max(k - 1, 0)],
+                       valores[min(k + 1, puntos - 1)], tol, iteraciones)
+        if f_x < coste_min:
+            valor, coste_min = x, f_x
+    return Optimo(variable, valor, evaluar(valor), len(resultados))
+
+
+def optimizar_caso(caso, objetivo='altitud', variable='t', metodo='rk45',
+                   dt=.1, tol=1e-3, puntos=PUNTOS, tabla_cd=None):
+    '''Giro del avión del caso (simulacion.Caso) y búsqueda del lanzamiento
+    óptimo sobre él (ver optimizar_lanzamiento).
+    '''
+    lanzamientos = simulate_pullup(InitialState(caso.h, caso.mach),
+                                   PullupParams(caso.beta, dt, metodo))
+    return optimizar_lanzamiento(lanzamientos,
+                                 RocketParams(caso.isp, caso.gasto,
+                                              caso.masa_propulsante),
+                                 objetivo, variable, metodo, tol, puntos,
+                                 tabla_cd)
@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Pruebas de rendimiento del modelo.  Sin conexión ni dependencias aparte de
+NumPy:
+    - Micro: cada función del modelo (atmósfera, aerodinámica del misil y
+      empuje) evaluada sobre un conjunto fijo de puntos.  El tiempo se da por
+      evaluación.
+    - Macro: un giro del avión, un ascenso del misil, los ascensos de todos
+      los puntos de un giro y un barrido reducido.  El tiempo se da por
+      ejecución.
+
+Cada prueba se repite varias veces y se guarda el mejor tiempo, que es el
+menos sensible a la carga del equipo.  Los resultados se escriben en JSON y
+sirven de línea base: comparar señala las pruebas cuyo tiempo crece más que un
+umbral respecto de la línea base.
+
+Las referencias (directorio referencias) son las tablas de resultados de unos
+pocos casos simulados con el modelo actual (generar_referencias).
+comprobar_referencias vuelve a simular los casos y mide la diferencia de cada
+columna con ellas, para confirmar que una optimización no cambia los
+resultados: se admite sólo el redondeo (RTOL).  Un cambio que altera los
+resultados a propósito (una corrección del modelo) regenera las referencias y
+apunta su diferencia esperada en DIFERENCIAS_MODELO.
+
+Las tablas del código de partida (el primer commit del repositorio) están en
+referencias/partida: las de Euler de PARTIDA, escritas por su programa
+principal, limitado a esos Isp y con los números del fichero de texto a
+precisión completa ('{0!r}' en lugar de '{0:.3f}'), e importadas con
+importar_referencia.  comparar_partida mide la diferencia del modelo actual
+con ellas, que sólo se informa junto a la suma de DIFERENCIAS_MODELO: no es
+una comprobación.
+
+Con las referencias se comprueba también el coste de la búsqueda del
+lanzamiento óptimo (optimizacion): comprobar_optimizacion cuenta los ascensos
+que integra para cada objetivo, que no deben pasar de EVALUACIONES_MAX.  Y
+comprobar_nucleo compara el núcleo de ascenso_jit (compilado si Numba está
+instalado) con ascenso_lote en los lanzamientos de un giro, con la misma
+tolerancia que las referencias.
+
+Uso:
+    python rendimiento.py medir [--salida base.json] [--pruebas ...]
+    python rendimiento.py comparar base.json nuevo.json [--umbral .1]
+    python rendimiento.py referencias [--generar [NOMBRE ...]] [--rtol 1e-9]
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import namedtuple, OrderedDict
+from math import ceil
+
+import numpy as np
+
+from modeloISA import density, temperature, viscosity, atmosphere
+from modeloISA import atmosphere_array, density_array
+from aero_misil import cdll, cdll_estado, cdll_array
+from modelo_empuje import thrust, thrust_array, empuje_tabla
+from modelo_empuje import construir_tabla_empuje
+from tabla_cdll import cargar_tabla, cd_tabla
+from simulacion import Caso, InitialState, PullupParams, RocketParams
+from simulacion import simulate_pullup, simulate_ascent, simulate_launches
+from simulacion import simular_caso, cargar_resultados, TIPO_RESULTADOS
+from barrido import ejecutar_barrido, rejilla
+from optimizacion import optimizar_caso, OBJETIVOS, EVALUACIONES_MAX
+from ascenso_jit import comprobar_paridad, NUMBA
+
+
+DIRECTORIO_REFERENCIAS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'referencias')
+# Directorio de las tablas de resultados de referencia.
+DIRECTORIO_PARTIDA = os.path.join(DIRECTORIO_REFERENCIAS, 'partida')
+# Directorio de las tablas de resultados del código de partida.
+REPETICIONES = 5  # Número de repeticiones de cada prueba.
+TIEMPO_MINIMO = .2  # Duración mínima de cada repetición (s).
+UMBRAL = .1  # Aumento relativo del tiempo que se considera una regresión.
+RTOL = 1e-9
+# Diferencia admitida frente a las referencias, relativa al mayor valor
+# absoluto de cada columna.
+
+REFERENCIAS = OrderedDict([('euler_2156', (Caso(2156), 'euler')),
+                           ('euler_2656', (Caso(2656), 'euler')),
+                           ('rk45_2156', (Caso(2156), 'rk45'))])
+# Casos de referencia: nombre del fichero, caso e integrador.
+PARTIDA = ('euler_2156', 'euler_2656')
+# Casos de REFERENCIAS con tabla del código de partida.
+
+DIFERENCIAS_MODELO = OrderedDict([
+    ('mach_sin_ascenso', {'mach': 3e-3}),
+    ('densidad_isa', {'tiempo': .06, 'altitud': .005, 'velocidad': .015,
+                      'mach': .015, 'theta': .12, 'emecanica': .02,
+                      'x': .04}),
+    ('cd_base_mach_alto', {'tiempo': .045, 'altitud': .012,
+                           'velocidad': .045, 'mach': .06, 'theta': .045,
+                           'masa': 2e-4, 'emecanica': .06, 'x': .04}),
+])
+#Diferencia esperada frente a las tablas del código de partida de cada cambio
+# que altera los resultados a propósito: diferencia máxima de cada columna,
+# relativa a su mayor valor absoluto.  comparar_partida informa de su suma.
+#   - mach_sin_ascenso: el Mach final de los misiles lanzados con theta <= 0,
+#     que no dan ningún paso, es el de su punto de lanzamiento.  El código de
+#     partida escribía el del lanzamiento anterior.
+#   - densidad_isa: las densidades en la base de las capas de la ISA por
+#     encima de 20 km se integran con la temperatura de las capas isotermas
+#     (ver modeloISA), no con la de la altitud evaluada.
+#   - cd_base_mach_alto: por encima de Mach 3,5 el coeficiente de resistencia
+#     base del misil es constante, 0,15 (ver aero_misil), en lugar de la
+#     cúbica supersónica extrapolada.
+
+Comparacion = namedtuple('Comparacion', 'prueba base nuevo cociente '
+                         'regresion')
+#Comparación de una prueba con la línea base: tiempos (s), cociente entre el
+# nuevo y el de la línea base y si supera el umbral.
+
+#Puntos de evaluación de las micropruebas: altitudes de todas las capas de la
+# ISA y Mach de todos los tramos de la resistencia del misil.
+ALTITUDES = np.linspace(0, 100000, 101).tolist()
+MACHS = np.linspace(.5, 6, 101).tolist()
+MACHS_AVION = np.linspace(.3, 2.3, 101).tolist()
+ALTITUDES_AVION = np.linspace(0, 20000, 101).tolist()
+
+
+def _micro(funcion, *columnas):
+    '''Prueba que evalúa funcion en cada punto de columnas.  Devuelve la
+    prueba y el número de evaluaciones que hace.
+    '''
+    puntos = list(zip(*columnas))
+
+    def prueba():
+        '''Evaluación de funcion en todos los puntos.
+        '''
+        for punto in puntos:
+            funcion(*punto)
+
+    return prueba, len(puntos)
+
+
+def _vectorizada(funcion, *columnas):
+    '''Prueba que evalúa funcion una vez con vectores de todos los puntos.
+    El tiempo se reparte entre los puntos.
+    '''
+    columnas = [np.asarray(c) for c in columnas]
+    return lambda: funcion(*columnas), columnas[0].size
+
+
+def _atmosfera_cdll():
+    '''Velocidad, densidad y viscosidad de cada punto de las micropruebas de
+    cdll_estado.
+    '''
+    atmosferas = [atmosphere(alt) for alt in ALTITUDES]
+    return (MACHS, [mach * a[4] for mach, a in zip(MACHS, atmosferas)],
+            [a[1] for a in atmosferas], [a[3] for a in atmosferas])
+
+
+def _micropruebas():
+    '''Preparación de las micropruebas: nombre y función sin argumentos que
+    devuelve la prueba y su número de evaluaciones.
+    '''
+    densidades_avion = density_array(ALTITUDES_AVION).tolist()
+    return OrderedDict([
+        ('density', lambda: _micro(density, ALTITUDES)),
+        ('temperature', lambda: _micro(temperature, ALTITUDES)),
+        ('viscosity', lambda: _micro(viscosity, ALTITUDES)),
+        ('atmosphere', lambda: _micro(atmosphere, ALTITUDES)),
+        ('atmosphere_array', lambda: _vectorizada(atmosphere_array,
+                                                  ALTITUDES)),
+        ('cdll', lambda: _micro(cdll, MACHS, ALTITUDES)),
+        ('cdll_estado', lambda: _micro(cdll_estado, *_atmosfera_cdll())),
+        ('cdll_array', lambda: _vectorizada(cdll_array, MACHS, ALTITUDES)),
+        ('cd_tabla', lambda: _micro(
+            lambda mach, alt, tabla=cargar_tabla(): cd_tabla(tabla, mach,
+                                                             alt),
+            MACHS, ALTITUDES)),
+        ('thrust', lambda: _micro(thrust, MACHS_AVION, densidades_avion)),
+        ('thrust_array', lambda: _vectorizada(thrust_array, MACHS_AVION,
+                                              densidades_avion)),
+        ('empuje_tabla', lambda: _micro(
+            lambda mach, den, tabla=construir_tabla_empuje(): empuje_tabla(
+                tabla, mach, den), MACHS_AVION, densidades_avion))])
+
+
+def _barrido_reducido():
+    '''Barrido de dos casos en un solo proceso, con los ficheros en un
+    directorio temporal.
+    '''
+    casos = rejilla(isp=[2156, 2656])
+    temporal = tempfile.TemporaryDirectory()
+    # Se borra cuando deja de usarse la prueba.
+
+    def prueba():
+        '''Ejecución del barrido.
+        '''
+        ejecutar_barrido(casos, trabajadores=1, directorio=temporal.name)
+
+    return prueba, 1
+
+
+def _macropruebas():
+    '''Preparación de las macropruebas, como en _micropruebas.
+    '''
+    caso = Caso(2156)
+    cohete = RocketParams(caso.isp, caso.gasto, caso.masa_propulsante)
+    lanzamientos = simulate_pullup()
+    lanzamiento = lanzamientos[len(lanzamientos) // 2]
+    return OrderedDict([
+        ('giro_euler', lambda: (simulate_pullup, 1)),
+        ('giro_rk45', lambda: (
+            lambda: simulate_pullup(params=PullupParams(metodo='rk45')), 1)),
+        ('ascenso_euler', lambda: (
+            lambda: simulate_ascent(lanzamiento, cohete, 'euler'), 1)),
+        ('ascenso_rk45', lambda: (
+            lambda: simulate_ascent(lanzamiento, cohete, 'rk45'), 1)),
+        ('lanzamientos_euler', lambda: (
+            lambda: simulate_launches(lanzamientos, cohete, 'euler'), 1)),
+        ('barrido_reducido', _barrido_reducido)])
+
+
+def medir(prueba, evaluaciones=1, repeticiones=REPETICIONES,
+          tiempo_minimo=TIEMPO_MINIMO):
+    '''Tiempo por evaluación (s) de la función sin argumentos prueba, que
+    hace evaluaciones evaluaciones.  Cada repetición llama a prueba las veces
+    necesarias para durar al menos tiempo_minimo.  Devuelve un diccionario
+    con el mejor tiempo, la mediana, el número de llamadas por repetición y
+    el número de repeticiones.
+    '''
+    inicio = time.perf_counter()
+    prueba()
+    duracion = time.perf_counter() - inicio
+    bucles = max(1, ceil(tiempo_minimo / max(duracion, 1e-9)))
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(bucles):
+            prueba()
+        tiempos.append((time.perf_counter() - inicio)
+                       / (bucles * evaluaciones))
+    return {'segundos': min(tiempos), 'mediana': float(np.median(tiempos)),
+            'bucles': bucles, 'repeticiones': repeticiones}
+
+
+def ejecutar_pruebas(nombres=None, repeticiones=REPETICIONES,
+                     tiempo_minimo=TIEMPO_MINIMO):
+    '''Ejecuta las pruebas de la lista nombres (por defecto, todas).
+    Devuelve el diccionario de resultados con el entorno de ejecución y el
+    resultado de medir para cada prueba.
+    '''
+    pruebas = OrderedDict([(nombre, ('micro', preparar)) for nombre, preparar
+                           in _micropruebas().items()])
+    pruebas.update((nombre, ('macro', preparar)) for nombre, preparar
+                   in _macropruebas().items())
+    if nombres is None:
+        nombres = list(pruebas)
+    desconocidas = set(nombres) - set(pruebas)
+    if desconocidas:
+        raise ValueError('Pruebas desconocidas: %s.'
+                         % ', '.join(sorted(desconocidas)))
+    resultados = OrderedDict()
+    for nombre in nombres:
+        tipo, preparar = pruebas[nombre]
+        resultados[nombre] = dict(medir(*preparar(), repeticiones,
+                                        tiempo_minimo), tipo=tipo)
+    return {'entorno': {'python': platform.python_version(),
+                        'numpy': np.__version__,
+                        'plataforma': platform.platform(),
+                        'procesador': platform.processor(),
+                        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'pruebas': resultados}
+
+
+def guardar_pruebas(ruta, resultados):
+    '''Escribe los resultados de ejecutar_pruebas en JSON.
+    '''
+    with open(ruta, 'w') as f:
+        json.dump(resultados, f, indent=2)
+        f.write('\n')
+
+
+def cargar_pruebas(ruta):
+    '''Lee unos resultados guardados con guardar_pruebas.
+    '''
+    with open(ruta) as f:
+        return json.load(f)
+
+
+def comparar(base, nuevo, umbral=UMBRAL):
+    '''Compara los mejores tiempos de las pruebas comunes a dos resultados.
+    Hay regresión si el tiempo nuevo supera al de la línea base en más de la
+    fracción umbral.  Devuelve la lista de Comparacion.
+    '''
+    comparaciones = []
+    for prueba, resultado in nuevo['pruebas'].items():
+        if prueba not in base['pruebas']:
+            continue
+        t_base = base['pruebas'][prueba]['segundos']
+        cociente = resultado['segundos'] / t_base
+        comparaciones.append(Comparacion(prueba, t_base,
+                                         resultado['segundos'], cociente,
+                                         cociente > 1 + umbral))
+    return comparaciones
+
+
+def _simular_referencias(directorio, nombres=None):
+    '''Simula los casos de referencia (por defecto, todos) y guarda sus
+    tablas en directorio.
+    '''
+    for nombre in REFERENCIAS if nombres is None else nombres:
+        caso, metodo = REFERENCIAS[nombre]
+        simular_caso(caso, directorio, nombre, metodo=metodo)
+
+
+def _diferencias(directorio, nombres):
+    '''Vuelve a simular los casos de referencia nombres y devuelve, para cada
+    uno, un diccionario con la diferencia máxima de cada columna con su tabla
+    de directorio, relativa al mayor valor absoluto de la columna (infinita
+    si el número de lanzamientos no coincide).
+    '''
+    diferencias = OrderedDict()
+    with tempfile.TemporaryDirectory() as temporal:
+        _simular_referencias(temporal, nombres)
+        for nombre in nombres:
+            nueva = cargar_resultados(os.path.join(temporal, nombre + '.npy'),
+                                      mmap=False)
+            referencia = cargar_resultados(os.path.join(directorio,
+                                                        nombre + '.npy'),
+                                           mmap=False)
+            if nueva.shape != referencia.shape:
+                diferencias[nombre] = OrderedDict(
+                    (c, float('inf')) for c in referencia.dtype.names)
+                continue
+            diferencias[nombre] = OrderedDict(
+                (c, float(np.max(np.abs(nueva[c] - referencia[c]), initial=0)
+                          / (np.max(np.abs(referencia[c]), initial=0)
+                             or 1.)))
+                for c in referencia.dtype.names)
+    return diferencias
+
+
+def importar_referencia(ruta, nombre, directorio=DIRECTORIO_PARTIDA):
+    '''Guarda como tabla del código de partida (nombre.npy) el fichero de
+    texto de resultados de un caso escrito por él con los números a
+    precisión completa.  Devuelve la tabla.
+    '''
+    with open(ruta) as f:
+        next(f)  # Cabecera.
+        tabla = np.array([tuple(map(float, linea.split('\t')))
+                          for linea in f if linea.strip()],
+                         dtype=TIPO_RESULTADOS)
+    os.makedirs(directorio, exist_ok=True)
+    np.save(os.path.join(directorio, nombre + '.npy'), tabla)
+    return tabla
+
+
+def generar_referencias(directorio=DIRECTORIO_REFERENCIAS, nombres=None):
+    '''Simula los casos de referencia dados (por defecto, todos) con el
+    modelo actual y guarda sus tablas (nombre.npy).
+    '''
+    os.makedirs(directorio, exist_ok=True)
+    _simular_referencias(directorio, nombres)
+
+
+def comprobar_referencias(directorio=DIRECTORIO_REFERENCIAS):
+    '''Diferencia de cada columna de los casos de referencia con sus tablas
+    (ver _diferencias).
+    '''
+    return _diferencias(directorio, list(REFERENCIAS))
+
+
+def diferencias_esperadas():
+    '''Diferencia esperada de cada columna de las tablas de resultados
+    frente a las del código de partida: suma de las de DIFERENCIAS_MODELO.
+    '''
+    return {columna: sum(diferencias.get(columna, 0)
+                         for diferencias in DIFERENCIAS_MODELO.values())
+            for columna in TIPO_RESULTADOS.names}
+
+
+def comparar_partida(directorio=DIRECTORIO_PARTIDA):
+    '''Diferencia de cada columna de los casos de PARTIDA con las tablas del
+    código de partida (ver _diferencias).  Es informativa: la diferencia
+    esperada está en diferencias_esperadas.
+    '''
+    return _diferencias(directorio, list(PARTIDA))
+
+
+def comprobar_optimizacion(caso=Caso(2156), metodo='rk45'):
+    '''Búsqueda del lanzamiento óptimo del caso para cada objetivo.  Devuelve
+    un diccionario con el número de ascensos integrados por cada una.
+    '''
+    return OrderedDict((objetivo, optimizar_caso(caso, objetivo,
+                                                 metodo=metodo).evaluaciones)
+                       for objetivo in OBJETIVOS)
+
+
+def comprobar_nucleo(caso=Caso(2156)):
+    '''Diferencia relativa máxima de cada campo del ResultadoAscenso entre el
+    núcleo de ascenso_jit y ascenso_lote para los lanzamientos del giro del
+    caso (ver ascenso_jit.comprobar_paridad).
+    '''
+    lanzamientos = simulate_pullup(InitialState(caso.h, caso.mach),
+                                   PullupParams(caso.beta))
+    return comprobar_paridad([lanz.h for lanz in lanzamientos],
+                             [lanz.v for lanz in lanzamientos],
+                             [lanz.gama for lanz in lanzamientos],
+                             caso.gasto * caso.isp, caso.gasto,
+                             caso.masa_propulsante / caso.gasto)
+
+
+def argumentos(argv=None):
+    '''Lectura de las opciones de la línea de órdenes.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Pruebas de rendimiento y resultados de referencia.')
+    ordenes = parser.add_subparsers(dest='orden', required=True)
+    orden = ordenes.add_parser('medir', help='ejecutar las pruebas')
+    orden.add_argument('--pruebas', nargs='+',
+                       help='pruebas que se ejecutan (por defecto, todas)')
+    orden.add_argument('--salida', help='fichero JSON de resultados')
+    orden.add_argument('--repeticiones', type=int, default=REPETICIONES,
+                       help='repeticiones de cada prueba')
+    orden.add_argument('--tiempo-minimo', type=float, default=TIEMPO_MINIMO,
+                       help='duración mínima de cada repetición (s)')
+    orden = ordenes.add_parser('comparar',
+                               help='comparar con una línea base')
+    orden.add_argument('base', help='fichero JSON de la línea base')
+    orden.add_argument('nuevo', help='fichero JSON de los resultados nuevos')
+    orden.add_argument('--umbral', type=float, default=UMBRAL,
+                       help='aumento relativo del tiempo admitido')
+    orden = ordenes.add_parser('referencias',
+                               help='comprobar los resultados de referencia')
+    orden.add_argument('--generar', nargs='*', metavar='NOMBRE',
+                       help='volver a generar estas referencias con el '
+                       'modelo actual (por defecto, todas)')
+    orden.add_argument('--rtol', type=float, default=RTOL,
+                       help='diferencia admitida, relativa al mayor valor '
+                       'de cada columna')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''Ejecución de la orden de la línea de órdenes.  Devuelve 1 si hay
+    regresiones, diferencias con las referencias o entre los núcleos del
+    ascenso o búsquedas con demasiados ascensos y 0 si no.
+    '''
+    opciones = argumentos(argv)
+    if opciones.orden == 'medir':
+        resultados = ejecutar_pruebas(opciones.pruebas, opciones.repeticiones,
+                                      opciones.tiempo_minimo)
+        for prueba, resultado in resultados['pruebas'].items():
+            print('{0:20s} {1:5s} {2:12.3e} s'.format(
+                prueba, resultado['tipo'], resultado['segundos']))
+        if opciones.salida is not None:
+            guardar_pruebas(opciones.salida, resultados)
+        return 0
+    if opciones.orden == 'comparar':
+        comparaciones = comparar(cargar_pruebas(opciones.base),
+                                 cargar_pruebas(opciones.nuevo),
+                                 opciones.umbral)
+        for c in comparaciones:
+            print('{0:20s} {1:12.3e} {2:12.3e} {3:7.2f}{4}'.format(
+                c.prueba, c.base, c.nuevo, c.cociente,
+                '  REGRESIÓN' if c.regresion else ''))
+        return int(any(c.regresion for c in comparaciones))
+    if opciones.generar is not None:
+        generar_referencias(nombres=opciones.generar or None)
+        return 0
+    diferentes = False
+    for nombre, diferencias in comprobar_referencias().items():
+        columna = max(diferencias, key=diferencias.get)
+        diferente = diferencias[columna] > opciones.rtol
+        diferentes = diferentes or diferente
+        print('{0:12s} {1:.3e} ({2}, admitida {3:.3e}){4}'.format(
+            nombre, diferencias[columna], columna, opciones.rtol,
+            '  DIFERENTE' if diferente else ''))
+    #Comparación informativa con el código de partida.
+    esperadas = diferencias_esperadas()
+    for nombre, diferencias in comparar_partida().items():
+        columna = max(diferencias,
+                      key=lambda c: diferencias[c] / (esperadas[c] or RTOL))
+        print('partida {0:12s} {1:.3e} ({2}, esperada {3:.3e}){4}'.format(
+            nombre, diferencias[columna], columna, esperadas[columna],
+            '  MAYOR' if diferencias[columna] > esperadas[columna] + RTOL
+            else ''))
+    diferencias = comprobar_nucleo()
+    campo = max(diferencias, key=diferencias.get)
+    diferente = diferencias[campo] > opciones.rtol
+    diferentes = diferentes or diferente
+    print('{0:12s} {1:.3e} ({2}, admitida {3:.3e}){4}'.format(
+        'jit' if NUMBA else 'interpretado', diferencias[campo], campo,
+        opciones.rtol, '  DIFERENTE' if diferente else ''))
+    for objetivo, evaluaciones in comprobar_optimizacion().items():
+        excesivo = evaluaciones > EVALUACIONES_MAX
+        diferentes = diferentes or excesivo
+        print('{0:12s} {1:d} ascensos (máximo {2:d}){3}'.format(
+            objetivo, evaluaciones, EVALUACIONES_MAX,
+            '  EXCESIVO' if excesivo else ''))
+    return int(diferentes)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
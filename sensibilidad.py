@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Sensibilidad del estado final del misil a los parámetros del caso: Isp,
+gasto, masa de propulsante, ángulo final del giro (beta) y Mach inicial.  Las
+derivadas se calculan por diferencias centradas en una sola pasada: los
+misiles nominales y los perturbados de todos los puntos del giro avanzan a la
+vez como un único lote (ver ascenso_lote).  Beta y el Mach cambian el giro,
+que se integra una vez por cada valor perturbado.  El resultado es una tabla
+con una fila por punto de lanzamiento y, para cada salida, su valor nominal y
+su derivada respecto de cada parámetro.
+
+Cada punto de lanzamiento se identifica por su instante en el giro, así que
+la derivada respecto del Mach es a instante de lanzamiento constante (NaN en
+los últimos puntos, que no existen en uno de los giros perturbados).  Beta,
+en cambio, sólo fija cuándo termina el giro: a instante constante el giro no
+depende de él.  Su derivada se calcula para el lanzamiento al final del giro,
+en el punto en que el ángulo de asiento de la velocidad vale beta
+(interpolado entre los dos últimos puntos, porque el final se detecta en la
+rejilla de pasos del giro), y se guarda en la última fila de la tabla; en las
+demás es NaN.
+
+Con Euler (metodo='euler') el fin de la combustión se detecta en la rejilla
+de pasos del misil y el estado final varía a saltos con el tiempo de
+combustión.  Para que la diferencia no la dominen esos saltos, las
+perturbaciones del gasto y de la masa de propulsante se ajustan de modo que el
+tiempo de combustión cambie en un número entero de pasos (al menos uno), y se
+usa la fórmula de diferencias centradas con pasos distintos a cada lado.  Los
+misiles que terminan en el techo de altitud (ALTURA_FINAL) tienen altitud
+final constante: su derivada sólo refleja cuánto sobrepasan el techo en el
+último paso.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from ascenso_lote import ascenso_lote, ResultadoAscenso
+from simulacion import InitialState, PullupParams, simulate_pullup
+from simulacion import ascenso_adaptativo
+from optimizacion import interpolar_lanzamiento
+
+
+PARAMETROS = ('isp', 'gasto', 'masa_propulsante', 'beta', 'mach')
+# Parámetros del caso (simulacion.Caso) respecto de los que se deriva.
+PASO = .01  # Perturbación relativa de cada parámetro.
+
+Perturbacion = namedtuple('Perturbacion', 'parametro menos mas')
+#Valores del parámetro a cada lado del nominal.
+
+
+def perturbaciones(caso, paso=PASO, dtl=.1, metodo='euler'):
+    '''Perturbación de cada parámetro de PARAMETROS (lista de Perturbacion).
+    Con metodo='euler' las del gasto y de la masa de propulsante cambian el
+    tiempo de combustión en un número entero de pasos dtl.
+    '''
+    lista = [Perturbacion(p, getattr(caso, p) * (1 - paso),
+                          getattr(caso, p) * (1 + paso)) for p in PARAMETROS]
+    if metodo == 'euler':
+        t_combustion = caso.masa_propulsante / caso.gasto
+        pasos = max(1, round(paso * t_combustion / dtl))
+        lista[1] = Perturbacion(
+            'gasto', caso.masa_propulsante / (t_combustion + pasos * dtl),
+            caso.masa_propulsante / (t_combustion - pasos * dtl))
+        lista[2] = Perturbacion(
+            'masa_propulsante',
+            caso.masa_propulsante - pasos * dtl * caso.gasto,
+            caso.masa_propulsante + pasos * dtl * caso.gasto)
+    return lista
+
+
+def derivada(menos, nominal, mas, h_menos, h_mas):
+    '''Derivada por diferencias centradas con pasos h_menos y h_mas a cada
+    lado del punto nominal (exacta hasta segundo orden).
+    '''
+    return ((h_menos**2 * mas - h_mas**2 * menos
+             - (h_menos**2 - h_mas**2) * nominal)
+            / (h_menos * h_mas * (h_menos + h_mas)))
+
+
+def tipo_sensibilidades(salidas):
+    '''Tipo de NumPy de la tabla de sensibilidades: instante de lanzamiento
+    (s) y, para cada salida, su valor y sus derivadas (d_salida_d_parametro).
+    '''
+    return np.dtype([('t', float)] + [
+        (nombre, float) for salida in salidas
+        for nombre in [salida] + ['d_%s_d_%s' % (salida, p)
+                                  for p in PARAMETROS]])
+
+
+def sensibilidades(caso, salidas=('altitud',), paso=PASO, dt=.1, dtl=.1,
+                   metodo='euler', tabla_cd=None):
+    '''Tabla de sensibilidades del caso (simulacion.Caso): una fila por punto
+    de lanzamiento del giro nominal (ver tipo_sensibilidades), con la
+    derivada respecto de beta sólo en la última.  salidas son campos de
+    ResultadoAscenso.  Con metodo='euler' los giros se integran con
+    paso dt y todos los ascensos en un lote con paso dtl; con 'rk45', con
+    paso adaptativo, uno a uno.
+    '''
+    def giro(**cambios):
+        caso_giro = caso._replace(**cambios)
+        return simulate_pullup(InitialState(caso_giro.h, caso_giro.mach),
+                               PullupParams(caso_giro.beta, dt, metodo))
+
+    def final_giro(puntos, beta):
+        return [interpolar_lanzamiento(puntos[-2:], 'gama', np.radians(beta))]
+
+    nominal = giro()
+    n = len(nominal)
+    lista = perturbaciones(caso, paso, dtl, metodo)
+    #Bloques del lote: puntos de lanzamiento y misil (Isp, gasto, masa de
+    # propulsante) del caso nominal y de cada lado de cada perturbación.  Los
+    # de beta tienen sólo el lanzamiento al final del giro, y el primero de
+    # ellos es el nominal.
+    bloques = [(nominal, caso)]
+    for p in lista:
+        if p.parametro == 'beta':
+            bloques.append((final_giro(nominal, caso.beta), caso))
+        for valor in (p.menos, p.mas):
+            cambiado = caso._replace(**{p.parametro: valor})
+            if p.parametro == 'beta':
+                bloques.append((final_giro(giro(beta=valor), valor),
+                                cambiado))
+            elif p.parametro == 'mach':
+                bloques.append((giro(mach=valor)[:n], cambiado))
+            else:
+                bloques.append((nominal, cambiado))
+    lanzamientos = [lanz for puntos, _ in bloques for lanz in puntos]
+    misiles = np.array([(c.isp, c.gasto, c.masa_propulsante)
+                        for puntos, c in bloques for _ in puntos])
+    isp, gasto, masa_propulsante = misiles.T
+    lote = ([lanz.h for lanz in lanzamientos],
+            [lanz.v for lanz in lanzamientos],
+            [lanz.gama for lanz in lanzamientos], gasto * isp, gasto,
+            masa_propulsante / gasto)
+    if metodo == 'rk45':
+        final = ResultadoAscenso(*np.array(
+            [tuple(ascenso_adaptativo(*fila)) for fila in zip(*lote)]).T)
+    else:
+        final = ascenso_lote(*lote, dtl=dtl, tabla_cd=tabla_cd)
+    #Cada salida de cada bloque, con NaN en los puntos que faltan.  Las de
+    # los bloques de beta van en la última fila.
+    inicio = np.cumsum([0] + [len(puntos) for puntos, _ in bloques])
+    tabla = np.empty(n, dtype=tipo_sensibilidades(salidas))
+    tabla['t'] = [lanz.t for lanz in nominal]
+    for salida in salidas:
+        valores = np.full((len(bloques), n), np.nan)
+        for b, (puntos, _) in enumerate(bloques):
+            columnas = (slice(n - 1, n) if len(puntos) == 1
+                        else slice(0, len(puntos)))
+            valores[b, columnas] = getattr(final,
+                                           salida)[inicio[b]:inicio[b + 1]]
+        tabla[salida] = valores[0]
+        b = 1
+        for p in lista:
+            if p.parametro == 'beta':
+                centro_valores = valores[b]
+                b += 1
+            else:
+                centro_valores = valores[0]
+            centro = getattr(caso, p.parametro)
+            tabla['d_%s_d_%s' % (salida, p.parametro)] = derivada(
+                valores[b], centro_valores, valores[b + 1],
+                centro - p.menos, p.mas - centro)
+            b += 2
+    return tabla
+
+
+def escribir_sensibilidades(ruta, tabla):
+    '''Exporta la tabla de sensibilidades a un fichero de texto con una fila
+    por punto de lanzamiento y las columnas separadas por tabuladores.
+    '''
+    with open(ruta, 'w') as f:
+        f.write('\t'.join(tabla.dtype.names) + '\n')
+        f.writelines('\t'.join('%.6g' % x for x in fila) + '\n'
+                     for fila in tabla.tolist())
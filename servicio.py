@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Servicio local de evaluación de escenarios de lanzamiento.  Un proceso de
+larga duración atiende peticiones por un socket Unix o por TCP en localhost
+(nunca en otra interfaz: todo funciona sin conexión), de modo que cada
+escenario no paga el arranque del intérprete ni un barrido completo.  La
+tabla de Cd, el núcleo compilado y los giros ya integrados se quedan en
+memoria entre peticiones.
+
+El protocolo es de líneas JSON.  Cada petición es un objeto con los campos de
+simulacion.Caso que se quieran cambiar (isp, gasto, masa_propulsante, beta,
+mach, h), opcionalmente masa (masa total del misil, kg) e id, y el punto de
+lanzamiento del giro: t (s) o gama (deg), p. ej.
+
+    {"id": 7, "isp": 2356, "gasto": 55, "t": 14.2}
+
+La altitud, el Mach y beta deben estar en LIMITES, los demás campos deben ser
+positivos y el punto de lanzamiento debe estar dentro del giro.  Los misiles
+que siguen en vuelo tras T_MAX segundos se dan por erróneos.
+
+La respuesta lleva el mismo id, el estado del avión en el lanzamiento
+(simulacion.LaunchState) y el estado final del misil
+(ascenso_lote.ResultadoAscenso), o un campo error.  Las respuestas de una
+misma conexión pueden llegar en otro orden que las peticiones.  La petición
+{"metricas": true} devuelve las métricas del servicio: peticiones atendidas,
+profundidad de la cola, tamaño de los lotes y latencia (ms).
+
+Las peticiones que llegan a la vez, de una o de varias conexiones, se agrupan
+en lotes (hasta tam_lote peticiones o espera segundos desde la primera) y los
+ascensos de cada lote se integran de una sola pasada vectorizada (ver
+ascenso_lote).  Mientras se integra un lote se siguen aceptando peticiones,
+que forman el siguiente.
+
+Uso:
+    python servicio.py [--socket RUTA | --puerto N] [--motor jit]
+                       [--tabla-cd] [--costa [Q]]
+
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import time
+from collections import namedtuple, deque
+from math import radians
+
+import numpy as np
+
+from ascenso_jit import ascenso_lote_jit
+from ascenso_lote import ascenso_lote, ResultadoAscenso, Q_COSTA
+from ascenso_lote import MASA_MISIL, MOTORES
+from simulacion import Caso, InitialState, PullupParams, RocketParams
+from simulacion import LaunchState, simulate_pullup
+from optimizacion import interpolar_lanzamiento
+from tabla_cdll import cargar_tabla
+
+
+PUERTO = 8765  # Puerto TCP por defecto (sólo en localhost).
+TAM_LOTE = 256  # Número máximo de peticiones por lote.
+ESPERA = .002  # Tiempo máximo de espera para completar un lote (s).
+GIROS_MAX = 64  # Número máximo de giros guardados en memoria.
+LATENCIAS = 1000  # Número de latencias recientes para los percentiles.
+T_MAX = 3600.  # Duración máxima del ascenso de cada misil (s).
+LIMITES = {'h': (0, 20000), 'mach': (.3, 2.3), 'beta': (0, 90)}
+# Valores admitidos de la altitud (m), el Mach y el ángulo final del giro
+# (deg) del avión: los de las tablas de rendimiento (ver rendimiento.py).
+# Los demás campos y beta deben ser positivos.
+
+Configuracion = namedtuple('Configuracion', 'motor usar_tabla_cd dtl q_costa '
+                           'tam_lote espera')
+Configuracion.__new__.__defaults__ = ('numpy', False, .1, None, TAM_LOTE,
+                                      ESPERA)
+#Opciones del servicio: cálculo del ascenso ('numpy' o 'jit'), tabla de Cd,
+# paso del misil (s), umbral de la costa kepleriana (Pa, None sin ella; ver
+# ascenso_lote), número máximo de peticiones por lote y espera máxima (s).
+
+Servicio = namedtuple('Servicio', 'configuracion tabla_cd giros cola '
+                      'metricas')
+#Estado del servicio: configuración, tabla de Cd (None si no se usa), giros
+# integrados por (altitud, Mach, beta), cola de peticiones pendientes y
+# métricas.
+
+
+def crear_servicio(configuracion=Configuracion()):
+    '''Servicio listo para atender peticiones: carga la tabla de Cd si se
+    usa y, con motor='jit', compila el núcleo con un primer ascenso.  Se debe
+    llamar dentro del bucle de asyncio.
+    '''
+    tabla_cd = cargar_tabla() if configuracion.usar_tabla_cd else None
+    if configuracion.motor == 'jit':
+        ascenso_lote_jit(12000, 500, .5, 1e5, 60, 12.5)
+    return Servicio(configuracion, tabla_cd, {}, asyncio.Queue(),
+                    {'inicio': time.perf_counter(), 'peticiones': 0,
+                     'errores': 0, 'lotes': 0, 'ascensos': 0,
+                     'lote_max': 0, 'cola_max': 0,
+                     'latencias': deque(maxlen=LATENCIAS)})
+
+
+def metricas(servicio):
+    '''Diccionario con las métricas del servicio.  Las latencias (ms), desde
+    que se lee la petición hasta que se escribe la respuesta, son las de las
+    últimas LATENCIAS peticiones.
+    '''
+    datos = servicio.metricas
+    latencias = 1000 * np.array(datos['latencias'])
+    return {'segundos': time.perf_counter() - datos['inicio'],
+            'peticiones': datos['peticiones'], 'errores': datos['errores'],
+            'cola': servicio.cola.qsize(), 'cola_max': datos['cola_max'],
+            'lotes': datos['lotes'],
+            'lote_medio': (datos['ascensos'] / datos['lotes']
+                           if datos['lotes'] else 0.),
+            'lote_max': datos['lote_max'],
+            'latencia': ({'media': float(np.mean(latencias)),
+                          'p50': float(np.percentile(latencias, 50)),
+                          'p95': float(np.percentile(latencias, 95)),
+                          'p99': float(np.percentile(latencias, 99)),
+                          'max': float(np.max(latencias))}
+                         if latencias.size else {})}
+
+
+def escenario(peticion, giros):
+    '''Punto de lanzamiento (LaunchState) y misil (RocketParams) de una
+    petición.  El giro de cada avión se integra la primera vez y se guarda en
+    giros.
+    '''
+    desconocidos = (set(peticion) - set(Caso._fields)
+                    - {'id', 'masa', 't', 'gama'})
+    if desconocidos:
+        raise ValueError('Campos desconocidos: %s.'
+                         % ', '.join(sorted(desconocidos)))
+    if ('t' in peticion) == ('gama' in peticion):
+        raise ValueError('Se debe dar el punto de lanzamiento: t o gama.')
+    caso = Caso(**{campo: float(peticion[campo]) for campo in Caso._fields
+                   if campo in peticion})
+    masa = float(peticion.get('masa', MASA_MISIL))
+    for campo, valor in zip(Caso._fields + ('masa',), caso + (masa,)):
+        minimo, maximo = LIMITES.get(campo, (0, np.inf))
+        fuera = not (np.isfinite(valor) and minimo <= valor <= maximo)
+        if fuera or (valor <= 0 and campo != 'h'):
+            raise ValueError('Valor fuera del modelo: %s = %g.'
+                             % (campo, valor))
+    if masa <= caso.masa_propulsante:
+        raise ValueError('La masa debe ser mayor que la de propulsante.')
+    clave = caso.h, caso.mach, caso.beta
+    if clave not in giros:
+        if len(giros) >= GIROS_MAX:
+            del giros[next(iter(giros))]  # El más antiguo.
+        giros[clave] = simulate_pullup(InitialState(caso.h, caso.mach),
+                                       PullupParams(caso.beta))
+    variable = 't' if 't' in peticion else 'gama'
+    valor = float(peticion[variable])
+    if variable == 'gama':
+        valor = radians(valor)
+    eje = [getattr(lanz, variable) for lanz in giros[clave]]
+    if len(eje) < 2 or not eje[0] <= valor <= eje[-1]:
+        raise ValueError('El punto de lanzamiento (%s = %g) está fuera del '
+                         'giro.' % (variable, float(peticion[variable])))
+    return (interpolar_lanzamiento(giros[clave], variable, valor),
+            RocketParams(caso.isp, caso.gasto, caso.masa_propulsante, masa))
+
+
+def evaluar(servicio, peticiones):
+    '''Respuestas (diccionarios sin id) a una lista de peticiones.  Los
+    ascensos de todas las peticiones válidas se integran en un solo lote.  El
+    error de una petición no afecta a las demás.
+    '''
+    respuestas = [None] * len(peticiones)
+    validas = []
+    for i, peticion in enumerate(peticiones):
+        try:
+            validas.append((i,) + escenario(peticion, servicio.giros))
+        except (ValueError, TypeError) as error:
+            respuestas[i] = {'error': str(error)}
+        except Exception as error:
+            respuestas[i] = {'error': repr(error)}
+    if not validas:
+        return respuestas
+    configuracion = servicio.configuracion
+    indices, lanzamientos, misiles = zip(*validas)
+    gasto = np.array([m.gasto for m in misiles])
+    lote = ([lanz.h for lanz in lanzamientos],
+            [lanz.v for lanz in lanzamientos],
+            [lanz.gama for lanz in lanzamientos],
+            gasto * [m.isp for m in misiles], gasto,
+            np.array([m.masa_propulsante for m in misiles]) / gasto,
+            [m.masa for m in misiles], configuracion.dtl)
+    if (configuracion.motor == 'jit' and servicio.tabla_cd is None
+            and configuracion.q_costa is None):
+        final = ascenso_lote_jit(*lote, t_max=T_MAX)
+    else:
+        final = ascenso_lote(*lote, tabla_cd=servicio.tabla_cd,
+                             q_costa=configuracion.q_costa, t_max=T_MAX)
+    for i, lanz, fila in zip(indices, lanzamientos,
+                             zip(*(columna.tolist() for columna in final))):
+        if fila[0] >= T_MAX:
+            respuestas[i] = {'error': 'El ascenso no termina en %g s.'
+                                      % T_MAX}
+            continue
+        respuestas[i] = {'lanzamiento': dict(zip(LaunchState._fields,
+                                                 map(float, lanz))),
+                         'resultado': dict(zip(ResultadoAscenso._fields,
+                                               fila))}
+    return respuestas
+
+
+async def _lotes(servicio):
+    '''Bucle que agrupa las peticiones de la cola en lotes y los evalúa en
+    un hilo aparte, para no detener la lectura de nuevas peticiones.
+    '''
+    bucle = asyncio.get_running_loop()
+    configuracion = servicio.configuracion
+    while True:
+        lote = [await servicio.cola.get()]
+        limite = bucle.time() + configuracion.espera
+        while len(lote) < configuracion.tam_lote:
+            if not servicio.cola.empty():
+                lote.append(servicio.cola.get_nowait())
+                continue
+            try:
+                lote.append(await asyncio.wait_for(servicio.cola.get(),
+                                                   limite - bucle.time()))
+            except asyncio.TimeoutError:
+                break
+        try:
+            respuestas = await bucle.run_in_executor(
+                None, evaluar, servicio, [peticion for peticion, _ in lote])
+        except Exception as error:  # Se responde a todas las peticiones.
+            respuestas = [{'error': repr(error)}] * len(lote)
+        servicio.metricas['lotes'] += 1
+        servicio.metricas['ascensos'] += len(lote)
+        servicio.metricas['lote_max'] = max(servicio.metricas['lote_max'],
+                                            len(lote))
+        for (_, futuro), respuesta in zip(lote, respuestas):
+            if not futuro.done():
+                futuro.set_result(respuesta)
+
+
+async def _responder(servicio, escritor, peticion, llegada):
+    '''Encola una petición, espera su respuesta y la escribe.
+    '''
+    futuro = asyncio.get_running_loop().create_future()
+    servicio.cola.put_nowait((peticion, futuro))
+    servicio.metricas['cola_max'] = max(servicio.metricas['cola_max'],
+                                        servicio.cola.qsize())
+    respuesta = await futuro
+    _escribir(servicio, escritor, peticion, respuesta, llegada)
+    await escritor.drain()
+
+
+def _escribir(servicio, escritor, peticion, respuesta, llegada):
+    '''Escribe una respuesta con el id de la petición y apunta su latencia.
+    '''
+    if isinstance(peticion, dict) and 'id' in peticion:
+        respuesta = dict(respuesta, id=peticion['id'])
+    if 'error' in respuesta:
+        servicio.metricas['errores'] += 1
+    servicio.metricas['peticiones'] += 1
+    escritor.write(json.dumps(respuesta).encode() + b'\n')
+    servicio.metricas['latencias'].append(time.perf_counter() - llegada)
+
+
+async def _conexion(servicio, lector, escritor):
+    '''Atiende una conexión: cada línea es una petición, y se atiende sin
+    esperar a que terminen las anteriores.
+    '''
+    pendientes = set()
+    try:
+        async for linea in lector:
+            llegada = time.perf_counter()
+            try:
+                peticion = json.loads(linea)
+            except ValueError:
+                _escribir(servicio, escritor, None,
+                          {'error': 'La petición no es JSON.'}, llegada)
+                continue
+            if not isinstance(peticion, dict):
+                _escribir(servicio, escritor, None,
+                          {'error': 'La petición debe ser un objeto.'},
+                          llegada)
+            elif peticion.get('metricas'):
+                _escribir(servicio, escritor, peticion, metricas(servicio),
+                          llegada)
+            else:
+                tarea = asyncio.ensure_future(
+                    _responder(servicio, escritor, peticion, llegada))
+                pendientes.add(tarea)
+                tarea.add_done_callback(pendientes.discard)
+        if pendientes:
+            await asyncio.wait(pendientes)
+        await escritor.drain()
+    except ConnectionError:
+        pass
+    finally:
+        escritor.close()
+
+
+async def iniciar(ruta=None, puerto=PUERTO, configuracion=Configuracion()):
+    '''Crea el servicio y empieza a escuchar en el socket Unix ruta o, si no
+    se da, en el puerto TCP de localhost.  Devuelve el servidor de asyncio, el
+    Servicio y la tarea que forma los lotes.
+    '''
+    servicio = crear_servicio(configuracion)
+
+    async def conexion(lector, escritor):
+        await _conexion(servicio, lector, escritor)
+
+    if ruta is not None:
+        servidor = await asyncio.start_unix_server(conexion, ruta)
+    else:
+        servidor = await asyncio.start_server(conexion, '127.0.0.1', puerto)
+    return servidor, servicio, asyncio.ensure_future(_lotes(servicio))
+
+
+async def servir(ruta=None, puerto=PUERTO, configuracion=Configuracion()):
+    '''Atiende peticiones hasta que se interrumpe el proceso.
+    '''
+    servidor, _, lotes = await iniciar(ruta, puerto, configuracion)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        lotes.cancel()
+
+
+def consultar(peticiones, ruta=None, puerto=PUERTO):
+    '''Cliente sencillo: envía las peticiones (diccionarios) por una misma
+    conexión y devuelve las respuestas en el mismo orden.  El id de cada
+    petición se sustituye por su posición en la lista.
+    '''
+    if ruta is not None:
+        conexion = socket.socket(socket.AF_UNIX)
+        conexion.connect(ruta)
+    else:
+        conexion = socket.create_connection(('127.0.0.1', puerto))
+    with conexion, conexion.makefile('rwb') as f:
+        for i, peticion in enumerate(peticiones):
+            f.write(json.dumps(dict(peticion, id=i)).encode() + b'\n')
+        f.flush()
+        conexion.shutdown(socket.SHUT_WR)
+        respuestas = [json.loads(linea) for linea in f]
+    return sorted(respuestas, key=lambda respuesta: respuesta['id'])
+
+
+def argumentos(argv=None):
+    '''Lectura de las opciones de la línea de órdenes.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Servicio local de evaluación de escenarios de '
+        'lanzamiento.')
+    parser.add_argument('--socket', help='ruta del socket Unix (por defecto, '
+                        'TCP en localhost)')
+    parser.add_argument('--puerto', type=int, default=PUERTO,
+                        help='puerto TCP en localhost')
+    parser.add_argument('--motor', choices=MOTORES, default='numpy',
+                        help='cálculo del ascenso')
+    parser.add_argument('--tabla-cd', action='store_true',
+                        help='interpolar el Cd del misil en la tabla '
+                        'precalculada')
+    parser.add_argument('--costa', type=float, nargs='?', const=Q_COSTA,
+                        metavar='Q', help='costa kepleriana por debajo de Q '
+                        'Pa de presión dinámica (ver ascenso_lote.py)')
+    parser.add_argument('--tam-lote', type=int, default=TAM_LOTE,
+                        help='número máximo de peticiones por lote')
+    parser.add_argument('--espera', type=float, default=ESPERA,
+                        help='espera máxima para completar un lote (s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''Arranca el servicio con las opciones de la línea de órdenes.
+    '''
+    opciones = argumentos(argv)
+    configuracion = Configuracion(opciones.motor, opciones.tabla_cd, .1,
+                                  opciones.costa, opciones.tam_lote,
+                                  opciones.espera)
+    try:
+        asyncio.run(servir(opciones.socket, opciones.puerto, configuracion))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
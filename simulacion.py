@@ -0,0 +1,611 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Team REOS
+
+Simulación de un caso completo: giro ascendente del avión y lanzamiento del
+cohete REOS de una sola etapa desde cada punto del giro.  Las variables de
+interés se guardan en una tabla binaria por columnas (.npy) que se puede leer
+proyectada en memoria, sin analizar texto; el archivo de texto de siempre se
+puede exportar también para su análisis en una hoja de cálculo.
+
+Cada caso queda definido por los parámetros del misil (impulso específico,
+gasto y masa de propulsante) y de la maniobra (ángulo final beta, Mach y
+altitud iniciales).
+
+El módulo se puede importar sin efectos: no simula nada al importarlo.  Con
+simulate_pullup, simulate_ascent y simulate_launches, y los registros
+InitialState, PullupParams, LaunchState, RocketParams y LaunchResult, se
+evalúan escenarios sueltos dentro de un mismo proceso.  La línea de órdenes
+está en Modelo_avion_misil_var_masa.py.
+
+El giro y el ascenso se pueden integrar con el Euler explícito de paso fijo
+original (giro y ascenso_lote) o con el integrador adaptativo de
+Dormand-Prince con detección exacta de eventos (giro_adaptativo y
+ascenso_adaptativo).  El ascenso con Euler se puede calcular también con
+el núcleo compilado de ascenso_jit (motor='jit') si Numba está instalado.
+
+"""
+
+import os
+from collections import namedtuple
+from math import radians, cos, sin, degrees
+
+import numpy as np
+
+from modeloISA import atmosphere
+from modelo_empuje import thrust
+from modelo_gravedad import MU, RT, GRAV
+from aero_avion import cl_alfa, angulo_ataque, k, cd0, cd_inducida, S_W
+from aero_avion import resistencia, sustentacion
+from aero_misil import cdll_estado, SREF_MISIL
+from ascenso_lote import ascenso_lote, ResultadoAscenso, MASA_MISIL
+from ascenso_lote import ALTURA_FINAL, pasos_ascenso_lote
+from integrador import dopri5, Evento
+from trayectorias import registrar_trayectorias
+import cache_ascenso
+import instrumentacion
+
+
+#------------------------CARACTERÍSTICAS DE LA AERONAVE------------------------
+
+N = 3.5  # Factor de carga máximo.
+MASS = 14273  # Masa del avión cargado (kg).
+W = MASS * GRAV  # Peso del avión (N).
+
+
+#-----------------------------PARÁMETROS DEL CASO------------------------------
+
+Caso = namedtuple('Caso', 'isp gasto masa_propulsante beta mach h')
+Caso.__new__.__defaults__ = (60, 750, 89, 1.8, 12000)
+#Impulso específico (N s/kg), gasto másico del misil (kg/s), masa de
+# propulsante (kg), ángulo final del giro beta (deg), Mach inicial y altitud
+# inicial (m).  Salvo el Isp, todos tienen los valores del caso de referencia.
+#El ángulo beta determina el ángulo final de la maniobra de giro; es decir, es
+# el ángulo de asiento del avión con el que se quiere que comience el ascenso
+# tras el giro en el plano vertical.
+
+InitialState = namedtuple('InitialState', 'h mach')
+InitialState.__new__.__defaults__ = (12000, 1.8)
+#Altitud (m) y Mach del vuelo estacionario previo al giro.
+
+PullupParams = namedtuple('PullupParams', 'beta dt metodo')
+PullupParams.__new__.__defaults__ = (89, .1, 'euler')
+#Ángulo final del giro (deg), separación entre puntos de lanzamiento (s) e
+# integrador ('euler' o 'rk45').  Con 'euler', dt es también el paso.
+
+LaunchState = namedtuple('LaunchState', 't h v mach alfa gama theta '
+                         'emecanica resistencia x')
+#Estado del avión en un punto de lanzamiento: tiempo (s), altitud (m),
+# velocidad (m/s), Mach, ángulos de ataque, de asiento de la velocidad y de
+# asiento (rad), energía mecánica (J), resistencia (N) y posición horizontal
+# (m).
+
+TIPO_GIRO = np.dtype([(campo, np.float64) for campo in LaunchState._fields])
+# Tipo estructurado de NumPy de un punto del giro (ver trayectoria_giro).
+
+RocketParams = namedtuple('RocketParams', 'isp gasto masa_propulsante masa')
+RocketParams.__new__.__defaults__ = (60, 750, MASA_MISIL)
+#Impulso específico (N s/kg), gasto (kg/s), masa de propulsante (kg) y masa
+# total (kg) del misil.
+
+LaunchResult = namedtuple('LaunchResult', 'lanzamiento tiempo altitud '
+                          'velocidad mach theta masa emecanica x empuje isp')
+#Resultado de un lanzamiento: estado del avión (LaunchState) y estado final
+# del misil, con los mismos campos que ResultadoAscenso (theta en grados),
+# más el empuje (N) y el Isp (N s/kg).  Es una fila del fichero de
+# resultados.
+
+CABECERA = ('TIEMPO DE LANZAMIENTO(s)\tALTURA DE LANZAMIENTO (m)\tVELOCIDAD'
+            'DE LANZAMIENTO(m/s)\tMACH\tALFA (deg)\tGAMMA (deg)\tTHETA (deg)'
+            '\tE_MECÁNICA (J)\tRESISTENCIA (N)\tTIEMPO (s)\tALTURA (m)\t'
+            'VELOCIDAD (m/s)\tMACH\tTHETA (deg)\tMASA (kg)\tE_MECÁNICA (J)\t'
+            'POSICIÓN HORIZONTAL FINAL (m)\tEMPUJE (N)\tIMPULSO ESPECÍFICO '
+            '(N s/kg)\n')  # Cabezas de tabla.
+
+COLUMNAS = ('t_lanzamiento', 'h_lanzamiento', 'v_lanzamiento',
+            'mach_lanzamiento', 'alfa', 'gama', 'theta_lanzamiento',
+            'emecanica_lanzamiento', 'resistencia', 'tiempo', 'altitud',
+            'velocidad', 'mach', 'theta', 'masa', 'emecanica', 'x', 'empuje',
+            'isp')
+# Columnas de los resultados, en el mismo orden y con las mismas unidades que
+# CABECERA (ángulos en grados).
+TIPO_RESULTADOS = np.dtype([(columna, np.float64) for columna in COLUMNAS])
+# Tipo estructurado de NumPy de una fila de resultados.
+FORMATO_FILA = '{:.2f}\t' + '\t'.join(['{:.3f}'] * 18) + '\n'
+# Formato de una fila del fichero de texto.
+
+
+#-------------------------TRAYECTORIA/PUESTA EN ÓRBITA-------------------------
+
+def pasos_giro(h_inicial, mach_inicial, beta, dt=.1):
+    '''Integración del vuelo estacionario inicial y del giro ascendente del
+    avión hasta que el ángulo de asiento de la velocidad alcanza beta (rad).
+    Generador con el estado del avión (LaunchState) en cada paso del giro;
+    cada uno es un punto de lanzamiento del misil.
+    '''
+    #--------------------------CONDICIONES INICIALES---------------------------
+    #Ahora, para los próximos cálculos, se definen las condiciones iniciales de
+    # las variables.
+    h = h_inicial  # Altitud inicial (m).
+    r = RT + h  # Distancia desde el centro de la Tierra (m).
+    g0 = MU / r**2  # Aceleración gravitatoria (m/s2).
+    T, rho, p, Mu_Visc, a = atmosphere(h)
+    # Temperatura (K), densidad (kg/m3), presión (Pa), viscosidad (Pa s) y
+    # velocidad del sonido (m/s) iniciales del aire.
+    #A la altura inicial el avión vuela en vuelo estacionario.
+    M = mach_inicial  # Número de Mach inicial.
+    v = M * a  # Velocidad inicial (m/s).
+    CL_alfa1 = cl_alfa(M)  # Pendiente del coeficiente de sustentación.
+    #Ángulos de asiento, de ataque y de asiento de la velocidad iniciales.
+    alfa_numerico = 2 * W / (rho * v**2 * S_W * CL_alfa1)
+    alfa = angulo_ataque(alfa_numerico, M)  # Ángulo de ataque.
+    gama = 0  # Ángulo de asiento.
+    theta = gama + alfa  # Ángulo de asiento de la velocidad.
+    #Coeficientes aerodinámicos.
+    CL = alfa * CL_alfa1  # Coeficiente de sustentación inicial.
+    k1 = k(M)
+    CD01 = cd0(M)
+    CD_inducida1 = cd_inducida(k1, CL)
+    CD = CD01 + CD_inducida1  # Polar del avión.  Coeficiente de resistencia.
+    '''
+    -------------------------INICIO DE LA MANIOBRA-------------------------
+    '''
+    radius = v**2 / (g0 * (N - 1))  # Radio de giro (m).
+    #Este radio de giro se obtiene para la velocidad inicial en vuelo
+    # estacionario y para un factor de carga máximo según los pilones de carga
+    # n = 3,5.
+    '''------SISTEMA DE ECUACIONES PARA PRIMER TRAMO: VUELO ESTACIONARIO------
+    '''
+    #Energías.
+    ecinetica = .5 * MASS * v**2  # Energía cinética (J).
+    epotencial = MASS * g0 * h  # Energía potencial (J).
+    emecanica = ecinetica + epotencial  # Energía mecánica (J).
+    #Fuerzas.
+    D = resistencia(v, rho, CD)  # Resistencia aerodinámica (N).
+    L = sustentacion(v, rho, CL)  # Sustentación aerodinámica (N).
+    Th = thrust(M, rho)  # Empuje (N).
+    diferencia_T_D = Th - D
+    #Esto nos va a permitir calcular en qué momento el empuje se verá superado
+    # por la resistencia
+    n = L / W  # Factor de carga.
+    #Condiciones iniciales para la integración.
+    t = 0
+    x = 0
+    omega = v / radius  # Velocidad angular en la maniobra de giro (rad/s).
+    #Segunda ley de Newton en el eje horizontal (ejes cuerpo).
+    dv = dt * (Th * cos(alfa) - D - MASS * g0 * sin(gama)) / MASS
+    vx = v * cos(gama)  # Velocidad horizontal del avión en ejes tierra (m/s).
+    vy = v * sin(gama)  # Velocidad vertical del avión en ejes tierra (m/s).
+    dx = vx * dt  # Variación horizontal de la posición en ejes tierra (m).
+    dh = vy * dt  # Variación vertical de la posición en ejes tierra (m).
+    dtheta = v * dt / radius  # Variación del ángulo de empuje.
+    '''-------SISTEMA DE ECUACIONES PARA SEGUNDO TRAMO: MANIOBRA DE GIRO-------
+    Ahora comienza el bucle relativo al giro ascendente, que analiza la
+    trayectoria con nuevas ecuaciones y condiciones de vuelo que se detallan
+    más adlante.  El significado de theta < beta implica que el bucle realice
+    el cálculo requerido siempre que el ángulo theta sea menor que beta.  Se ha
+    obligado a que beta sea el ángulo de final de giro (al inicio del programa
+    se le ha dado un rango de valores).  Por tanto, una vez que theta sea igual
+    a beta, se dará por concluida la maniobra de giro y se comenzará con el
+    siguiente tramo. Todo ello mientras la velocidad sea positiva, condición
+    que permite ver si el resultado es realista o no.
+    '''
+    while gama < beta and v > 0:
+        #A continuación, se guardan todas las variables aquí detalladas para
+        # cada valor de theta < beta.  Cada uno de estos estados es un punto
+        # de lanzamiento del misil.
+        yield LaunchState(t, h, v, M, alfa, gama, theta, emecanica, D, x)
+        #Ya que este análisis de maniobra, a diferencia del anterior, lleva un
+        # cálculo para distintos valores de tiempo y velocidad, se debe
+        # programar su evolución en términos de sus variaciones diferenciales.
+        t = t + dt  # Evolución temporal (s).
+        v = v + dv  # Velocidad (m/s).
+        x = x + dx  # Posición horizontal (m).
+        h = h + dh  # Altitud (m).
+        r = RT + h  # Distancia al centro de la Tierra (m).
+        g0 = MU / r**2  # Aceleración de la gravedad (m/s2).
+        #Las variables termodinámicas habrán variado con la altura.
+        T, rho, p, Mu_Visc, a = atmosphere(h)
+        # Temperatura (K), densidad (kg/m3), presión (Pa), viscosidad (Pa s)
+        # y velocidad del sonido (m/s).
+        M = v / a  # Mach de vuelo.
+        n = 3.5  # Tomamos la condición de factor de carga máximo y constante.
+        radius = v**2 / (g0 * (n - 1))  # Radio de giro varía con la velocidad.
+        #Las características aerodinámicas varían con el número de Mach.
+        CL_alfa1 = cl_alfa(M)
+        k1 = k(M)
+        CD01 = cd0(M)
+        alfa_numerico = 2 * W * n / (rho * v**2 * S_W * CL_alfa1)
+        #El nuevo ángulo de ataque resultará del nuevo factor de carga (antes 1
+        # y ahora máximo), la nueva velocidad y las nuevas características
+        # aerodinámicas.
+        alfa = angulo_ataque(alfa_numerico, M)  # Ángulo de ataque.
+        theta = theta + dtheta  # Ángulo de asiento (empuje horizontal).
+        gama = theta - alfa  # Ángulo de asiento de la velocidad.
+        CL = alfa * CL_alfa1  # Coeficiente de sustentación.
+        n = .5 * rho * v**2 * S_W * CL / W
+        #Nuevas proyecciones de la velocidad (ejes tierra).
+        vx = v * cos(gama)  # Proyección horizontal de la velocidad (m/s).
+        vy = v * sin(gama)  # Proyección vertical de la velocidad (m/s).
+        CD_inducida1 = cd_inducida(k1, CL)
+        CD = CD01 + CD_inducida1  # Polar del avión.
+        D = resistencia(v, rho, CD)  # Fuerza de resistencia (N).
+        L = n * W  # Fuerza de sustentación (N).
+        #Energías.
+        ecinetica = .5 * MASS * v**2  # Energía cinética (J).
+        epotencial = MASS * g0 * h  # Energía potencial (J).
+        emecanica = ecinetica + epotencial  # Energía mecánica (J).
+        #Empuje.
+        Th = thrust(M, rho)  # Empuje (N).
+        diferencia_T_D = Th - D
+        #Velocidad angular.
+        omega = v / radius  # Velocidad angular (rad/s).
+        #Nuevas variaciones diferenciales.  Segunda ley de Newton.
+        dv = dt * (Th * cos(alfa) - D - W * sin(gama)) / MASS
+        #Esta última ecuación nos permite obtener un nuevo incvremento de
+        # velocidad (m/s) que, al reiniciar el bucle será sumado al último
+        # valor de la velocidad, obteniendo la variación de la velocidad.
+        dx = vx * dt  # Variación horizontal de la posición (m).
+        dh = v * sin(gama) * dt  # Variación vertical de la posición (m).
+        dtheta = omega * dt  # Variación del ángulo de asiento.
+
+
+def giro(h_inicial, mach_inicial, beta, dt=.1):
+    '''Lista de puntos de lanzamiento (LaunchState) del giro (ver
+    pasos_giro).
+    '''
+    filas_giro = list(pasos_giro(h_inicial, mach_inicial, beta, dt))
+    instrumentacion.contar('pasos', len(filas_giro))
+    return filas_giro
+
+
+V_MINIMA = 1e-3
+#Velocidad (m/s) por debajo de la cual se considera que el vehículo se ha
+# detenido.  Es el evento de velocidad nula de la integración adaptativa.
+
+
+def _estado_giro(h, v, theta):
+    '''Variables del giro a factor de carga máximo en el estado (h, v,
+    theta): gravedad, Mach, ángulo de ataque, ángulo de asiento de la
+    velocidad, resistencia y empuje.
+    '''
+    g0 = MU / (RT + h)**2  # Aceleración de la gravedad (m/s2).
+    _, rho, _, _, a = atmosphere(h)
+    M = v / a  # Mach de vuelo.
+    CL_alfa1 = cl_alfa(M)
+    alfa = angulo_ataque(2 * W * N / (rho * v**2 * S_W * CL_alfa1), M)
+    gama = theta - alfa  # Ángulo de asiento de la velocidad.
+    CD = cd0(M) + cd_inducida(k(M), alfa * CL_alfa1)  # Polar del avión.
+    return g0, M, alfa, gama, resistencia(v, rho, CD), thrust(M, rho)
+
+
+def _derivadas_giro(t, y):
+    '''Derivadas del estado del giro (v, x, h, theta).
+    '''
+    v, _, h, theta = y
+    g0, _, alfa, gama, D, Th = _estado_giro(h, v, theta)
+    return (((Th * cos(alfa) - D - W * sin(gama)) / MASS,
+             v * cos(gama), v * sin(gama), g0 * (N - 1) / v))
+
+
+def _fila_giro(t, y):
+    '''Punto de lanzamiento (LaunchState) para el estado y del giro.
+    '''
+    v, x, h, theta = y
+    g0, M, alfa, gama, D, _ = _estado_giro(h, v, theta)
+    return LaunchState(t, h, v, M, alfa, gama, theta,
+                       .5 * MASS * v**2 + MASS * g0 * h, D, x)
+
+
+def giro_adaptativo(h_inicial, mach_inicial, beta, dt=.1, rtol=1e-8,
+                    atol=1e-8, t_max=600):
+    '''Giro ascendente integrado con paso adaptativo.  El final del giro
+    (gama = beta) y la velocidad nula se detectan como eventos.  Los puntos
+    de lanzamiento se toman cada dt segundos por salida densa y se devuelven
+    como en giro.
+    '''
+    #Vuelo estacionario inicial (factor de carga 1).
+    _, rho, _, _, a = atmosphere(h_inicial)
+    v = mach_inicial * a  # Velocidad inicial (m/s).
+    CL_alfa1 = cl_alfa(mach_inicial)
+    alfa = angulo_ataque(2 * W / (rho * v**2 * S_W * CL_alfa1), mach_inicial)
+    D = resistencia(v, rho, cd0(mach_inicial)
+                    + cd_inducida(k(mach_inicial), alfa * CL_alfa1))
+    filas_giro = [LaunchState(0, h_inicial, v, mach_inicial, alfa, 0, alfa,
+                              .5 * MASS * v**2
+                              + MASS * MU / (RT + h_inicial)**2 * h_inicial,
+                              D, 0)]
+    eventos = (Evento(lambda t, y: _estado_giro(y[2], y[0], y[3])[3] - beta,
+                      1),
+               Evento(lambda t, y: y[0] - V_MINIMA, -1))
+    integracion = dopri5(_derivadas_giro, 0, (v, 0, h_inicial, alfa), t_max,
+                         eventos, rtol, atol,
+                         t_salida=dt * np.arange(1, int(t_max / dt) + 1))
+    filas_giro.extend(_fila_giro(t, y) for t, y in integracion.salidas)
+    return filas_giro
+
+
+def _derivadas_ascenso(empuje_misil, gasto):
+    '''Derivadas del estado del misil (x, y, vx, vy, theta, masa) con el
+    empuje y el gasto dados (nulos tras el fin de la combustión).
+    '''
+    def derivadas(t, estado):
+        _, yl, vxl, vyl, thetal, masa_misil = estado
+        vl = (vxl**2 + vyl**2)**.5  # Módulo de la velocidad (m/s).
+        g0 = MU / (RT + yl)**2  # Aceleración de la gravedad (m/s2).
+        _, rho, _, Mu_Visc, a = atmosphere(yl)
+        D_misil = (.5 * rho * cdll_estado(vl / a, vl, rho, Mu_Visc)
+                   * SREF_MISIL * vl**2)  # Fuerza de resistencia (N).
+        F = (empuje_misil - D_misil) / masa_misil
+        # Fuerza neta por unidad de masa en la dirección del vuelo (m/s2).
+        return (vxl, vyl, F * cos(thetal), F * sin(thetal) - g0,
+                -g0 * cos(thetal) / vl, -gasto)
+    return derivadas
+
+
+_EVENTOS_ASCENSO = (
+    Evento(lambda t, y: y[4], -1),  # Ángulo de asiento nulo.
+    Evento(lambda t, y: y[1] - ALTURA_FINAL, 1),  # Techo de altitud.
+    Evento(lambda t, y: (y[2]**2 + y[3]**2)**.5 - V_MINIMA, -1))
+    # Velocidad nula.
+
+
+def ascenso_adaptativo(h, v, gama, empuje_misil, gasto, t_combustion,
+                       masa_misil=MASA_MISIL, rtol=1e-8, atol=1e-8,
+                       t_max=1e5):
+    '''Ascenso de un misil integrado con paso adaptativo.  El fin de la
+    combustión se trata como frontera de integración y el ángulo de asiento
+    nulo, el techo de altitud y la velocidad nula como eventos.  Devuelve el
+    estado final como ResultadoAscenso de escalares.
+    '''
+    estado = (0, h, v * cos(gama), v * sin(gama), gama, masa_misil)
+    t = 0
+    if gama > 0 and h < ALTURA_FINAL:
+        #Fase propulsada hasta el fin de la combustión y, si no se ha
+        # detenido antes, vuelo sin empuje.
+        integracion = dopri5(_derivadas_ascenso(empuje_misil, gasto), 0,
+                             estado, t_combustion, _EVENTOS_ASCENSO, rtol,
+                             atol)
+        if integracion.evento is None:
+            integracion = dopri5(_derivadas_ascenso(0, 0), integracion.t,
+                                 integracion.y, t_max, _EVENTOS_ASCENSO,
+                                 rtol, atol)
+        t, estado = integracion.t, integracion.y
+    xl, yl, vxl, vyl, thetal, masa = estado
+    vl = (vxl**2 + vyl**2)**.5
+    return ResultadoAscenso(t, yl, vl, vl / atmosphere(yl)[4],
+                            degrees(thetal), masa,
+                            masa * (GRAV * yl + vl**2 / 2), xl)
+
+
+def simulate_pullup(initial_state=InitialState(), params=PullupParams()):
+    '''Giro ascendente del avión desde el vuelo estacionario initial_state
+    (InitialState) con los parámetros params (PullupParams).  Devuelve la
+    lista de puntos de lanzamiento (LaunchState).
+    '''
+    if params.metodo == 'rk45':
+        return giro_adaptativo(initial_state.h, initial_state.mach,
+                               radians(params.beta), params.dt)
+    return giro(initial_state.h, initial_state.mach, radians(params.beta),
+                params.dt)
+
+
+def trayectoria_giro(lanzamientos):
+    '''Giro como array estructurado de NumPy (TIPO_GIRO) de sólo lectura, con
+    una fila por punto de lanzamiento.  Es la forma en que se comparte un
+    mismo giro entre todos los casos del barrido con el mismo avión.
+    '''
+    trayectoria = np.array([tuple(lanz) for lanz in lanzamientos],
+                           dtype=TIPO_GIRO)
+    trayectoria.flags.writeable = False
+    return trayectoria
+
+
+def lanzamientos_giro(trayectoria):
+    '''Lista de puntos de lanzamiento (LaunchState) de una trayectoria del
+    giro (ver trayectoria_giro).
+    '''
+    return [LaunchState(*fila) for fila in trayectoria.tolist()]
+
+
+def _ascensos(launch_states, empuje_misil, gasto, t_combustion, masa_misil,
+              metodo, dtl, tabla_cd, registro, ruta_registro, motor, q_costa):
+    '''Estados finales de los misiles (tuplas con los campos de
+    ResultadoAscenso) lanzados desde launch_states.
+    '''
+    instrumentacion.contar('ascensos', len(launch_states))
+    if metodo == 'rk45':
+        return [tuple(map(float, ascenso_adaptativo(
+            lanz.h, lanz.v, lanz.gama, empuje_misil, gasto, t_combustion,
+            masa_misil))) for lanz in launch_states]
+    lote = ([lanz.h for lanz in launch_states],
+            [lanz.v for lanz in launch_states],
+            [lanz.gama for lanz in launch_states], empuje_misil, gasto,
+            t_combustion, masa_misil, dtl, tabla_cd, None, None, q_costa)
+    if (registro is None and tabla_cd is None and q_costa is None
+            and motor == 'jit'):
+        #Numba sólo se importa si se usa el núcleo compilado.
+        from ascenso_jit import ascenso_lote_jit
+        misil = ascenso_lote_jit(*lote[:8])
+    elif registro is None:
+        misil = ascenso_lote(*lote)
+    else:
+        misil = registrar_trayectorias(pasos_ascenso_lote(*lote),
+                                       ruta_registro, registro)
+    return list(zip(*(columna.tolist() for columna in misil)))
+
+
+def simulate_launches(launch_states, rocket_params, metodo='euler', dtl=.1,
+                      tabla_cd=None, registro=None, ruta_registro=None,
+                      cache=None, motor='numpy', q_costa=None):
+    '''Ascenso del misil desde cada uno de los puntos de lanzamiento
+    (LaunchState).  Con metodo='euler' todos los misiles se integran a la vez
+    (ver ascenso_lote); con 'rk45', uno a uno con paso adaptativo.  Devuelve
+    la lista de LaunchResult en el mismo orden.
+
+    Si se da registro (trayectorias.Registro), las trayectorias completas de
+    los misiles se escriben en ruta_registro, con el índice de cada
+    lanzamiento en la lista.  Sólo es posible con metodo='euler'.
+
+    Si se da cache (ver cache_ascenso), sólo se integran los ascensos que no
+    estén en ella, y se añaden.  Al registrar trayectorias se integran todos.
+
+    Con motor='jit' y metodo='euler', los ascensos se integran con el núcleo
+    compilado de ascenso_jit, salvo si se da tabla_cd, registro o q_costa.
+    Sin Numba se usa ascenso_lote.
+
+    Si se da q_costa (Pa), el vuelo sin empuje con presión dinámica menor que
+    q_costa se resuelve en forma cerrada (ver ascenso_lote).  Sólo es posible
+    con metodo='euler'.
+    '''
+    instrumentacion.contar('lanzamientos', len(launch_states))
+    empuje_misil = rocket_params.gasto * rocket_params.isp
+    # Empuje variable para cada ensayo (varía con el Isp a gasto cte).
+    t_combustion = rocket_params.masa_propulsante / rocket_params.gasto
+    # Tiempo de combustión (s).
+    if registro is not None and metodo == 'rk45':
+        raise ValueError('El registro de trayectorias del misil sólo está '
+                         "disponible con metodo='euler'.")
+    if q_costa is not None and metodo == 'rk45':
+        raise ValueError("La costa kepleriana sólo está disponible con "
+                         "metodo='euler'.")
+    parametros = (empuje_misil, rocket_params.gasto, t_combustion,
+                  rocket_params.masa, metodo, dtl, tabla_cd, registro,
+                  ruta_registro, motor, q_costa)
+    if cache is None:
+        finales = _ascensos(launch_states, *parametros)
+    else:
+        claves = [cache_ascenso.clave(cache, lanz.h, lanz.v, lanz.gama,
+                                      empuje_misil, rocket_params.gasto,
+                                      t_combustion, rocket_params.masa, dtl,
+                                      metodo, tabla_cd is not None, q_costa,
+                                      motor)
+                  for lanz in launch_states]
+        if registro is None:
+            finales = cache_ascenso.buscar(cache, claves)
+        else:
+            finales = [None] * len(claves)
+        faltan = [i for i, final in enumerate(finales) if final is None]
+        if faltan:
+            nuevos = _ascensos([launch_states[i] for i in faltan],
+                               *parametros)
+            for i, final in zip(faltan, nuevos):
+                finales[i] = final
+            cache_ascenso.guardar(cache, [claves[i] for i in faltan], nuevos)
+    return [LaunchResult(lanz, *final, empuje_misil, rocket_params.isp)
+            for lanz, final in zip(launch_states, finales)]
+
+
+def simulate_ascent(launch_state, rocket_params, metodo='rk45', dtl=.1,
+                    tabla_cd=None, cache=None):
+    '''Ascenso del misil desde un único punto de lanzamiento (LaunchState).
+    Por defecto se integra con paso adaptativo.  Devuelve su LaunchResult.
+    '''
+    return simulate_launches((launch_state,), rocket_params, metodo, dtl,
+                             tabla_cd, cache=cache)[0]
+
+
+def tabla_resultados(resultados, tabla=None):
+    '''Tabla de resultados: array estructurado de NumPy (TIPO_RESULTADOS) con
+    una fila por lanzamiento (LaunchResult) y una columna por variable.  Si se
+    da tabla (del mismo tipo y con tantas filas como resultados, p. ej. un
+    tramo de un fichero proyectado en memoria), se escribe en ella.
+    '''
+    if tabla is None:
+        tabla = np.empty(len(resultados), dtype=TIPO_RESULTADOS)
+    tabla[:] = [(res.lanzamiento.t, res.lanzamiento.h, res.lanzamiento.v,
+                 res.lanzamiento.mach, degrees(res.lanzamiento.alfa),
+                 degrees(res.lanzamiento.gama),
+                 degrees(res.lanzamiento.theta), res.lanzamiento.emecanica,
+                 res.lanzamiento.resistencia) + tuple(res[1:])
+                for res in resultados]
+    return tabla
+
+
+def guardar_resultados(ruta, tabla):
+    '''Guarda la tabla de resultados en formato .npy.  El fichero se puede
+    abrir sin leerlo entero con cargar_resultados.
+    '''
+    np.save(ruta, tabla)
+
+
+def cargar_resultados(ruta, mmap=True):
+    '''Lee una tabla de resultados guardada con guardar_resultados.  Con mmap
+    el fichero se proyecta en memoria (sólo lectura) y las columnas se leen
+    del disco a medida que se usan, sin cargar el fichero completo.
+    '''
+    return np.load(ruta, mmap_mode='r' if mmap else None)
+
+
+def escribir_resultados(ruta, tabla):
+    '''Exporta la tabla de resultados a un fichero de texto con una fila por
+    lanzamiento y las columnas separadas por tabuladores.
+    '''
+    with open(ruta, 'w') as f:
+        f.write(CABECERA)
+        f.writelines(FORMATO_FILA.format(*fila) for fila in tabla.tolist())
+
+
+def simular_caso(caso, directorio='.', nombre=None, tabla_cd=None, dt=.1,
+                 dtl=.1, metodo='euler', exportar_tsv=False, registro=None,
+                 cache=None, trayectoria=None, motor='numpy', destino=None,
+                 q_costa=None):
+    '''Simulación de un caso: giro del avión y ascenso del misil desde cada
+    punto del giro.  La tabla de resultados, con una fila por punto de
+    lanzamiento, se guarda en un fichero .npy llamado como el Isp salvo que
+    se indique otro nombre.  Con exportar_tsv se escribe además el fichero de
+    texto de siempre (sin extensión).  Devuelve la ruta del fichero .npy.
+
+    Si se da destino (array de TIPO_RESULTADOS con una fila por punto de
+    lanzamiento, p. ej. el tramo del caso en el fichero de resultados de un
+    barrido), la tabla se escribe directamente en él, no se guarda el fichero
+    .npy del caso y se devuelve None.
+
+    Si se da registro (trayectorias.Registro), se guardan además las
+    trayectorias del giro (nombre.giro.tray) y de los misiles
+    (nombre.ascensos.tray) diezmadas según registro.  cache es la caché de
+    ascensos (ver simulate_launches).
+
+    El giro sólo depende del avión (Mach, altitud y beta del caso), no del
+    misil.  Si se da trayectoria (ver trayectoria_giro), se usa ese giro, ya
+    calculado, en lugar de integrarlo de nuevo.
+
+    Con metodo='euler' se integra con paso fijo dt (giro) y dtl (misil); con
+    metodo='rk45', con paso adaptativo, y dt es sólo la separación entre
+    puntos de lanzamiento.  motor y q_costa son los de simulate_launches.
+
+    Con una medición en curso (ver instrumentacion) se mide el tiempo del
+    caso y de sus fases: giro, ascenso y escritura de ficheros.
+    '''
+    if nombre is None:
+        nombre = str(caso.isp)
+    ruta = os.path.join(directorio, nombre)
+    with instrumentacion.caso(nombre):
+        with instrumentacion.fase('giro'):
+            if trayectoria is None:
+                lanzamientos = simulate_pullup(
+                    InitialState(caso.h, caso.mach),
+                    PullupParams(caso.beta, dt, metodo))
+            else:
+                lanzamientos = lanzamientos_giro(trayectoria)
+        if registro is not None:
+            with instrumentacion.fase('escritura'):
+                registrar_trayectorias(iter(lanzamientos),
+                                       ruta + '.giro.tray',
+                                       registro._replace(elegidos=None))
+        #----------------PUESTA EN ÓRBITA DEL MISIL----------------
+        #Para cada misil el ascenso termina cuando el ángulo de asiento deja
+        # de ser positivo, esto es, cuando el misil se encuentra en posición
+        # horizontal, o cuando se alcanzan los 500 km de altitud.
+        with instrumentacion.fase('ascenso'):
+            tabla = tabla_resultados(simulate_launches(
+                lanzamientos, RocketParams(caso.isp, caso.gasto,
+                                           caso.masa_propulsante),
+                metodo, dtl, tabla_cd, registro, ruta + '.ascensos.tray',
+                cache, motor, q_costa), destino)
+        with instrumentacion.fase('escritura'):
+            if exportar_tsv:
+                escribir_resultados(ruta, tabla)  # Fichero sin extensión.
+            if destino is None:
+                guardar_resultados(ruta + '.npy', tabla)
+    return ruta + '.npy' if destino is None else None
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Modelo sustituto del ascenso del misil para estudios paramétricos.  Da la
+altitud, la velocidad, la energía mecánica y la masa finales del misil en
+función del punto de lanzamiento (h, v, gama) y de los parámetros del misil
+(Isp, gasto y masa de propulsante) sin integrar el ascenso.
+
+El modelo real se muestrea con un hipercubo latino dentro de un dominio y se
+ajustan interpolaciones con funciones de base radial cúbicas más un
+polinomio de grado 1 (sólo NumPy).  Antes de cada ajuste cada entrada se
+escala por su influencia en las salidas, medida con un ajuste lineal: la
+altitud final depende mucho más del ángulo de asiento y del Isp que de la
+altitud de lanzamiento, y con la misma escala en todas las entradas el error
+es unas diez veces mayor.
+
+El estado final tiene pliegues donde cambia la forma en que termina el
+ascenso (REGIMENES): con ángulo de asiento nulo antes o después del fin de
+la combustión, o en el techo de 500 km (ALTURA_FINAL).  Un solo ajuste los
+redondea y comete errores de varios km en la altitud.  Por eso cada régimen
+se ajusta por separado, y un clasificador decide el de cada consulta: una
+interpolación más de dos magnitudes que no tienen pliegue, el apogeo que
+alcanzaría el misil sin techo (extrapolado sin resistencia desde el estado
+final, ver apogeo) y el tiempo de vuelo tras el fin de la combustión.  Los
+regímenes con menos de MUESTRAS_MIN muestras se ajustan junto con el más
+numeroso.
+
+El error se mide por validación cruzada (pliegues): el error de cada muestra
+es el de la predicción del modelo (clasificador y ajustes) ajustado sin
+ella.  Además del error global (rms, percentil 95 y máximo), el error local
+de una consulta se estima como el mayor error de validación de las VECINOS
+muestras más cercanas.  Las consultas fuera del dominio o con error local
+mayor que la tolerancia se calculan con el integrador (consultar).
+
+Por defecto el modelo real es el integrador adaptativo (metodo='rk45'): con
+Euler de paso fijo el fin de la combustión se detecta en la rejilla de pasos
+y el estado final varía a saltos (de varios km en la altitud final) con el
+tiempo de combustión, que ningún ajuste puede seguir.
+
+Con 2000 muestras en el dominio por defecto y rk45, el error rms de la
+altitud final en puntos de validación es de unos 500 m (con un solo ajuste
+para todo el dominio, unos 4,5 km), pero el de la velocidad sigue siendo de
+unos 70 m/s y el de la energía mecánica de unos 4e7 J.  Esos errores se
+concentran en los lanzamientos con ángulo de asiento pequeño (menos de unos
+0,3 rad), que no salen de la atmósfera densa y cuyo estado final cambia muy
+deprisa con las entradas.  El error local estimado cubre el error real en el
+80 % de los puntos.  Con las tolerancias por defecto se integra el 30 % de
+las consultas (antes, el 70 %); con Euler, el 80 %, así que con Euler el
+sustituto todavía no es útil en este dominio.  Cada consulta al sustituto
+cuesta unas decenas de microsegundos en lote, frente a unos 5 ms de un
+ascenso con rk45.
+
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from ascenso_lote import ascenso_lote, ResultadoAscenso, MASA_MISIL
+from ascenso_lote import ALTURA_FINAL
+from modelo_gravedad import MU, RT
+from simulacion import ascenso_adaptativo
+from huella import version_modelo
+
+
+ENTRADAS = ('h', 'v', 'gama', 'isp', 'gasto', 'masa_propulsante')
+# Entradas del modelo: altitud (m), velocidad (m/s) y ángulo de asiento de la
+# velocidad (rad) en el lanzamiento, Isp (N s/kg), gasto (kg/s) y masa de
+# propulsante (kg).
+SALIDAS = ('altitud', 'velocidad', 'emecanica', 'masa')
+# Campos de ResultadoAscenso que da el modelo.
+REGIMENES = ('combustion', 'apogeo', 'techo')
+# Formas en que termina el ascenso: con ángulo de asiento nulo antes o
+# después del fin de la combustión, o en el techo de altitud.
+PLIEGUES = 5  # Número de pliegues de la validación cruzada.
+VECINOS = 8  # Muestras con las que se estima el error local.
+ESCALA_MIN = .01  # Escala mínima de una entrada (relativa a la mayor).
+MUESTRAS_MIN = 4 * (len(ENTRADAS) + 1)
+# Muestras mínimas para ajustar un régimen por separado.
+
+Dominio = namedtuple('Dominio', ENTRADAS)
+Dominio.__new__.__defaults__ = ((12000, 18000), (260, 540), (.1, 1.5),
+                                (2000, 3200), (50, 70), (700, 800))
+#Intervalo (mínimo, máximo) de cada entrada.  Por defecto, el de los puntos
+# del giro y los misiles del barrido de siempre.
+
+Tolerancias = namedtuple('Tolerancias', SALIDAS)
+Tolerancias.__new__.__defaults__ = (5000, 50, 3e7, 5)
+#Error local máximo admitido en cada salida: altitud (m), velocidad (m/s),
+# energía mecánica (J) y masa (kg).
+
+Ajuste = namedtuple('Ajuste', 'escala centros pesos media desviacion')
+#Interpolación de base radial: escala de cada entrada, muestras (entradas
+# normalizadas y escaladas), pesos de las funciones de base y del polinomio,
+# y media y desviación típica de cada salida (se ajustan normalizadas).
+
+Sustituto = namedtuple('Sustituto', 'dominio clasificador ajustes residuos '
+                       'error metodo dtl version')
+#Modelo ajustado: dominio, clasificador (Ajuste del apogeo y del tiempo tras
+# el fin de la combustión, ver clases), Ajuste de las SALIDAS en cada uno de
+# los REGIMENES, error de validación cruzada de cada muestra y salida, error
+# global (filas rms, percentil 95 y máximo; columnas SALIDAS), modelo real
+# ('rk45' o 'euler' con paso dtl) y huella del código del modelo (ver
+# huella.version_modelo).
+
+
+def hipercubo_latino(n, dominio=Dominio(), rng=None):
+    '''Muestra de n puntos del dominio (matriz n x ENTRADAS) por hipercubo
+    latino: en cada entrada cae un punto en cada uno de los n intervalos
+    iguales.
+    '''
+    if rng is None:
+        rng = np.random.default_rng()
+    intervalos = np.argsort(rng.random((n, len(ENTRADAS))), axis=0)
+    minimo, maximo = np.array(dominio, dtype=float).T
+    return minimo + (intervalos + rng.random(intervalos.shape)) / n * (
+        maximo - minimo)
+
+
+def apogeo(altitud, velocidad, theta):
+    '''Altitud (m) del apogeo del vuelo sin resistencia desde el estado
+    final del misil (altitud en m, velocidad en m/s y ángulo de asiento en
+    deg), con la misma órbita radial que ascenso_lote.costa_kepleriana.  Si
+    el misil ya no sube es la propia altitud.  Se acota a un radio terrestre
+    sobre la superficie.
+    '''
+    altitud = np.asarray(altitud, dtype=float)
+    vy = velocidad * np.sin(np.radians(theta))
+    energia = vy**2 / 2 - MU / (RT + altitud)
+    return np.where(vy > 0, MU / np.maximum(-energia, MU / (2 * RT)) - RT,
+                    altitud)
+
+
+def clases(x, final):
+    '''Magnitudes del clasificador (matriz n x 2) de los ascensos desde las
+    filas de x (ENTRADAS) con estado final final (ResultadoAscenso): apogeo
+    (m) y tiempo de vuelo tras el fin de la combustión (s).
+    '''
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    return np.column_stack([apogeo(final.altitud, final.velocidad,
+                                   final.theta),
+                            final.tiempo - x[:, 5] / x[:, 4]])
+
+
+def regimen(c):
+    '''Índice en REGIMENES del régimen de cada fila de las magnitudes del
+    clasificador c (ver clases).
+    '''
+    c = np.atleast_2d(c)
+    return np.where(c[:, 0] >= ALTURA_FINAL, 2, np.where(c[:, 1] <= 0, 0, 1))
+
+
+def _modelo_real(x, metodo='rk45', dtl=.1):
+    '''Salidas (matriz n x SALIDAS) y magnitudes del clasificador (n x 2)
+    del ascenso integrado desde cada fila de x (ENTRADAS).
+    '''
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    h, v, gama, isp, gasto, masa_propulsante = x.T
+    if metodo == 'euler':
+        final = ascenso_lote(h, v, gama, gasto * isp, gasto,
+                             masa_propulsante / gasto, MASA_MISIL, dtl)
+    else:
+        final = ResultadoAscenso(*np.array(
+            [tuple(ascenso_adaptativo(*fila)) for fila in zip(
+                h, v, gama, gasto * isp, gasto,
+                masa_propulsante / gasto)]).T)
+    return (np.column_stack([getattr(final, s) for s in SALIDAS]),
+            clases(x, final))
+
+
+def modelo_real(x, metodo='rk45', dtl=.1):
+    '''Salidas (matriz n x SALIDAS) del ascenso integrado desde cada fila de
+    x (ENTRADAS).  Con 'euler' todos los ascensos se integran en un lote
+    (ver ascenso_lote).
+    '''
+    return _modelo_real(x, metodo, dtl)[0]
+
+
+def _normalizar(dominio, x):
+    '''Entradas llevadas al cubo unidad del dominio.
+    '''
+    minimo, maximo = np.array(dominio, dtype=float).T
+    return (np.atleast_2d(np.asarray(x, dtype=float)) - minimo) / (
+        maximo - minimo)
+
+
+def _distancias(a, b):
+    '''Matriz de distancias entre las filas de a y las de b.
+    '''
+    return np.sqrt(np.maximum((a**2).sum(1)[:, None] + (b**2).sum(1)[None]
+                              - 2 * a @ b.T, 0))
+
+
+def _polinomio(u):
+    '''Términos del polinomio de grado 1 en las entradas normalizadas.
+    '''
+    return np.column_stack([np.ones(len(u)), u])
+
+
+def _resolver(centros, u, z):
+    '''Pesos de la interpolación de los valores z (normalizados) en las
+    muestras u (normalizadas), con centros = u escaladas.
+    '''
+    m = u.shape[1]
+    polinomio = _polinomio(u)
+    sistema = np.block([[_distancias(centros, centros)**3, polinomio],
+                        [polinomio.T, np.zeros((m + 1, m + 1))]])
+    return np.linalg.solve(sistema,
+                           np.vstack([z, np.zeros((m + 1, z.shape[1]))]))
+
+
+def _interpolar(centros, pesos, escala, u):
+    '''Valores normalizados de la interpolación en los puntos u
+    (normalizados).  Devuelve también las distancias a las muestras.
+    '''
+    distancias = _distancias(u * escala, centros)
+    return (distancias**3 @ pesos[:len(centros)]
+            + _polinomio(u) @ pesos[len(centros):]), distancias
+
+
+def _ajuste(u, y):
+    '''Ajuste de los valores y en las muestras u (normalizadas).
+    '''
+    media = y.mean(0)
+    desviacion = np.where(y.std(0) > 0, y.std(0), 1)
+    z = (y - media) / desviacion
+    lineal = np.linalg.lstsq(_polinomio(u), z, rcond=None)[0][1:]
+    escala = np.sqrt((lineal**2).sum(1))
+    escala = np.maximum(escala / escala.max(), ESCALA_MIN)
+    return Ajuste(escala, u * escala, _resolver(u * escala, u, z), media,
+                  desviacion)
+
+
+def _evaluar(ajuste, u):
+    '''Valores del ajuste en los puntos u (normalizados) y distancias a sus
+    muestras.
+    '''
+    z, distancias = _interpolar(ajuste.centros, ajuste.pesos, ajuste.escala,
+                                u)
+    return ajuste.media + z * ajuste.desviacion, distancias
+
+
+def _ajustes(u, y, c):
+    '''Clasificador y ajuste de cada régimen (ver Sustituto) con las
+    muestras u (normalizadas), sus salidas y y sus magnitudes del
+    clasificador c.
+    '''
+    indice = regimen(c)
+    cuentas = np.bincount(indice, minlength=len(REGIMENES))
+    indice = np.where(cuentas[indice] < MUESTRAS_MIN, np.argmax(cuentas),
+                      indice)
+    ajustes = {k: _ajuste(u[indice == k], y[indice == k])
+               for k in np.unique(indice)}
+    return _ajuste(u, c), tuple(ajustes.get(k, ajustes[np.argmax(cuentas)])
+                                for k in range(len(REGIMENES)))
+
+
+def _predecir(clasificador, ajustes, u):
+    '''Salidas en los puntos u (normalizados) con el ajuste del régimen que
+    da el clasificador.  Devuelve también las distancias a las muestras.
+    '''
+    c, distancias = _evaluar(clasificador, u)
+    indice = regimen(c)
+    y = np.empty((len(u), len(SALIDAS)))
+    for k in np.unique(indice):
+        y[indice == k] = _evaluar(ajustes[k], u[indice == k])[0]
+    return y, distancias
+
+
+def ajustar(x, y, c, dominio=Dominio(), pliegues=PLIEGUES, semilla=0,
+            metodo='rk45', dtl=.1):
+    '''Sustituto ajustado a las muestras x (ENTRADAS) con salidas y
+    (SALIDAS) y magnitudes del clasificador c (ver clases) del modelo real
+    metodo, con su error de validación cruzada en pliegues grupos.
+    '''
+    u = _normalizar(dominio, x)
+    y = np.asarray(y, dtype=float)
+    c = np.asarray(c, dtype=float)
+    residuos = np.empty_like(y)
+    grupos = np.array_split(np.random.default_rng(semilla).permutation(len(u)),
+                            pliegues)
+    for grupo in grupos:
+        resto = np.setdiff1d(np.arange(len(u)), grupo)
+        prediccion = _predecir(*_ajustes(u[resto], y[resto], c[resto]),
+                               u[grupo])[0]
+        residuos[grupo] = np.abs(prediccion - y[grupo])
+    error = np.array([np.sqrt(np.mean(residuos**2, axis=0)),
+                      np.percentile(residuos, 95, axis=0),
+                      np.max(residuos, axis=0)])
+    clasificador, ajustes = _ajustes(u, y, c)
+    return Sustituto(Dominio(*map(tuple, np.array(dominio, dtype=float))),
+                     clasificador, ajustes, residuos, error, metodo, dtl,
+                     version_modelo())
+
+
+def entrenar(n_muestras=2000, dominio=Dominio(), semilla=0,
+             pliegues=PLIEGUES, metodo='rk45', dtl=.1, trabajadores=1):
+    '''Muestrea el modelo real en n_muestras puntos del dominio (hipercubo
+    latino) y ajusta el sustituto.  Las muestras se integran en este proceso
+    o repartidas entre trabajadores procesos (por defecto, tantos como
+    núcleos).
+    '''
+    x = hipercubo_latino(n_muestras, dominio, np.random.default_rng(semilla))
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    if trabajadores == 1:
+        y, c = _modelo_real(x, metodo, dtl)
+    else:
+        with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+            y, c = map(np.vstack, zip(*ejecutor.map(
+                _modelo_real, np.array_split(x, 4 * trabajadores),
+                repeat(metodo), repeat(dtl))))
+    return ajustar(x, y, c, dominio, pliegues, semilla, metodo, dtl)
+
+
+def resumen_error(sustituto):
+    '''Error de validación cruzada de cada salida: diccionario salida:
+    {'rms', 'p95', 'max'}.
+    '''
+    return {salida: dict(zip(('rms', 'p95', 'max'),
+                             sustituto.error[:, j].tolist()))
+            for j, salida in enumerate(SALIDAS)}
+
+
+def predecir(sustituto, x):
+    '''Predicción del sustituto en las filas de x (ENTRADAS).  Devuelve las
+    salidas (n x SALIDAS), el error local estimado de cada una y si cada
+    punto está dentro del dominio.
+    '''
+    u = _normalizar(sustituto.dominio, x)
+    y, distancias = _predecir(sustituto.clasificador, sustituto.ajustes, u)
+    vecinos = np.argpartition(distancias, min(VECINOS, len(distancias[0]))
+                              - 1, axis=1)[:, :VECINOS]
+    return (y, sustituto.residuos[vecinos].max(axis=1),
+            np.all((u >= 0) & (u <= 1), axis=1))
+
+
+def consultar(sustituto, x, tolerancias=Tolerancias()):
+    '''Salidas (n x SALIDAS) en las filas de x (ENTRADAS).  Los puntos fuera
+    del dominio o cuyo error local supera la tolerancia de alguna salida se
+    integran con el modelo real del sustituto.  Devuelve también qué puntos
+    se han integrado.
+    '''
+    y, error, dentro = predecir(sustituto, x)
+    integrar = ~dentro | np.any(error > np.asarray(tolerancias, dtype=float),
+                                axis=1)
+    if integrar.any():
+        y[integrar] = modelo_real(np.atleast_2d(x)[integrar],
+                                  sustituto.metodo, sustituto.dtl)
+    return y, integrar
+
+
+def guardar_sustituto(ruta, sustituto):
+    '''Guarda el sustituto en formato .npz.  Cada Ajuste se guarda campo a
+    campo, con el nombre del clasificador o del régimen delante.
+    '''
+    datos = {campo: np.asarray(valor) for campo, valor
+             in sustituto._asdict().items()
+             if campo not in ('clasificador', 'ajustes')}
+    for nombre, ajuste in zip(('clasificador',) + REGIMENES,
+                              (sustituto.clasificador,) + sustituto.ajustes):
+        datos.update(('%s_%s' % (nombre, campo), valor)
+                     for campo, valor in ajuste._asdict().items())
+    np.savez(ruta, **datos)
+
+
+def cargar_sustituto(ruta, comprobar=True):
+    '''Lee un sustituto guardado con guardar_sustituto.  Con comprobar, si
+    el código del modelo ha cambiado desde el ajuste se lanza ValueError.
+    '''
+    with np.load(ruta) as datos:
+        ajustes = [Ajuste(*(datos['%s_%s' % (nombre, campo)]
+                            for campo in Ajuste._fields))
+                   for nombre in ('clasificador',) + REGIMENES]
+        sustituto = Sustituto(
+            Dominio(*map(tuple, datos['dominio'])), ajustes[0],
+            tuple(ajustes[1:]), datos['residuos'], datos['error'],
+            str(datos['metodo']), float(datos['dtl']), str(datos['version']))
+    if comprobar and sustituto.version != version_modelo():
+        raise ValueError('El modelo ha cambiado desde el ajuste del '
+                         'sustituto; hay que volver a entrenarlo.')
+    return sustituto
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Tabla precalculada del coeficiente de resistencia del misil en función del
+número de Mach y de la altitud, con interpolación bilineal.
+
+La tabla se construye una sola vez con cdll_array y se guarda en disco
+(formato .npz de NumPy) dentro del directorio de caché.  El nombre del fichero
+lleva una huella de la rejilla y del código de aero_misil y modeloISA, de modo
+que cualquier cambio en el modelo obliga a reconstruirla.
+
+Error frente a cdll con la rejilla por defecto (Mach 1,1 a 12 cada 0,02 y
+altitud de 0 a 500 km cada 1 km), medido en el centro de cada celda:
+    - Error relativo máximo: 6 %, sólo en las celdas que cruza la transición
+      laminar/turbulenta (Re = 1e6) de alguna de las superficies.
+    - Fuera de esas celdas (un 0,6 % del total) el error relativo es
+      inferior al 0,14 %.
+El error máximo medido al construir cada tabla se guarda en el campo
+error_max.  Fuera del dominio de la tabla (en particular en régimen subsónico
+y transónico, donde el Cd de onda de las aletas es singular en Mach 1) se
+evalúa cdll directamente.
+
+"""
+
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from aero_misil import cdll, cdll_array
+from huella import huella_fuentes
+
+
+MACH_MIN = 1.1  # Mach mínimo de la tabla.
+MACH_MAX = 12  # Mach máximo de la tabla.
+PASO_MACH = .02  # Paso de la rejilla en Mach.
+ALT_MAX = 500000  # Altitud máxima de la tabla (m).
+PASO_ALT = 1000  # Paso de la rejilla en altitud (m).
+DIRECTORIO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'cache')
+
+TablaCd = namedtuple('TablaCd',
+                     'mach_min paso_mach paso_alt cd error_max filas')
+# La altitud de la tabla empieza en 0 m.  cd es un ndarray de dimensiones
+# (número de Mach, número de altitudes) y filas es la misma tabla como listas
+# de Python, que se indexan más rápido en la interpolación escalar.
+
+
+def huella(mach_min=MACH_MIN, mach_max=MACH_MAX, paso_mach=PASO_MACH,
+           alt_max=ALT_MAX, paso_alt=PASO_ALT):
+    '''Huella de la tabla: resumen SHA-256 de la rejilla y del código fuente
+    del modelo de resistencia y del atmosférico.
+    '''
+    return huella_fuentes(('aero_misil', 'modeloISA'),
+                          (mach_min, mach_max, paso_mach, alt_max, paso_alt))
+
+
+def construir_tabla(mach_min=MACH_MIN, mach_max=MACH_MAX, paso_mach=PASO_MACH,
+                    alt_max=ALT_MAX, paso_alt=PASO_ALT):
+    '''Construcción de la tabla de Cd sobre la rejilla dada.  También se mide
+    el error relativo máximo de la interpolación frente a cdll en el centro
+    de cada celda.
+    '''
+    mach = mach_min + paso_mach * np.arange(round((mach_max - mach_min)
+                                                  / paso_mach) + 1)
+    alt = paso_alt * np.arange(round(alt_max / paso_alt) + 1)
+    cd = cdll_array(mach[:, None], alt[None, :])
+    cd_centro = cdll_array((mach[:-1, None] + mach[1:, None]) / 2,
+                           (alt[None, :-1] + alt[None, 1:]) / 2)
+    cd_interpolado = (cd[:-1, :-1] + cd[1:, :-1] + cd[:-1, 1:]
+                      + cd[1:, 1:]) / 4
+    error_max = float(np.max(np.abs(cd_interpolado - cd_centro)
+                             / cd_centro))
+    return TablaCd(mach_min, paso_mach, paso_alt, cd, error_max, cd.tolist())
+
+
+def cargar_tabla(directorio=DIRECTORIO_CACHE, **rejilla):
+    '''Carga la tabla desde la caché en disco.  Si no existe para esta
+    rejilla y esta versión del modelo, se construye y se guarda.  Los
+    argumentos de rejilla son los de construir_tabla.
+    '''
+    ruta = os.path.join(directorio, 'tabla_cdll_' + huella(**rejilla)
+                        + '.npz')
+    if os.path.exists(ruta):
+        with np.load(ruta) as datos:
+            return TablaCd(float(datos['mach_min']),
+                           float(datos['paso_mach']),
+                           float(datos['paso_alt']), datos['cd'],
+                           float(datos['error_max']), datos['cd'].tolist())
+    tabla = construir_tabla(**rejilla)
+    os.makedirs(directorio, exist_ok=True)
+    temporal = ruta + '.%d.tmp.npz' % os.getpid()
+    np.savez(temporal, mach_min=tabla.mach_min, paso_mach=tabla.paso_mach,
+             paso_alt=tabla.paso_alt, cd=tabla.cd, error_max=tabla.error_max)
+    os.replace(temporal, ruta)
+    # Se escribe en un fichero temporal y se renombra para que otro proceso
+    # nunca lea una tabla a medio escribir.
+    return tabla
+
+
+def cd_tabla(tabla, machl, alt):
+    '''Coeficiente de resistencia del misil interpolado en la tabla.  Fuera
+    del dominio de la tabla se calcula con cdll.
+    '''
+    x_m = (machl - tabla.mach_min) / tabla.paso_mach
+    x_h = alt / tabla.paso_alt
+    i = int(x_m)
+    j = int(x_h)
+    if (x_m < 0 or x_h < 0 or i >= len(tabla.filas) - 1
+            or j >= len(tabla.filas[0]) - 1):
+        return cdll(machl, alt)
+    f_m = x_m - i
+    f_h = x_h - j
+    fila_0 = tabla.filas[i]
+    fila_1 = tabla.filas[i + 1]
+    return ((1 - f_m) * ((1 - f_h) * fila_0[j] + f_h * fila_0[j + 1])
+            + f_m * ((1 - f_h) * fila_1[j] + f_h * fila_1[j + 1]))
+
+
+def cd_tabla_array(tabla, machl, alt):
+    '''Versión vectorizada de cd_tabla para vectores de Mach y altitud.
+    '''
+    machl, alt = np.broadcast_arrays(np.asarray(machl, dtype=float),
+                                     np.asarray(alt, dtype=float))
+    x_m = (machl - tabla.mach_min) / tabla.paso_mach
+    x_h = alt / tabla.paso_alt
+    dentro = ((x_m >= 0) & (x_h >= 0) & (x_m < tabla.cd.shape[0] - 1)
+              & (x_h < tabla.cd.shape[1] - 1))
+    i = np.where(dentro, x_m, 0).astype(int)
+    j = np.where(dentro, x_h, 0).astype(int)
+    f_m = x_m - i
+    f_h = x_h - j
+    cd = tabla.cd
+    cd_interpolado = ((1 - f_m) * ((1 - f_h) * cd[i, j] + f_h * cd[i, j + 1])
+                      + f_m * ((1 - f_h) * cd[i + 1, j]
+                               + f_h * cd[i + 1, j + 1]))
+    if dentro.all():
+        return cd_interpolado
+    cd_interpolado[~dentro] = cdll_array(machl[~dentro], alt[~dentro])
+    return cd_interpolado
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Team REOS
+
+Registro de trayectorias completas.  Los generadores pasos_giro (simulacion)
+y pasos_ascenso_lote (ascenso_lote) dan el estado en cada paso de la
+integración; aquí se diezman y se escriben en disco por bloques, de modo que
+la memoria ocupada no depende de la longitud de las trayectorias ni del
+número de lanzamientos registrados.
+
+Cada paso es un namedtuple cuyos campos son escalares (un solo vehículo, como
+en el giro) o vectores con un elemento por vehículo en vuelo; el campo indice,
+si existe, identifica cada trayectoria.  Los campos t (s), x (m) y h (m) se
+usan para el diezmado.
+
+El fichero de trayectorias es una sucesión de arrays estructurados de NumPy en
+formato .npy, uno por bloque, con una columna indice y una columna por campo
+del paso.  Se lee con leer_trayectorias o cargar_trayectorias.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+
+TAM_BLOQUE = 65536  # Número de filas de cada bloque escrito en disco.
+
+Registro = namedtuple('Registro', 'dt distancia tolerancia elegidos')
+Registro.__new__.__defaults__ = (None, None, None, None)
+#Opciones del registro de trayectorias.  Un paso se guarda si se cumple alguno
+# de los criterios de diezmado activos (los que no son None):
+#   - dt: han pasado al menos dt segundos desde el último punto guardado.
+#   - distancia: el vehículo se ha desplazado al menos distancia metros desde
+#     el último punto guardado.
+#   - tolerancia: la extrapolación lineal desde los dos últimos puntos
+#     guardados se separa de la trayectoria más de tolerancia metros.
+# Sin ningún criterio se guardan todos los pasos.  El primer y el último paso
+# de cada trayectoria se guardan siempre.  elegidos es la lista de índices de
+# las trayectorias que se registran (None para todas).
+
+
+def _columnas(paso):
+    '''Índices y columnas de un paso como vectores de la misma longitud.
+    '''
+    valores = paso._asdict()
+    indice = valores.pop('indice', 0)
+    columnas = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float))
+                                     for x in valores.values()))
+    indice = np.broadcast_to(np.asarray(indice, dtype=np.int64),
+                             columnas[0].shape)
+    return indice, dict(zip(valores, columnas))
+
+
+def diezmar(pasos, registro=Registro()):
+    '''Generador con los pasos diezmados según registro.  Cada elemento es el
+    par (indice, columnas) de las filas guardadas, donde columnas es un
+    diccionario de vectores.  Al agotarse devuelve el valor de retorno de
+    pasos.
+    '''
+    todos = (registro.dt is None and registro.distancia is None
+             and registro.tolerancia is None)
+    elegidos = (None if registro.elegidos is None
+                else np.asarray(registro.elegidos, dtype=np.int64))
+    estado = None
+    # Por trayectoria: último punto guardado (t, x, h), pendiente de la
+    # extrapolación y última fila vista sin guardar.
+    while True:
+        try:
+            paso = next(pasos)
+        except StopIteration as fin:
+            if estado is not None and estado['pendiente'].any():
+                i = np.flatnonzero(estado['pendiente'])
+                yield i, {c: v[i] for c, v in estado['fila'].items()}
+            return fin.value
+        indice, columnas = _columnas(paso)
+        if elegidos is not None:
+            sel = np.isin(indice, elegidos)
+            indice = indice[sel]
+            columnas = {c: v[sel] for c, v in columnas.items()}
+        if estado is None:
+            n_max = int(indice.max(initial=-1)) + 1
+            estado = {'visto': np.zeros(n_max, bool),
+                      'pendiente': np.zeros(n_max, bool),
+                      'fila': {c: np.zeros(n_max) for c in columnas}}
+            for c in ('t', 'x', 'h', 'vx', 'vh'):
+                estado[c] = np.zeros(n_max)
+        if indice.size and indice.max() >= estado['visto'].size:
+            raise ValueError('Los índices de las trayectorias deben aparecer '
+                             'en el primer paso.')
+        t, x, h = columnas['t'], columnas['x'], columnas['h']
+        guardar = ~estado['visto'][indice] | todos
+        desde = t - estado['t'][indice]
+        if registro.dt is not None:
+            guardar |= desde >= registro.dt * (1 - 1e-9)
+        if registro.distancia is not None:
+            guardar |= (np.hypot(x - estado['x'][indice],
+                                 h - estado['h'][indice])
+                        >= registro.distancia)
+        if registro.tolerancia is not None:
+            guardar |= (np.hypot(x - estado['x'][indice]
+                                 - estado['vx'][indice] * desde,
+                                 h - estado['h'][indice]
+                                 - estado['vh'][indice] * desde)
+                        > registro.tolerancia)
+        #Pendientes de la extrapolación desde el último punto guardado hasta
+        # los nuevos.
+        i = indice[guardar]
+        nuevo = guardar & estado['visto'][indice]
+        j = indice[nuevo]
+        intervalo = np.where(desde[nuevo] > 0, desde[nuevo], np.inf)
+        estado['vx'][j] = (x[nuevo] - estado['x'][j]) / intervalo
+        estado['vh'][j] = (h[nuevo] - estado['h'][j]) / intervalo
+        estado['t'][i], estado['x'][i], estado['h'][i] = (
+            t[guardar], x[guardar], h[guardar])
+        estado['visto'][indice] = True
+        estado['pendiente'][indice] = ~guardar
+        for c, v in columnas.items():
+            estado['fila'][c][indice] = v
+        if i.size:
+            yield i, {c: v[guardar] for c, v in columnas.items()}
+
+
+def registrar_trayectorias(pasos, ruta, registro=Registro(),
+                           tam_bloque=TAM_BLOQUE):
+    '''Recorre el generador pasos, diezma sus estados según registro y los
+    escribe en el fichero ruta por bloques de tam_bloque filas.  Devuelve el
+    valor de retorno de pasos (p. ej. el ResultadoAscenso de
+    pasos_ascenso_lote).
+    '''
+    diezmados = diezmar(pasos, registro)
+    bloque = None
+    n_filas = 0
+    with open(ruta, 'wb') as f:
+        while True:
+            try:
+                indice, columnas = next(diezmados)
+            except StopIteration as fin:
+                if n_filas:
+                    np.save(f, bloque[:n_filas])
+                return fin.value
+            if bloque is None:
+                bloque = np.empty(tam_bloque, dtype=[('indice', np.int64)] + [
+                    (c, np.float64) for c in columnas])
+            hecho = 0
+            while hecho < indice.size:
+                n = min(indice.size - hecho, tam_bloque - n_filas)
+                bloque['indice'][n_filas:n_filas + n] = indice[hecho:
+                                                               hecho + n]
+                for c, v in columnas.items():
+                    bloque[c][n_filas:n_filas + n] = v[hecho:hecho + n]
+                n_filas += n
+                hecho += n
+                if n_filas == tam_bloque:
+                    np.save(f, bloque)
+                    n_filas = 0
+
+
+def leer_trayectorias(ruta):
+    '''Generador con los bloques (arrays estructurados) de un fichero de
+    trayectorias.
+    '''
+    with open(ruta, 'rb') as f:
+        while True:
+            try:
+                bloque = np.load(f)
+            except EOFError:
+                return
+            yield bloque
+
+
+def cargar_trayectorias(ruta, indice=None):
+    '''Filas de un fichero de trayectorias en un único array estructurado,
+    ordenadas por trayectoria y tiempo.  Si se da indice, sólo las de esa
+    trayectoria.
+    '''
+    bloques = [bloque if indice is None
+               else bloque[bloque['indice'] == indice]
+               for bloque in leer_trayectorias(ruta)]
+    if not bloques:
+        return np.empty(0)
+    filas = np.concatenate(bloques)
+    return filas[np.lexsort((filas['t'], filas['indice']))]